@@ -0,0 +1,174 @@
+#!/usr/bin/env python
+"""Alignment star selection and guided alignment.
+
+choose_stars() picks alignment stars for a site and time from the bright
+stars of a catalog.Catalog:
+
+1. alt/az of every star at once (astrometry, vectorized), keeping those
+   above the horizon mask and between min_alt and max_alt (alt/az mounts
+   align badly near the zenith),
+2. every set of count candidates whose stars are all at least
+   min_separation apart,
+3. of those, the set and visiting order with the least predicted slew
+   time from where the mount points, from one slew-time matrix over the
+   candidates and numpy over all sets and orders.
+
+For a full bright-star list this takes a few milliseconds.
+align() then drives the gotos and syncs on the chosen stars.
+"""
+import argparse
+import itertools
+import sys
+from collections import namedtuple
+
+import numpy as np
+
+import astrometry
+import catalog
+import horizon
+import slewmodel
+import telescopes
+
+AlignmentStar = namedtuple('AlignmentStar',
+                           ['name', 'ra', 'dec', 'mag', 'alt', 'az'])
+
+
+def candidates(stars, latitude, longitude, unix_time, mask=None,
+               min_alt=20.0, max_alt=75.0, max_mag=2.5):
+    """Indices of the stars usable for alignment, with their alt/az.
+
+    Only objects of kind 'star' qualify: a cluster or galaxy can't be
+    centered precisely enough to sync on.
+
+    :param stars: catalog.Catalog
+    :param mask: horizon.HorizonMask, default a flat horizon
+    :return: (indices, alt, az) arrays
+    """
+    if mask is None:
+        mask = horizon.HorizonMask.flat()
+    _alt, _az = astrometry.radec_to_altaz(stars.ra, stars.dec, latitude,
+                                          longitude, unix_time)
+    _usable = ((stars.kind == 'star') & (stars.mag <= max_mag) &
+               (_alt >= min_alt) & (_alt <= max_alt) &
+               mask.are_safe(_az, _alt))
+    _indices = np.flatnonzero(_usable)
+    return _indices, _alt[_indices], _az[_indices]
+
+
+def choose_stars(stars, latitude, longitude, unix_time, count=3, mask=None,
+                 start=None, min_alt=20.0, max_alt=75.0, min_separation=30.0,
+                 max_mag=2.5, slew_time=None):
+    """Picks count well separated visible stars in goto order.
+
+    :param stars: catalog.Catalog
+    :param start: (az, alt) the mount starts from, default the first star
+    :param min_separation: smallest angle between any two chosen stars
+    :param slew_time: callable like slewmodel.SlewModel.predict
+    :return: list of AlignmentStar, empty if no set qualifies
+    """
+    if slew_time is None:
+        slew_time = slewmodel.SlewModel()
+    _indices, _alt, _az = candidates(stars, latitude, longitude, unix_time,
+                                     mask, min_alt, max_alt, max_mag)
+    if len(_indices) < count:
+        return []
+    _vectors = astrometry.unit_vectors(stars.ra[_indices],
+                                       stars.dec[_indices])
+    _far_enough = (np.dot(_vectors, _vectors.T) <=
+                   np.cos(np.radians(min_separation)))
+    _sets = np.array(list(itertools.combinations(range(len(_indices)),
+                                                 count)), dtype=np.intp)
+    for i, j in itertools.combinations(range(count), 2):
+        _sets = _sets[_far_enough[_sets[:, i], _sets[:, j]]]
+    if not len(_sets):
+        return []
+
+    # slew times between candidates, and from the start position
+    _times = slew_time(_az[:, None], _alt[:, None], _az[None, :],
+                       _alt[None, :])
+    if start is not None:
+        _from_start = slew_time(start[0], start[1], _az, _alt)
+    else:
+        _from_start = np.zeros(len(_indices))
+    _best_cost = None
+    for order in itertools.permutations(range(count)):
+        _visits = _sets[:, order]
+        _cost = _from_start[_visits[:, 0]]
+        for k in range(count - 1):
+            _cost = _cost + _times[_visits[:, k], _visits[:, k + 1]]
+        i = int(np.argmin(_cost))
+        if _best_cost is None or _cost[i] < _best_cost:
+            _best_cost, _best = _cost[i], _visits[i]
+    return [AlignmentStar(str(stars.names[_indices[k]]),
+                          float(stars.ra[_indices[k]]),
+                          float(stars.dec[_indices[k]]),
+                          float(stars.mag[_indices[k]]),
+                          float(_alt[k]), float(_az[k])) for k in _best]
+
+
+def choose_for_telescope(telescope, stars=None, count=3, mask=None, **kwargs):
+    """choose_stars for the site and time the mount reports, starting
+    from where it points"""
+    if stars is None:
+        stars = catalog.Catalog.load()
+    _location = telescope.get_earth_location()
+    _az, _alt = telescope.get_alt_az()
+    return choose_stars(stars, _location.lat.degree, _location.lon.degree,
+                        telescope.get_unix_time(), count, mask,
+                        start=(_az, _alt), **kwargs)
+
+
+def align(telescope, stars, confirm):
+    """Gotos each star, lets the user center it, then syncs on it.
+
+    :param confirm: called with the AlignmentStar once the goto arrived;
+        return True when the star is centered, False to skip it
+    :return: the stars synced on
+    """
+    _synced = []
+    for star in stars:
+        telescope.goto_ra_dec(star.ra, star.dec)
+        telescopes.wait_for_goto(telescope)
+        if confirm(star):
+            telescope.sync(star.ra, star.dec)
+            _synced.append(star)
+    return _synced
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Pick alignment stars and align on them")
+    parser.add_argument("-d", default="/dev/ttyUSB0",
+                        help="Port telescope is connected to. "
+                             "Default = /dev/ttyUSB0")
+    parser.add_argument("--count", type=int, default=3)
+    parser.add_argument("--horizon", metavar="horizon_file",
+                        help="Horizon mask stars must clear")
+    parser.add_argument("--min_separation", type=float, default=30.0)
+    parser.add_argument("--align", action="store_true",
+                        help="Goto and sync on the chosen stars")
+    args = parser.parse_args()
+
+    _mask = horizon.HorizonMask.load(args.horizon) if args.horizon else None
+    telescope = telescopes.NexStarSLT130(args.d)
+    try:
+        _stars = choose_for_telescope(telescope, count=args.count, mask=_mask,
+                                      min_separation=args.min_separation)
+        if not _stars:
+            print("no set of %d visible stars %.0f degrees apart" %
+                  (args.count, args.min_separation))
+            return 1
+        for star in _stars:
+            print("%-16s mag %5.2f  alt %5.1f  az %5.1f" % (
+                star.name, star.mag, star.alt, star.az))
+        if args.align:
+            _synced = align(telescope, _stars, lambda star: raw_input(
+                "center %s and press enter, s to skip: " %
+                star.name).strip().lower() != 's')
+            print("synced on %d stars" % len(_synced))
+    finally:
+        telescope.close()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
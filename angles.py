@@ -0,0 +1,73 @@
+"""Fixed-point angles in 32 bit fractions of a revolution.
+
+This is the mount's own representation: 'e'/'z' replies and 'r'/'b'/'s'
+arguments are 8 hex digits of revolution/2**32. Keeping positions as
+those integers means a reply decodes with one int() call, re-encodes
+exactly, and differences wrap correctly with integer arithmetic. Degrees
+(or a SkyCoord) are produced only when asked for.
+"""
+REVOLUTION = 2 ** 32
+_HALF = 2 ** 31
+_DEGREES_PER_COUNT = 360.0 / REVOLUTION
+
+
+def degrees_to_counts(degrees):
+    """Nearest count to an angle in degrees, wrapped into [0, 2**32)"""
+    return int(round(degrees / 360.0 * REVOLUTION)) % REVOLUTION
+
+
+def signed_degrees(counts):
+    """Counts as degrees in (-180, 180], the range of Dec and altitude"""
+    return (counts - REVOLUTION if counts > _HALF else counts) * \
+        _DEGREES_PER_COUNT
+
+
+def counts_delta(a, b):
+    """Signed shortest difference b - a in counts"""
+    return (b - a + _HALF) % REVOLUTION - _HALF
+
+
+class Angle(object):
+    __slots__ = ('counts',)
+
+    def __init__(self, counts):
+        self.counts = counts % REVOLUTION
+
+    @classmethod
+    def from_degrees(cls, degrees):
+        return cls(degrees_to_counts(degrees))
+
+    @classmethod
+    def from_hex(cls, text):
+        return cls(int(text, 16))
+
+    @property
+    def degrees(self):
+        return self.counts * _DEGREES_PER_COUNT
+
+    def hex(self):
+        """The 8 hex digit wire form"""
+        return '%08X' % self.counts
+
+    def __sub__(self, other):
+        """Signed difference in counts"""
+        return counts_delta(other.counts, self.counts)
+
+    def __add__(self, counts):
+        return Angle(self.counts + counts)
+
+    def __eq__(self, other):
+        return isinstance(other, Angle) and self.counts == other.counts
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        return hash(self.counts)
+
+    def __float__(self):
+        return self.degrees
+
+    def __repr__(self):
+        return "Angle(0x%08X, %.6f deg)" % (self.counts, self.degrees)
+
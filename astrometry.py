@@ -0,0 +1,93 @@
+"""Fast vectorized coordinate helpers.
+
+These trade a little accuracy (no precession, nutation or refraction, good
+to a fraction of a degree) for speed, so that thousands of targets can be
+evaluated on a time grid without building astropy frames.  Use astropy
+for anything that is sent to the mount as a precise position.
+"""
+import numpy as np
+
+UNIX_EPOCH_JD = 2440587.5
+J2000_JD = 2451545.0
+SECONDS_PER_DAY = 86400.0
+
+
+def unix_to_jd(unix_time):
+    return np.asarray(unix_time, dtype=np.float64) / SECONDS_PER_DAY + UNIX_EPOCH_JD
+
+
+def gmst_degrees(unix_time):
+    """Greenwich mean sidereal time in degrees for the given unix time(s)"""
+    _d = unix_to_jd(unix_time) - J2000_JD
+    _t = _d / 36525.0
+    _gmst = (280.46061837 + 360.98564736629 * _d +
+             0.000387933 * _t * _t - _t * _t * _t / 38710000.0)
+    return np.mod(_gmst, 360.0)
+
+
+def local_sidereal_degrees(unix_time, longitude):
+    return np.mod(gmst_degrees(unix_time) + longitude, 360.0)
+
+
+def radec_to_altaz(ra, dec, latitude, longitude, unix_time):
+    """Converts RA/Dec to Alt/Az, all in degrees.
+
+    Arguments broadcast against each other, so passing ``ra[:, None]`` and
+    ``times[None, :]`` yields a targets x times grid.
+
+    :return: (alt, az) arrays in degrees, azimuth measured from north
+        through east.
+    """
+    _ha = np.radians(local_sidereal_degrees(unix_time, longitude) -
+                     np.asarray(ra, dtype=np.float64))
+    _dec = np.radians(np.asarray(dec, dtype=np.float64))
+    _lat = np.radians(latitude)
+    _sin_lat = np.sin(_lat)
+    _cos_lat = np.cos(_lat)
+    _sin_dec = np.sin(_dec)
+    _cos_dec = np.cos(_dec)
+    _cos_ha = np.cos(_ha)
+    _sin_alt = _sin_dec * _sin_lat + _cos_dec * _cos_lat * _cos_ha
+    _alt = np.arcsin(np.clip(_sin_alt, -1.0, 1.0))
+    _az = np.arctan2(-_cos_dec * np.sin(_ha),
+                     _sin_dec * _cos_lat - _cos_dec * _cos_ha * _sin_lat)
+    return np.degrees(_alt), np.mod(np.degrees(_az), 360.0)
+
+
+def altaz_to_radec(alt, az, latitude, longitude, unix_time):
+    """Inverse of :func:`radec_to_altaz`, returns (ra, dec) in degrees"""
+    _alt = np.radians(np.asarray(alt, dtype=np.float64))
+    _az = np.radians(np.asarray(az, dtype=np.float64))
+    _lat = np.radians(latitude)
+    _sin_dec = (np.sin(_alt) * np.sin(_lat) +
+                np.cos(_alt) * np.cos(_lat) * np.cos(_az))
+    _dec = np.arcsin(np.clip(_sin_dec, -1.0, 1.0))
+    _ha = np.arctan2(-np.sin(_az) * np.cos(_alt),
+                     np.sin(_alt) * np.cos(_lat) -
+                     np.cos(_alt) * np.sin(_lat) * np.cos(_az))
+    _ra = local_sidereal_degrees(unix_time, longitude) - np.degrees(_ha)
+    return np.mod(_ra, 360.0), np.degrees(_dec)
+
+
+def wrap_delta(a, b):
+    """Shortest signed angular difference b - a in degrees, in [-180, 180)"""
+    return np.mod(np.asarray(b) - np.asarray(a) + 180.0, 360.0) - 180.0
+
+
+def angular_separation(ra1, dec1, ra2, dec2):
+    """Great circle separation in degrees (haversine form)"""
+    _ra1, _dec1, _ra2, _dec2 = [np.radians(np.asarray(x, dtype=np.float64))
+                                for x in (ra1, dec1, ra2, dec2)]
+    _h = (np.sin((_dec2 - _dec1) / 2.0) ** 2 +
+          np.cos(_dec1) * np.cos(_dec2) * np.sin((_ra2 - _ra1) / 2.0) ** 2)
+    return np.degrees(2.0 * np.arcsin(np.sqrt(np.clip(_h, 0.0, 1.0))))
+
+
+def unit_vectors(ra, dec):
+    """Returns an (n, 3) array of unit vectors for the given RA/Dec"""
+    _ra = np.radians(np.asarray(ra, dtype=np.float64))
+    _dec = np.radians(np.asarray(dec, dtype=np.float64))
+    _cos_dec = np.cos(_dec)
+    return np.column_stack((_cos_dec * np.cos(_ra),
+                            _cos_dec * np.sin(_ra),
+                            np.sin(_dec)))
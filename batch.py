@@ -0,0 +1,142 @@
+"""Runs a script of telescope commands over a single session.
+
+One command per line, arguments separated by whitespace, '#' comments::
+
+    set_tracking_mode 2
+    goto_radec 83.82 -5.39
+    wait 120
+    get_radec
+    get_altaz
+
+Runs of consecutive queries are pipelined: all of their commands are sent
+before the first reply is read. Every command produces one JSON line on
+the output with its result or error; the script stops at the first error.
+"""
+import json
+import time
+from collections import namedtuple
+
+import protocol
+
+Step = namedtuple('Step', ['line', 'name', 'args'])
+
+
+def _position(telescope, response):
+    return telescope._parse_position(response)
+
+
+def _query(codec):
+    return codec.command, codec.reply_length, lambda t, r: codec.decode(r)
+
+
+# name: (command, reply length, decoder(telescope, reply))
+QUERIES = {
+    'get_radec': (protocol.GET_RA_DEC.command, 18, _position),
+    'get_altaz': (protocol.GET_AZ_ALT.command, 18, _position),
+    'get_tracking_mode': _query(protocol.GET_TRACKING_MODE),
+    'goto_in_progress': _query(protocol.GOTO_IN_PROGRESS),
+    'alignment_complete': _query(protocol.ALIGNMENT_COMPLETE),
+    'get_version': _query(protocol.GET_VERSION),
+    'get_model': _query(protocol.GET_MODEL),
+}
+
+# name: (allowed argument counts, action(telescope, float arguments))
+ACTIONS = {
+    'goto_radec': ((2,), lambda t, a: t.goto_ra_dec(a[0], a[1])),
+    'goto_altaz': ((2,), lambda t, a: t.goto_alt_az(a[0], a[1])),
+    'sync': ((2,), lambda t, a: t.sync(a[0], a[1])),
+    'set_tracking_mode': ((1,), lambda t, a: t.set_tracking_mode(int(a[0]))),
+    'cancel_goto': ((0,), lambda t, a: t.cancel_goto()),
+    'wait': ((0, 1), lambda t, a: t.wait_for_goto(timeout=a[0] if a else None)),
+    'sleep': ((1,), lambda t, a: time.sleep(a[0])),
+    'get_location': ((0,), lambda t, a: t.get_location_lat_long()),
+    'get_time': ((0,), lambda t, a: t.get_time_initializer()),
+}
+
+
+def parse(lines):
+    """Parses script lines into a list of Step, raising ValueError"""
+    steps = []
+    for line_number, line in enumerate(lines, 1):
+        fields = line.split('#', 1)[0].split()
+        if not fields:
+            continue
+        name, args = fields[0], fields[1:]
+        if name in QUERIES:
+            _counts = (0,)
+        elif name in ACTIONS:
+            _counts = ACTIONS[name][0]
+        else:
+            raise ValueError("line %d: unknown command %s" % (line_number, name))
+        if len(args) not in _counts:
+            raise ValueError("line %d: %s takes %s arguments" %
+                             (line_number, name,
+                              " or ".join(str(c) for c in _counts)))
+        try:
+            args = [float(a) for a in args]
+        except ValueError:
+            raise ValueError("line %d: arguments must be numbers" % line_number)
+        steps.append(Step(line_number, name, args))
+    return steps
+
+
+def _groups(steps, max_pipeline):
+    """Splits steps into runs of pipelinable queries and single actions"""
+    _run = []
+    for step in steps:
+        if step.name in QUERIES and len(_run) < max_pipeline:
+            _run.append(step)
+            continue
+        if _run:
+            yield _run
+            _run = []
+        if step.name in QUERIES:
+            _run.append(step)
+        else:
+            yield [step]
+    if _run:
+        yield _run
+
+
+def _record(step, result=None, error=None, elapsed=0.0):
+    _record = {'line': step.line, 'command': step.name,
+               'elapsed': round(elapsed, 6)}
+    if error is not None:
+        _record['error'] = str(error)
+    else:
+        _record['result'] = result
+    return _record
+
+
+def run(telescope, steps, max_pipeline=8):
+    """Executes steps, yielding one result dict per step"""
+    for group in _groups(steps, max_pipeline):
+        _start = time.time()
+        try:
+            if group[0].name in QUERIES:
+                _queries = [QUERIES[step.name] for step in group]
+                _replies = telescope.pipeline([(q[0], q[1]) for q in _queries])
+                _results = [q[2](telescope, r)
+                            for q, r in zip(_queries, _replies)]
+            else:
+                _results = [ACTIONS[group[0].name][1](telescope, group[0].args)]
+        except Exception as e:
+            yield _record(group[0], error=e, elapsed=time.time() - _start)
+            return
+        # pipelined replies arrive together, share the time out evenly
+        _elapsed = (time.time() - _start) / len(group)
+        for step, result in zip(group, _results):
+            yield _record(step, result, elapsed=_elapsed)
+
+
+def run_script(telescope, lines, out):
+    """Parses and runs a script, writing JSON lines to out.
+
+    :return: True if every step succeeded
+    """
+    for record in run(telescope, parse(lines)):
+        out.write(json.dumps(record) + '\n')
+        out.flush()
+        if 'error' in record:
+            return False
+    return True
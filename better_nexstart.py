@@ -1,7 +1,9 @@
 #!/usr/bin/python
 
 import serial
+import protocol
 import telescopes
+import horizon
 from astropy import units as u
 from astropy.time import Time
 from astropy.coordinates import EarthLocation
@@ -11,20 +13,25 @@ from astropy.coordinates import AltAz
 RADEC = 'e'
 AZEL = 'z'
 
-class TelescopeAlignmentNotSet(telescopes.TelescopeError):
-    def __ini__(self):
-        msg = "Telescope alignment not set"
-        super(TelescopeAlignmentNotSet, self).__init__(msg)
+TelescopeAlignmentNotSet = telescopes.TelescopeAlignmentNotSet
 
 
 class NexStarSLT130(telescopes.BaseTelescope):
 
 
-    def __init__(self, device):
+    def __init__(self, device, horizon_mask=None, slew_model=None):
+        """
+        :param horizon_mask: horizon.HorizonMask checked by the safe_goto
+            methods, defaults to the flat horizon
+        :param slew_model: slewmodel.SlewModel used to predict slew paths
+        """
         super(NexStarSLT130, self).__init__(device)
         self.serial = serial.Serial(device, baudrate=9600, timeout=2)
         self.DIR_AZIMUTH = 0
         self.DIR_ELEVATION = 1
+        self.horizon_mask = (horizon_mask if horizon_mask is not None
+                             else horizon.HorizonMask.flat())
+        self.slew_model = slew_model
 
     def _send_command(self, cmd):
         self.serial.write(cmd)
@@ -38,20 +45,15 @@ class NexStarSLT130(telescopes.BaseTelescope):
         """
         return self.serial.read(n_bytes)
 
+    def _command(self, codec, *args):
+        """Encodes, exchanges and decodes one protocol.Codec command"""
+        self._send_command(codec.encode(*args))
+        return codec.decode(self._read_response(codec.reply_length))
 
     @staticmethod
     def _validate_command(response):
         assert response == '#', 'Command failed'
 
-    @staticmethod
-    def _convert_hex_to_percentage_of_revolution(string):
-        return int(string, 16) / 2. ** 32 * 360.
-
-    @staticmethod
-    def _convert_to_percentage_of_revolution_in_hex(degrees):
-        rounded = round(degrees / 360. * 2. ** 32)
-        return '%08X' % rounded
-
     def _get_position(self, coordinate_system):
         """Returns telescope postion in the requested coordinate system.
 
@@ -59,9 +61,7 @@ class NexStarSLT130(telescopes.BaseTelescope):
 
         """
         self._send_command(coordinate_system)
-        response = self._read_response(18)
-        return (self._convert_hex_to_percentage_of_revolution(response[:8]),
-                self._convert_hex_to_percentage_of_revolution(response[9:17]))
+        return protocol.GET_RA_DEC.decode(self._read_response(18))
 
     def get_azel(self):
         """Returns az and el in degrees"""
@@ -79,45 +79,54 @@ class NexStarSLT130(telescopes.BaseTelescope):
 
 
     def _goto_command(self, char, values):
-        command = (char + self._convert_to_percentage_of_revolution_in_hex(values[0]) + ',' +
-                   self._convert_to_percentage_of_revolution_in_hex(values[1]))
+        _codec = protocol.GOTO_BY_OPCODE[char]
+        command = _codec.encode(*values)
         print command
         self._send_command(command)
-        response = self._read_response(1)
-        return "#" in response
+        return _codec.decode(self._read_response(_codec.reply_length))
 
     def safe_goto_azel(self, az, el):
         if not self.alignment_complete():
             raise TelescopeAlignmentNotSet
-        if el > 90.0:
-            raise TelescopeError(
-                "elevation larger than 90 degrees not allowed")
         if az >= 360.0:
             az = 0.0
+        if not self.determine_azel_are_safe(az, el):
+            raise telescopes.TelescopeError(
+                "Az: %s, El: %s are not safe at current location" % (az, el))
         self.goto_azel(az, el)
 
     def goto_azel(self, az, el):
         print "going to %s %s" % (az, el)
         self._goto_command('b', (az, el))
 
-    @staticmethod
-    def determine_azel_are_safe(_az, _el):
-        """Checks if ra and dec are safe for telescope
+    def determine_azel_are_safe(self, _az, _el):
+        """Checks if az and el are safe for telescope
 
-        Based on the location this function should determine if the
-        given Right Assention and Declination are safe for the telescope
-        to point to. (we don't want pointing at floor :)
+        Both the destination and the predicted slew path from the current
+        position have to clear the horizon mask (we don't want pointing at
+        floor :)
         :param _el:
         :param _az:
         """
-        if _az and _el:
-            return True
+        if not self.horizon_mask.is_safe(_az, _el):
+            return False
+        _az0, _el0 = self._get_position(AZEL)
+        return self.horizon_mask.path_is_safe(_az0, _el0, _az, _el,
+                                              self.slew_model)
+
+    def determine_radec_are_safe(self, _ra, _dec):
+        """Checks if ra and dec are safe for telescope right now"""
+        _lat, _long = self.get_location()
+        _az, _el = self._convert_radec_to_azel(
+            _ra, _dec, EarthLocation(lat=_lat * u.deg, lon=_long * u.deg),
+            Time.now())
+        return self.determine_azel_are_safe(_az, _el)
 
     def safe_goto_radec(self, ra, dec):
         if not self.alignment_complete():
             raise TelescopeAlignmentNotSet
-        if not self.DetermineRaDecAreSafe(ra, dec):
-            raise TelescopeError(
+        if not self.determine_radec_are_safe(ra, dec):
+            raise telescopes.TelescopeError(
                 "Ra: %s, Dec: %s are not safe at current location" %
                 (ra, dec))
         self.goto_radec(ra, dec)
@@ -130,43 +139,35 @@ class NexStarSLT130(telescopes.BaseTelescope):
         self._goto_command('s', (ra, dec))
 
     def get_tracking_mode(self):
-        self.serial.write('t')
-        response = self.serial.read(2)
-        return ord(response[0])
+        return self._command(protocol.GET_TRACKING_MODE)
 
     def set_tracking_mode(self, mode):
-        command = 'T' + chr(mode)
-        self.serial.write(command)
-        response = self.serial.read(1)
-        self._validate_command(response)
+        self._command(protocol.SET_TRACKING_MODE, mode)
 
     def _var_slew_command(self, direction, rate):
-        negative_rate = True if rate < 0 else False
-        track_rate_high = (int(abs(rate)) * 4) / 256
-        track_rate_low = (int(abs(rate)) * 4) % 256
-        direction_char = chr(16) if direction == self.DIR_AZIMUTH else chr(17)
-        sign_char = chr(7) if negative_rate is True else chr(6)
-        command = ('P' + chr(3) + direction_char + sign_char +
-                   chr(track_rate_high) + chr(track_rate_low) + chr(0) +
-                   chr(0))
-        self.serial.write(command)
-        response = self.serial.read(1)
-        self._validate_command(response)
+        self._command(protocol.VAR_SLEW, direction, rate)
 
     def slew_var(self, az_rate, el_rate):
         self._var_slew_command(self.DIR_AZIMUTH, az_rate)
         self._var_slew_command(self.DIR_ELEVATION, el_rate)
 
+    def safe_slew_var(self, az_rate, el_rate, az, el, lookahead=2.0):
+        """slew_var that refuses rates heading past the horizon mask
+
+        :param az: current azimuth, as last polled by the caller
+        :param el: current elevation, as last polled by the caller
+        :param lookahead: seconds ahead the projected position is checked
+        """
+        if not self.horizon_mask.rates_are_safe(az, el, az_rate / 3600.0,
+                                                el_rate / 3600.0, lookahead):
+            self.slew_var(0, 0)
+            raise telescopes.TelescopeError(
+                "slew at %s, %s arcsec/s from Az: %s, El: %s is not safe" %
+                (az_rate, el_rate, az, el))
+        self.slew_var(az_rate, el_rate)
+
     def _fixed_slew_command(self, direction, rate):
-        negative_rate = True if rate < 0 else False
-        sign_char = chr(37) if negative_rate is True else chr(36)
-        direction_char = chr(16) if direction == self.DIR_AZIMUTH else chr(17)
-        rate_char = chr(int(abs(rate)))
-        command = ('P' + chr(2) + direction_char + sign_char + rate_char +
-                   chr(0) + chr(0) + chr(0))
-        self.serial.write(command)
-        response = self.serial.read(1)
-        self._validate_command(response)
+        self._command(protocol.FIXED_SLEW, direction, rate)
 
     def slew_fixed(self, az_rate, el_rate):
         assert (az_rate >= -9) and (az_rate <= 9), 'az_rate out of range'
@@ -188,42 +189,14 @@ class NexStarSLT130(telescopes.BaseTelescope):
 
         :return:
         """
-        self.serial.write('w')
-        response = self.serial.read(9)
-
-        lat = ()
-        for char in response[:4]:
-            lat = lat + (ord(char),)
-        _lat_degrees= lat[0] + (lat[1] / 60.0) + (lat[2]/(60.0 * 60.0))
-        if lat[3] != 0:
-            _lat_degrees *= -1.0
-
-        _long = ()
-        for char in response[4:-1]:
-            _long = _long + (ord(char),)
-        _long_degrees= _long[0] + (_long[1] / 60.0) + (_long[2]/(60.0 * 60.0))
-        if _long[3] != 0:
-            _long_degrees *= -1.0
-
-        return _lat_degrees, _long_degrees
+        lat, _long = self._command(protocol.GET_LOCATION)
+        return protocol.dms_to_degrees(lat), protocol.dms_to_degrees(_long)
 
     def set_location(self, lat, lon):
-        command = 'W'
-        for p in lat:
-            command += chr(p)
-        for p in lon:
-            command += chr(p)
-        self.serial.write(command)
-        response = self.serial.read(1)
-        self._validate_command(response)
+        self._command(protocol.SET_LOCATION, lat, lon)
 
     def _get_time(self):
-        self._send_command('h')
-        response = self._read_response(9)
-        time = ()
-        for char in response[:-1]:
-            time = time + (ord(char),)
-        return time
+        return self._command(protocol.GET_TIME)
 
     def get_time_initilizer(self):
         """Returns time initializer  of the format YYYYMMDDTHHmmss"""
@@ -237,43 +210,25 @@ class NexStarSLT130(telescopes.BaseTelescope):
 
 
     def set_time_initializer(self, time):
-        command = 'H'
-        for p in time:
-            command += chr(p)
-        self._send_command(command)
-        response = self._read_response(1)
-        self._validate_command(response)
+        self._command(protocol.SET_TIME, time)
 
     def get_version(self):
-        self.serial.write('V')
-        response = self.serial.read(3)
-        return ord(response[0]) + ord(response[1]) / 10.0
+        return self._command(protocol.GET_VERSION)
 
     def get_model(self):
-        self.serial.write('m')
-        response = self.serial.read(2)
-        return ord(response[0])
+        return self._command(protocol.GET_MODEL)
 
     def echo(self, x):
-        command = 'K' + chr(x)
-        self._send_command(command)
-        response = self._read_response(2)
-        return ord(response[0])
+        return self._command(protocol.ECHO, x)
 
     def alignment_complete(self):
-        self._send_command('J')
-        response = self._read_response(2)
-        return True if ord(response[0]) == 1 else False
+        return self._command(protocol.ALIGNMENT_COMPLETE)
 
     def goto_in_progress(self):
-        self.serial.write('L')
-        response = self.serial.read(2)
-        return True if int(response[0]) == 1 else False
+        return self._command(protocol.GOTO_IN_PROGRESS)
 
     def cancel_goto(self):
-        self._send_command('M')
-        response = self._read_response(1)
-        self._validate_command(response)
+        self._command(protocol.CANCEL_GOTO)
 
 
     def cancel_current_operation(self):
@@ -1,6 +1,7 @@
 #!/usr/bin/env python
 import future
 import telescopes
+import shell
 import argparse
 from astropy import units as u
 from astropy.time import Time
@@ -42,10 +43,12 @@ def _get_telescope_location(telescope):
 
 def main():
     parser = argparse.ArgumentParser()
+    parser.add_argument("-d",
+                        help="Port telescope is connected to."
+                             "Default = /dev/ttyUSB0")
     group = parser.add_mutually_exclusive_group()
-    group.add_argument("-d",
-                       help="Port telescope is connected to."
-                            "Default = /dev/ttyUSB0")
+    group.add_argument("--shell", action="store_true",
+                       help="Interactive shell over one session")
     group.add_argument("--get_altaz", action="store_true")
     group.add_argument("--get_azel", action="store_true")
     group.add_argument("--get_location", action="store_true")
@@ -81,7 +84,12 @@ def main():
 
     telescope = telescopes.NexStarSLT130(device)
 
-    if args.get_azel:
+    if args.shell:
+        try:
+            shell.TelescopeShell(telescope).cmdloop()
+        finally:
+            telescope.close()
+    elif args.get_azel:
         print(telescope.get_alt_az())
     elif args.debug_get_radec:
         print(telescope.get_ra_dec())
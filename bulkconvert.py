@@ -0,0 +1,174 @@
+#!/usr/bin/env python
+"""Bulk RA/Dec to Alt/Az conversion.
+
+Streams a CSV (``ra,dec[,unix_time]`` in degrees) or a .npy array of the
+same columns through vectorized conversions on a process pool and writes
+``alt,az`` rows in input order. Only a few chunks are in flight at any
+time, so memory stays bounded however large the input is.
+"""
+import argparse
+import itertools
+import sys
+import time
+from collections import deque
+from multiprocessing import Pool, cpu_count
+try:
+    from cStringIO import StringIO
+except ImportError:
+    from io import StringIO
+
+import numpy as np
+
+import astrometry
+
+DEFAULT_CHUNK = 100000
+
+
+def read_blocks(path, chunk_size=DEFAULT_CHUNK):
+    """Yields chunks of the input without parsing them.
+
+    CSV input comes out as lists of lines, so the parsing happens in the
+    workers too; .npy input comes out as float arrays.
+    """
+    if path.endswith('.npy'):
+        _array = np.load(path, mmap_mode='r')
+        for start in range(0, len(_array), chunk_size):
+            yield np.array(_array[start:start + chunk_size], dtype=np.float64)
+        return
+    _file = sys.stdin if path == '-' else open(path)
+    try:
+        _lines = (line for line in _file
+                  if line.strip() and not line.startswith('#'))
+        _first = True
+        while True:
+            _block = list(itertools.islice(_lines, chunk_size))
+            if not _block:
+                break
+            if _first:
+                _first = False
+                try:
+                    [float(x) for x in _block[0].split(',')]
+                except ValueError:
+                    # header line
+                    _block = _block[1:]
+                    if not _block:
+                        continue
+            yield _block
+    finally:
+        if _file is not sys.stdin:
+            _file.close()
+
+
+def convert_chunk(chunk, latitude, longitude, default_time, precise=False):
+    """Converts one chunk, returns an (n, 2) array of alt, az"""
+    _times = chunk[:, 2] if chunk.shape[1] > 2 else default_time
+    if precise:
+        _alt, _az = _astropy_altaz(chunk[:, 0], chunk[:, 1], latitude,
+                                   longitude, _times)
+    else:
+        _alt, _az = astrometry.radec_to_altaz(chunk[:, 0], chunk[:, 1],
+                                              latitude, longitude, _times)
+    return np.column_stack((_alt, _az))
+
+
+def _astropy_altaz(ra, dec, latitude, longitude, unix_time):
+    from astropy import units as u
+    from astropy.time import Time
+    from astropy.coordinates import AltAz, EarthLocation, SkyCoord
+    _altaz = SkyCoord(ra=ra * u.deg, dec=dec * u.deg, frame='icrs').transform_to(
+        AltAz(obstime=Time(unix_time, format='unix'),
+              location=EarthLocation(lat=latitude * u.deg,
+                                     lon=longitude * u.deg)))
+    return _altaz.alt.degree, _altaz.az.degree
+
+
+def convert_block(block, latitude, longitude, default_time, precise=False):
+    """Parses, converts and formats one block, returns alt,az CSV text"""
+    if isinstance(block, list):
+        block = np.loadtxt(block, delimiter=',', ndmin=2)
+    _out = StringIO()
+    np.savetxt(_out, convert_chunk(block, latitude, longitude, default_time,
+                                   precise),
+               fmt='%.6f', delimiter=',')
+    return _out.getvalue()
+
+
+def _convert_job(args):
+    return convert_block(*args)
+
+
+def convert_stream(blocks, latitude, longitude, default_time, precise=False,
+                   workers=None, in_flight=None):
+    """Yields converted CSV text per block in order, using a process pool.
+
+    :param in_flight: most chunks submitted but not yet written, defaults
+        to twice the number of workers
+    """
+    workers = workers or cpu_count()
+    in_flight = in_flight or 2 * workers
+    if workers == 1:
+        for block in blocks:
+            yield convert_block(block, latitude, longitude, default_time,
+                                precise)
+        return
+    _pool = Pool(workers)
+    try:
+        _pending = deque()
+        for block in blocks:
+            _pending.append(_pool.apply_async(
+                _convert_job,
+                ((block, latitude, longitude, default_time, precise),)))
+            if len(_pending) >= in_flight:
+                yield _pending.popleft().get()
+        while _pending:
+            yield _pending.popleft().get()
+    finally:
+        _pool.terminate()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("input", help="CSV or .npy of ra,dec[,unix_time], "
+                                      "- for stdin")
+    parser.add_argument("output", help="CSV of alt,az, - for stdout")
+    parser.add_argument("--location", nargs=2, type=float,
+                        metavar=("latitude", "longitude"))
+    parser.add_argument("-d", help="Read the location from the telescope "
+                                   "on this port instead")
+    parser.add_argument("--time", type=float,
+                        help="unix time for rows without one, default now")
+    parser.add_argument("--chunk", type=int, default=DEFAULT_CHUNK)
+    parser.add_argument("--workers", type=int)
+    parser.add_argument("--precise", action="store_true",
+                        help="Use astropy (precession, nutation, "
+                             "aberration) instead of the fast conversion")
+    args = parser.parse_args()
+
+    if args.location:
+        _latitude, _longitude = args.location
+    elif args.d:
+        import telescopes
+        _telescope = telescopes.NexStarSLT130(args.d)
+        _latitude, _longitude = _telescope.get_location_lat_long()
+        _telescope.close()
+    else:
+        parser.error("one of --location or -d is required")
+    _time = args.time if args.time is not None else time.time()
+
+    _out = sys.stdout if args.output == '-' else open(args.output, 'w')
+    _rows = 0
+    _start = time.time()
+    try:
+        for text in convert_stream(read_blocks(args.input, args.chunk),
+                                   _latitude, _longitude, _time,
+                                   args.precise, args.workers):
+            _out.write(text)
+            _rows += text.count('\n')
+    finally:
+        if _out is not sys.stdout:
+            _out.close()
+    sys.stderr.write("%d rows in %.2fs\n" % (_rows, time.time() - _start))
+
+
+if __name__ == '__main__':
+    main()
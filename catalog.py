@@ -0,0 +1,216 @@
+#!/usr/bin/env python
+"""Local object catalog with name and spatial indexes.
+
+Catalogs are written as CSV (``name,ra,dec,mag,aliases,kind``, J2000
+degrees, aliases separated by ';', kind one of KINDS and optional) and
+compiled once into a .npz file of plain arrays, which is what gets loaded
+at startup.
+
+Name lookup is a binary search over sorted normalized names ("M 31",
+"m31" and "NGC224" all match). Spatially, objects are kept sorted by the
+z component of their unit vector: a cone query binary searches the z slab
+covering the cone and finishes with dot products over that slab only.
+"""
+import argparse
+import os
+from collections import namedtuple
+
+import numpy as np
+
+import astrometry
+
+DEFAULT_CATALOG = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                               "data", "catalog.csv")
+
+CatalogObject = namedtuple('CatalogObject', ['name', 'ra', 'dec', 'mag'])
+
+KINDS = ('star', 'cluster', 'nebula', 'galaxy')
+
+
+def normalize_name(name):
+    return "".join(name.lower().split())
+
+
+def read_csv(path):
+    """Parses a catalog CSV into the arrays Catalog is built from"""
+    names, ra, dec, mag, aliases, kind = [], [], [], [], [], []
+    with open(path) as _file:
+        for line_number, line in enumerate(_file, 1):
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            fields = line.split(',', 5)
+            if len(fields) < 4:
+                raise ValueError("%s:%d: expected name,ra,dec,mag" %
+                                 (path, line_number))
+            names.append(fields[0].strip())
+            ra.append(float(fields[1]))
+            dec.append(float(fields[2]))
+            mag.append(float(fields[3]))
+            aliases.append([a.strip() for a in fields[4].split(';')]
+                           if len(fields) > 4 and fields[4].strip() else [])
+            kind.append(fields[5].strip() if len(fields) > 5 else '')
+            if kind[-1] and kind[-1] not in KINDS:
+                raise ValueError("%s:%d: unknown kind %s" %
+                                 (path, line_number, kind[-1]))
+    _keys, _key_index = [], []
+    for index, (name, _aliases) in enumerate(zip(names, aliases)):
+        for alias in [name] + _aliases:
+            _keys.append(normalize_name(alias))
+            _key_index.append(index)
+    return {'names': np.array(names, dtype=np.unicode_),
+            'ra': np.array(ra, dtype=np.float64),
+            'dec': np.array(dec, dtype=np.float64),
+            'mag': np.array(mag, dtype=np.float64),
+            'kind': np.array(kind, dtype=np.unicode_),
+            'keys': np.array(_keys, dtype=np.unicode_),
+            'key_index': np.array(_key_index, dtype=np.int32)}
+
+
+def compile_catalog(csv_path, npz_path):
+    np.savez(npz_path, **read_csv(csv_path))
+
+
+class Catalog(object):
+
+    def __init__(self, names, ra, dec, mag, keys, key_index, kind=None):
+        """
+        :param kind: KINDS entry per object, '' where unknown; catalogs
+            compiled before kinds existed have none
+        """
+        self.names = names
+        self.ra = ra
+        self.dec = dec
+        self.mag = mag
+        self.kind = (kind if kind is not None
+                     else np.zeros(len(names), dtype=np.unicode_))
+        _order = np.argsort(keys)
+        self._keys = keys[_order]
+        self._key_index = key_index[_order]
+        self._vectors = astrometry.unit_vectors(ra, dec)
+        self._z_order = np.argsort(self._vectors[:, 2])
+        self._z = self._vectors[self._z_order, 2]
+
+    @classmethod
+    def load(cls, path=DEFAULT_CATALOG):
+        """Loads a .npz catalog, or a CSV through its compiled .npz.
+
+        The .npz next to a CSV is rebuilt whenever the CSV is newer; if it
+        can't be written the CSV is parsed directly.
+        """
+        if path.endswith('.npz'):
+            _arrays = np.load(path)
+            return cls(**dict((k, _arrays[k]) for k in _arrays.files))
+        _compiled = os.path.splitext(path)[0] + '.npz'
+        if (not os.path.exists(_compiled) or
+                os.path.getmtime(_compiled) < os.path.getmtime(path)):
+            try:
+                compile_catalog(path, _compiled)
+            except (IOError, OSError):
+                return cls(**read_csv(path))
+        return cls.load(_compiled)
+
+    def __len__(self):
+        return len(self.names)
+
+    def __getitem__(self, index):
+        return CatalogObject(self.names[index], float(self.ra[index]),
+                             float(self.dec[index]), float(self.mag[index]))
+
+    def find(self, name):
+        """Returns the index of the object called name, or None"""
+        _key = normalize_name(name)
+        i = np.searchsorted(self._keys, _key)
+        if i < len(self._keys) and self._keys[i] == _key:
+            return int(self._key_index[i])
+        return None
+
+    def lookup(self, name):
+        """Returns the CatalogObject called name, raises KeyError"""
+        index = self.find(name)
+        if index is None:
+            raise KeyError(name)
+        return self[index]
+
+    def complete(self, prefix, limit=50):
+        """Names (or aliases) starting with prefix, for completion"""
+        _key = normalize_name(prefix)
+        i = np.searchsorted(self._keys, _key)
+        _indices = []
+        while (i < len(self._keys) and len(_indices) < limit and
+               self._keys[i].startswith(_key)):
+            if self._key_index[i] not in _indices:
+                _indices.append(self._key_index[i])
+            i += 1
+        return [self.names[j] for j in _indices]
+
+    def cone(self, ra, dec, radius):
+        """Indices of objects within radius degrees, nearest first.
+
+        :return: (indices, separations in degrees)
+        """
+        _centre = astrometry.unit_vectors([ra], [dec])[0]
+        _cos_radius = np.cos(np.radians(radius))
+        # every point of the cone has z within the centre's dec +/- radius
+        _dec_low = max(dec - radius, -90.0)
+        _dec_high = min(dec + radius, 90.0)
+        _low = np.searchsorted(self._z, np.sin(np.radians(_dec_low)), 'left')
+        _high = np.searchsorted(self._z, np.sin(np.radians(_dec_high)),
+                                'right')
+        _candidates = self._z_order[_low:_high]
+        _dots = self._vectors[_candidates].dot(_centre)
+        _inside = _dots >= _cos_radius
+        _candidates, _dots = _candidates[_inside], _dots[_inside]
+        _order = np.argsort(-_dots)
+        return (_candidates[_order],
+                np.degrees(np.arccos(np.clip(_dots[_order], -1.0, 1.0))))
+
+    def nearest(self, ra, dec, max_radius=10.0, max_mag=None):
+        """Nearest object to ra/dec within max_radius degrees.
+
+        Searches growing cones so the usual case touches few objects.
+
+        :return: (CatalogObject, separation in degrees) or (None, None)
+        """
+        _radius = 0.25
+        while True:
+            _radius = min(_radius, max_radius)
+            _indices, _separations = self.cone(ra, dec, _radius)
+            if max_mag is not None:
+                _bright = self.mag[_indices] <= max_mag
+                _indices, _separations = (_indices[_bright],
+                                          _separations[_bright])
+            if len(_indices):
+                return self[_indices[0]], float(_separations[0])
+            if _radius >= max_radius:
+                return None, None
+            _radius *= 4.0
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--catalog", default=DEFAULT_CATALOG)
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument("--compile", nargs=2, metavar=("csv", "npz"))
+    group.add_argument("--lookup", metavar="name")
+    group.add_argument("--nearest", nargs=2, metavar=("ra", "dec"))
+    group.add_argument("--cone", nargs=3, metavar=("ra", "dec", "radius"))
+    args = parser.parse_args()
+
+    if args.compile:
+        compile_catalog(*args.compile)
+        return
+    catalog = Catalog.load(args.catalog)
+    if args.lookup:
+        print(catalog.lookup(args.lookup))
+    elif args.nearest:
+        print(catalog.nearest(float(args.nearest[0]), float(args.nearest[1])))
+    elif args.cone:
+        for index, separation in zip(*catalog.cone(*map(float, args.cone))):
+            print("%s %.3f" % (catalog.names[index], separation))
+    else:
+        print(parser.print_help())
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,164 @@
+"""Prioritized command scheduling for the serial link.
+
+All exchanges with the mount go through one worker thread that always sends
+the most urgent queued command next. The hand controller answers one
+command at a time, so a safety command (cancel, zero-rate slew) waits for
+at most the exchange already on the wire. Routine queries can be held to a
+link budget so polling never saturates the 9600 baud line.
+"""
+import heapq
+import itertools
+import threading
+import time
+
+import timing
+
+PRIORITY_SAFETY = 0
+PRIORITY_CONTROL = 1
+PRIORITY_QUERY = 2
+
+
+class CommandCancelled(Exception):
+    """Raised for a queued command dropped by a flushing safety command"""
+
+
+class CommandRequest(object):
+
+    def __init__(self, priority, sequence, command, reply_length):
+        self.priority = priority
+        self.sequence = sequence
+        self.command = command
+        self.reply_length = reply_length
+        self.reply = None
+        self.error = None
+        # monotonic times, see timing.py
+        self.enqueued = timing.monotonic()
+        self.sent = None
+        self.received = None
+        self.done = threading.Event()
+
+    def __lt__(self, other):
+        return ((self.priority, self.sequence) <
+                (other.priority, other.sequence))
+
+    def result(self, timeout=None):
+        if not self.done.wait(timeout):
+            raise CommandCancelled("no reply within %ss" % timeout)
+        if self.error is not None:
+            raise self.error
+        return self.reply
+
+
+class CommandScheduler(object):
+
+    def __init__(self, send, read, link_budget=None, burst=0.5):
+        """
+        :param send: callable(command) writing to the link
+        :param read: callable(n_bytes) returning the reply
+        :param link_budget: bytes per second allowed for PRIORITY_QUERY
+            exchanges (command and reply), None for no limit
+        :param burst: seconds worth of budget that may be used at once
+        """
+        self._send = send
+        self._read = read
+        self.link_budget = link_budget
+        self._capacity = link_budget * burst if link_budget else None
+        self._tokens = self._capacity
+        self._refilled = time.time()
+        self._queue = []
+        self._sequence = itertools.count()
+        self._condition = threading.Condition()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def submit(self, command, reply_length, priority=PRIORITY_QUERY,
+               flush=False):
+        """Queues a command, returns its CommandRequest.
+
+        :param flush: drop every queued PRIORITY_CONTROL command first,
+            failing them with CommandCancelled (used by cancel so no stale
+            goto or slew runs after it); queued queries are kept
+        """
+        _request = CommandRequest(priority, next(self._sequence), command,
+                                  reply_length)
+        with self._condition:
+            if self._closed:
+                raise CommandCancelled("command scheduler closed")
+            if flush:
+                _kept = []
+                for queued in self._queue:
+                    if queued.priority != PRIORITY_CONTROL:
+                        _kept.append(queued)
+                    else:
+                        queued.error = CommandCancelled(
+                            "flushed by %r" % command)
+                        queued.done.set()
+                heapq.heapify(_kept)
+                self._queue = _kept
+            heapq.heappush(self._queue, _request)
+            self._condition.notify()
+        return _request
+
+    def exchange(self, command, reply_length, priority=PRIORITY_QUERY,
+                 flush=False, timeout=None):
+        """Queues a command and blocks until its reply arrives"""
+        return self.submit(command, reply_length, priority,
+                           flush).result(timeout)
+
+    def _refill(self):
+        _now = time.time()
+        self._tokens = min(self._capacity, self._tokens +
+                           (_now - self._refilled) * self.link_budget)
+        self._refilled = _now
+
+    def _next(self):
+        """Pops the next request to send, waiting for budget if needed"""
+        with self._condition:
+            while True:
+                if self._closed:
+                    return None
+                if not self._queue:
+                    self._condition.wait()
+                    continue
+                _request = self._queue[0]
+                if _request.priority < PRIORITY_QUERY or self._capacity is None:
+                    return heapq.heappop(self._queue)
+                self._refill()
+                _cost = len(_request.command) + _request.reply_length
+                if self._tokens >= min(_cost, self._capacity):
+                    self._tokens -= _cost
+                    return heapq.heappop(self._queue)
+                # sleep until the budget allows it, or something more
+                # urgent is submitted
+                self._condition.wait((_cost - self._tokens) / self.link_budget)
+
+    def _run(self):
+        while True:
+            _request = self._next()
+            if _request is None:
+                return
+            try:
+                _request.sent = timing.monotonic()
+                self._send(_request.command)
+                _request.reply = self._read(_request.reply_length)
+                _request.received = timing.monotonic()
+            except Exception as e:
+                _request.error = e
+            _request.done.set()
+
+    def pending(self):
+        with self._condition:
+            return len(self._queue)
+
+    def close(self):
+        """Stops the worker, failing anything still queued"""
+        with self._condition:
+            self._closed = True
+            for queued in self._queue:
+                queued.error = CommandCancelled("command scheduler closed")
+                queued.done.set()
+            self._queue = []
+            self._condition.notify()
+        self._thread.join()
@@ -0,0 +1,194 @@
+#!/usr/bin/env python
+"""NexStar hand-controller emulator.
+
+MountEmulator answers the commands in protocol.PROTOCOL from a small
+mount state: gotos arrive instantly (after busy_polls 'L' polls report a
+goto in progress), slews are acknowledged, passthrough axis queries read
+the alt/az position. It takes the command byte stream in any chunking,
+so it can sit behind transport.LoopbackTransport, or behind a TCP socket
+with EmulatorServer to stand in for a network-attached mount.
+"""
+import SocketServer
+import argparse
+import socket
+import struct
+import threading
+
+import protocol
+
+
+def _command_lengths(table):
+    """Bytes in each command, by its first byte, from the protocol table"""
+    _lengths = {}
+    for _name, opcode, layout, _converter, _reply_length, _decoder in table:
+        if layout is None:
+            _arguments = 0
+        elif layout == 'precise':
+            _arguments = len('XXXXXXXX,XXXXXXXX')
+        else:
+            _arguments = struct.calcsize('>' + layout)
+        _lengths[opcode[0]] = len(opcode) + _arguments
+    return _lengths
+
+
+COMMAND_LENGTHS = _command_lengths(protocol.PROTOCOL)
+
+
+class MountEmulator(object):
+
+    def __init__(self, busy_polls=0):
+        """
+        :param busy_polls: 'L' polls that report a goto in progress after
+            each goto
+        """
+        self.busy_polls = busy_polls
+        self.ra = self.dec = 0
+        self.az = self.alt = 0
+        self.tracking_mode = 0
+        self.location = '\x00' * 8
+        self.time = '\x00' * 8
+        self.version = (4, 21)
+        self.model = 11
+        self.aligned = True
+        self.received = []
+        self._busy = 0
+        self._buffer = ''
+        self._lock = threading.Lock()
+
+    def feed(self, data):
+        """Takes bytes from the host, returns the replies they complete"""
+        with self._lock:
+            self._buffer += data
+            _replies = []
+            while self._buffer:
+                _length = COMMAND_LENGTHS.get(self._buffer[0], 1)
+                if len(self._buffer) < _length:
+                    break
+                _command = self._buffer[:_length]
+                self._buffer = self._buffer[_length:]
+                self.received.append(_command)
+                _replies.append(self.reply(_command))
+            return ''.join(_replies)
+
+    def reply(self, command):
+        _opcode = command[0]
+        if _opcode in 'ez':
+            return '%08X,%08X#' % ((self.ra, self.dec) if _opcode == 'e'
+                                   else (self.az, self.alt))
+        if _opcode in 'rbs':
+            _first, _second = int(command[1:9], 16), int(command[10:18], 16)
+            if _opcode == 'b':
+                self.az, self.alt = _first, _second
+            else:
+                self.ra, self.dec = _first, _second
+            if _opcode != 's':
+                self._busy = self.busy_polls
+            return '#'
+        if _opcode == 'L':
+            _busy = self._busy > 0
+            self._busy = max(self._busy - 1, 0)
+            return '1#' if _busy else '0#'
+        if _opcode == 'P':
+            return self._passthrough(command)
+        if _opcode == 't':
+            return chr(self.tracking_mode) + '#'
+        if _opcode == 'T':
+            self.tracking_mode = ord(command[1])
+        elif _opcode == 'w':
+            return self.location + '#'
+        elif _opcode == 'W':
+            self.location = command[1:9]
+        elif _opcode == 'h':
+            return self.time + '#'
+        elif _opcode == 'H':
+            self.time = command[1:9]
+        elif _opcode == 'V':
+            return chr(self.version[0]) + chr(self.version[1]) + '#'
+        elif _opcode == 'm':
+            return chr(self.model) + '#'
+        elif _opcode == 'K':
+            return command[1] + '#'
+        elif _opcode == 'J':
+            return chr(self.aligned) + '#'
+        elif _opcode == 'M':
+            self._busy = 0
+        return '#'
+
+    def _passthrough(self, command):
+        _device, _message = ord(command[2]), ord(command[3])
+        if command[1] != '\x01':
+            # variable and fixed rate slews
+            return '#'
+        if _message == 0x01:
+            _counts = (self.az if _device == protocol.AZIMUTH_DEVICE
+                       else self.alt) >> 8
+            return struct.pack('>I', _counts)[1:] + '#'
+        if _message == 0x13:
+            return ('\x00' if self._busy else '\xff') + '#'
+        return '\x00#'
+
+
+class _Handler(SocketServer.BaseRequestHandler):
+
+    def handle(self):
+        self.request.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        while True:
+            _data = self.request.recv(4096)
+            if not _data:
+                return
+            _reply = self.server.emulator.feed(_data)
+            if _reply:
+                self.request.sendall(_reply)
+
+
+class EmulatorServer(SocketServer.ThreadingTCPServer):
+    """Serves one MountEmulator over TCP, one thread per connection"""
+
+    allow_reuse_address = True
+    daemon_threads = True
+
+    def __init__(self, emulator=None, address=('127.0.0.1', 0)):
+        SocketServer.ThreadingTCPServer.__init__(self, address, _Handler)
+        self.emulator = emulator if emulator is not None else MountEmulator()
+        self._thread = None
+
+    @property
+    def url(self):
+        return 'tcp://%s:%d' % self.server_address[:2]
+
+    def start(self):
+        """Serves from a background thread"""
+        self._thread = threading.Thread(target=self.serve_forever)
+        self._thread.daemon = True
+        self._thread.start()
+        return self
+
+    def close(self):
+        if self._thread is not None:
+            self.shutdown()
+            self._thread.join()
+        self.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Serve an emulated NexStar hand controller over TCP")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=2000)
+    parser.add_argument("--busy_polls", type=int, default=0,
+                        help="Goto-in-progress polls answered with 1 "
+                             "after each goto")
+    args = parser.parse_args()
+    server = EmulatorServer(MountEmulator(args.busy_polls),
+                            (args.host, args.port))
+    print "serving on %s" % server.url
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,133 @@
+"""Per-night solar system ephemeris cache.
+
+Topocentric RA/Dec of the Moon and planets is computed locally with
+astropy's built-in ephemeris (no network) once per site and night on a
+coarse time grid, saved as .npz, and linearly interpolated on lookup.
+A lookup is a few float operations on Python lists instead of a full
+ephemeris evaluation.
+
+With the default 15 minute step the interpolation error stays within a
+few arcseconds even for the Moon, whose topocentric motion bends the
+most; far below what a goto resolves.
+
+The Sun is deliberately not offered: a goto to it would point the
+optics at it.
+"""
+import math
+import os
+
+import numpy as np
+
+import viscache
+
+CACHE_PATH = os.path.expanduser("~/.nexstar_ephemeris")
+
+BODIES = ('moon', 'mercury', 'venus', 'mars', 'jupiter', 'saturn', 'uranus',
+          'neptune')
+
+DAY = 86400.0
+
+
+def is_body(name):
+    return name.strip().lower() in BODIES
+
+
+def night_start(unix_time, longitude):
+    """Unix time of the local solar noon that starts the night containing
+    unix_time, the same night viscache.night_key names"""
+    _offset = longitude / 15.0 * 3600.0 - 12 * 3600.0
+    return math.floor((unix_time + _offset) / DAY) * DAY - _offset
+
+
+def compute_night(latitude, longitude, start, step, bodies=BODIES):
+    """Topocentric RA/Dec of bodies every step seconds over one day.
+
+    :return: (times, ra, dec), ra and dec (bodies x times) in degrees
+    """
+    from astropy import units as u
+    from astropy.coordinates import EarthLocation, get_body
+    from astropy.time import Time
+
+    _times = start + step * np.arange(int(DAY / step) + 1)
+    _location = EarthLocation(lat=latitude * u.deg, lon=longitude * u.deg)
+    _obstime = Time(_times, format='unix')
+    _ra = np.empty((len(bodies), len(_times)))
+    _dec = np.empty_like(_ra)
+    for i, body in enumerate(bodies):
+        # GCRS seen from the site: topocentric, so the Moon's parallax
+        # is included
+        _coordinates = get_body(body, _obstime, _location)
+        _ra[i] = _coordinates.ra.degree
+        _dec[i] = _coordinates.dec.degree
+    return _times, _ra, _dec
+
+
+class EphemerisCache(object):
+
+    def __init__(self, latitude, longitude, path=CACHE_PATH, step=900.0):
+        """
+        :param latitude: site latitude in degrees
+        :param longitude: site longitude in degrees, east positive
+        :param path: cache root directory
+        :param step: grid step in seconds
+        """
+        self.latitude = latitude
+        self.longitude = longitude
+        self.step = step
+        self.path = os.path.join(path, viscache.site_key(latitude, longitude))
+        self._t0 = None
+        self._ra = None
+        self._dec = None
+
+    @classmethod
+    def for_telescope(cls, telescope, path=CACHE_PATH, step=900.0):
+        """Cache for the site the telescope reports"""
+        _location = telescope.get_earth_location()
+        return cls(_location.lat.degree, _location.lon.degree, path, step)
+
+    def _night_path(self, start):
+        return os.path.join(self.path, "%s.npz" %
+                            viscache.night_key(start, self.longitude))
+
+    def _load_night(self, start):
+        """Makes the night starting at start the interpolated one"""
+        _path = self._night_path(start)
+        _ra = _dec = None
+        if os.path.exists(_path):
+            _cached = np.load(_path)
+            if (float(_cached['step']) == self.step and
+                    float(_cached['t0']) == start and
+                    tuple(_cached['bodies']) == BODIES):
+                _ra, _dec = _cached['ra'], _cached['dec']
+        if _ra is None:
+            _, _ra, _dec = compute_night(self.latitude, self.longitude,
+                                         start, self.step)
+            if not os.path.isdir(self.path):
+                os.makedirs(self.path)
+            _tmp = _path[:-len(".npz")] + ".tmp.npz"
+            np.savez(_tmp, t0=start, step=self.step, bodies=np.array(BODIES),
+                     ra=_ra, dec=_dec)
+            os.rename(_tmp, _path)
+        # unwrapped RA so interpolation across 0/360 stays linear; plain
+        # lists index faster than arrays for single lookups
+        self._ra = dict(zip(BODIES, np.degrees(
+            np.unwrap(np.radians(_ra), axis=1)).tolist()))
+        self._dec = dict(zip(BODIES, _dec.tolist()))
+        self._t0 = start
+
+    def position(self, body, unix_time):
+        """RA/Dec of body at unix_time in degrees, raises KeyError for
+        anything not in BODIES"""
+        _body = body.strip().lower()
+        if _body not in BODIES:
+            raise KeyError(body)
+        _offset = unix_time - self._t0 if self._t0 is not None else -1.0
+        if not 0.0 <= _offset <= DAY:
+            self._load_night(night_start(unix_time, self.longitude))
+            _offset = unix_time - self._t0
+        _position = _offset / self.step
+        i = min(int(_position), len(self._dec[_body]) - 2)
+        _fraction = _position - i
+        _ra, _dec = self._ra[_body], self._dec[_body]
+        return ((_ra[i] + (_ra[i + 1] - _ra[i]) * _fraction) % 360.0,
+                _dec[i] + (_dec[i + 1] - _dec[i]) * _fraction)
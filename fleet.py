@@ -0,0 +1,155 @@
+#!/usr/bin/env python
+"""Controls several mounts at once.
+
+Every mount gets its own worker thread, so commands broadcast to the fleet
+take as long as the slowest mount instead of the sum of all of them. Serial
+I/O releases the GIL, which is all the concurrency the wire needs.
+"""
+import argparse
+import time
+from collections import namedtuple
+from multiprocessing.pool import ThreadPool
+
+import telescopes
+
+MountResult = namedtuple('MountResult', ['device', 'value', 'error', 'elapsed'])
+
+
+class FleetTiming(namedtuple('FleetTiming', ['wall', 'per_mount'])):
+    """Wall clock time of a broadcast and the time each mount took"""
+
+    @property
+    def sequential(self):
+        return sum(self.per_mount)
+
+    @property
+    def speedup(self):
+        return self.sequential / self.wall if self.wall else 1.0
+
+    def __str__(self):
+        return ("%d mounts: %.3fs wall, %.3fs sequential, %.1fx speedup" %
+                (len(self.per_mount), self.wall, self.sequential,
+                 self.speedup))
+
+
+def _timed(function, device, args):
+    _start = time.time()
+    try:
+        return MountResult(device, function(*args), None, time.time() - _start)
+    except Exception as e:
+        return MountResult(device, None, e, time.time() - _start)
+
+
+class Fleet(object):
+
+    def __init__(self, devices, telescope_class=telescopes.NexStarSLT130):
+        """Opens all devices concurrently.
+
+        :param devices: serial devices, one per mount
+        :param telescope_class: driver class instantiated per device
+        """
+        self.devices = list(devices)
+        self.pool = ThreadPool(len(self.devices))
+        self.last_timing = None
+        _opened = self._run([(telescope_class, d, (d,)) for d in self.devices])
+        _failed = [r for r in _opened if r.error is not None]
+        if _failed:
+            for result in _opened:
+                if result.error is None:
+                    result.value.close()
+            self.pool.close()
+            raise telescopes.TelescopeError(
+                "could not open %s" % ", ".join(
+                    "%s (%s)" % (r.device, r.error) for r in _failed))
+        self.telescopes = [r.value for r in _opened]
+
+    def _run(self, jobs):
+        """Runs (function, device, args) jobs in parallel, keeps order"""
+        _start = time.time()
+        _pending = [self.pool.apply_async(_timed, job) for job in jobs]
+        results = [p.get() for p in _pending]
+        self.last_timing = FleetTiming(time.time() - _start,
+                                       [r.elapsed for r in results])
+        return results
+
+    def broadcast(self, method, *args):
+        """Calls telescope.method(*args) on every mount concurrently.
+
+        :return: list of MountResult in device order; errors are returned
+            per mount rather than raised so one bad mount can't stop the
+            rest of the fleet.
+        """
+        return self._run([(getattr(t, method), d, args)
+                          for t, d in zip(self.telescopes, self.devices)])
+
+    def goto_ra_dec(self, _ra, _dec):
+        return self.broadcast('goto_ra_dec', _ra, _dec)
+
+    def sync(self, _ra, _dec):
+        return self.broadcast('sync', _ra, _dec)
+
+    def cancel_all(self):
+        return self.broadcast('cancel_goto')
+
+    def wait_all(self, timeout=None):
+        return self.broadcast('wait_for_goto', None, timeout)
+
+    def status(self):
+        """Gathers position and goto state from all mounts in parallel"""
+        return self._run([(_status, d, (t,))
+                          for t, d in zip(self.telescopes, self.devices)])
+
+    def close(self):
+        for telescope in self.telescopes:
+            telescope.close()
+        self.pool.close()
+        self.pool.join()
+
+
+def _status(telescope):
+    return {'ra_dec': telescope.get_ra_dec(),
+            'alt_az': telescope.get_alt_az(),
+            'goto_in_progress': telescope.goto_in_progress(),
+            'tracking_mode': telescope.get_tracking_mode()}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-d", action="append", required=True,
+                        help="Port a telescope is connected to, repeat "
+                             "for every mount")
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument("--status", action="store_true")
+    group.add_argument("--goto_radec", nargs=2, metavar=("Ra", "Dec"))
+    group.add_argument("--sync", nargs=2, metavar=("ra", "dec"))
+    group.add_argument("--cancel_goto", action="store_true")
+    group.add_argument("--wait_for_goto", action="store_true")
+    args = parser.parse_args()
+
+    fleet = Fleet(args.d)
+    print("open: %s" % fleet.last_timing)
+    try:
+        if args.goto_radec:
+            _results = fleet.goto_ra_dec(float(args.goto_radec[0]),
+                                         float(args.goto_radec[1]))
+        elif args.sync:
+            _results = fleet.sync(float(args.sync[0]), float(args.sync[1]))
+        elif args.cancel_goto:
+            _results = fleet.cancel_all()
+        elif args.wait_for_goto:
+            _results = fleet.wait_all()
+        else:
+            _results = fleet.status()
+        for result in _results:
+            if result.error is not None:
+                print("%s: error %s" % (result.device, result.error))
+            else:
+                print("%s: %s (%.3fs)" % (result.device, result.value,
+                                          result.elapsed))
+        print(fleet.last_timing)
+    finally:
+        fleet.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+"""Horizon and obstruction mask.
+
+The lowest safe altitude is kept in a table indexed by azimuth, so a
+position check is one multiply and one list lookup. Whole slew paths are
+checked at once with numpy.
+"""
+import numpy as np
+
+import slewmodel
+
+
+class HorizonMask(object):
+
+    def __init__(self, min_altitudes, max_altitude=90.0):
+        """
+        :param min_altitudes: lowest safe altitude in degrees for each of
+            len(min_altitudes) equal azimuth bins starting at north
+        :param max_altitude: highest safe altitude in degrees
+        """
+        self.min_altitudes = np.asarray(min_altitudes, dtype=np.float64)
+        self.max_altitude = max_altitude
+        self._bins = len(self.min_altitudes)
+        self._scale = self._bins / 360.0
+        # plain list for the scalar path, indexing it beats numpy
+        self._table = self.min_altitudes.tolist()
+
+    @classmethod
+    def flat(cls, min_altitude=0.0, max_altitude=90.0):
+        return cls([min_altitude], max_altitude)
+
+    @classmethod
+    def from_points(cls, points, max_altitude=90.0, resolution=0.1):
+        """Builds a mask from (az, alt) points, interpolated linearly
+
+        :param resolution: azimuth bin width in degrees
+        """
+        _points = np.asarray(points, dtype=np.float64)
+        _bins = int(round(360.0 / resolution))
+        _centres = (np.arange(_bins) + 0.5) * (360.0 / _bins)
+        return cls(np.interp(_centres, _points[:, 0], _points[:, 1],
+                             period=360.0), max_altitude)
+
+    @classmethod
+    def load(cls, path, max_altitude=90.0, resolution=0.1):
+        """Reads 'az alt' lines (degrees, '#' comments) from a file"""
+        _points = []
+        with open(path) as _file:
+            for line in _file:
+                line = line.split('#', 1)[0].strip()
+                if line:
+                    _points.append([float(x) for x in
+                                    line.replace(',', ' ').split()[:2]])
+        return cls.from_points(_points, max_altitude, resolution)
+
+    def limit(self, az):
+        """Lowest safe altitude at azimuth az (scalar)"""
+        return self._table[int(az * self._scale) % self._bins]
+
+    def limits(self, az):
+        """Lowest safe altitudes for an array of azimuths"""
+        _index = (np.asarray(az) * self._scale).astype(np.int64) % self._bins
+        return self.min_altitudes[_index]
+
+    def is_safe(self, az, alt):
+        return (self._table[int(az * self._scale) % self._bins] <= alt <=
+                self.max_altitude)
+
+    def rates_are_safe(self, az, alt, az_rate, alt_rate, lookahead=2.0):
+        """Checks where a rate slew from (az, alt) will be after lookahead
+        seconds, rates in degrees per second. Cheap enough to call on
+        every rate update of a tracking loop.
+        """
+        return self.is_safe((az + az_rate * lookahead) % 360.0,
+                            alt + alt_rate * lookahead)
+
+    def are_safe(self, az, alt):
+        _alt = np.asarray(alt)
+        return (self.limits(az) <= _alt) & (_alt <= self.max_altitude)
+
+    def path_is_safe(self, az0, alt0, az1, alt1, slew_model=None,
+                     samples=64):
+        """Checks the whole predicted goto path from (az0, alt0).
+
+        Both axes move together and may finish at different times, so the
+        path is generally not a straight line in alt/az; slew_model
+        predicts it (the default model if None).
+        """
+        if slew_model is None:
+            slew_model = slewmodel.SlewModel()
+        _az, _alt = slew_model.path(az0, alt0, az1, alt1, samples)
+        return bool(self.are_safe(_az, _alt).all())
@@ -0,0 +1,234 @@
+#!/usr/bin/env python
+"""Manual control from a joystick, gamepad or event stream.
+
+Input events only update the wanted rate of an axis. A sender thread sends
+a slew command for an axis when its wanted rate differs from the one last
+sent, at most send_rate times per second; a burst of stick movement in
+between collapses into its latest value. When the link is idle the first
+change goes out at once, so stick to motion latency is one command time.
+"""
+import argparse
+import struct
+import sys
+import threading
+import time
+
+import telescopes
+
+AXES = ('az', 'el')
+
+# struct js_event from linux/joystick.h
+_JS_EVENT = struct.Struct('<IhBB')
+_JS_EVENT_AXIS = 0x02
+_JS_EVENT_INIT = 0x80
+_JS_AXIS_MAX = 32767.0
+
+
+def read_joystick(path="/dev/input/js0", axis_map=None):
+    """Yields (axis, value) from a Linux joystick device, value in [-1, 1]
+
+    :param axis_map: joystick axis number to 'az'/'el', default 0 and 1
+    """
+    axis_map = axis_map or {0: 'az', 1: 'el'}
+    with open(path, 'rb') as _device:
+        while True:
+            _event = _device.read(_JS_EVENT.size)
+            if len(_event) < _JS_EVENT.size:
+                return
+            _, _value, _type, _number = _JS_EVENT.unpack(_event)
+            if (_type & ~_JS_EVENT_INIT) == _JS_EVENT_AXIS and \
+                    _number in axis_map:
+                yield axis_map[_number], _value / _JS_AXIS_MAX
+
+
+def read_lines(stream):
+    """Yields (axis, value) from 'az 0.5' / 'el -1' lines, value in [-1, 1]"""
+    for line in stream:
+        _fields = line.split()
+        if len(_fields) != 2 or _fields[0] not in AXES:
+            continue
+        yield _fields[0], max(-1.0, min(1.0, float(_fields[1])))
+
+
+class RateMapper(object):
+
+    def __init__(self, max_rate=3600, deadzone=0.1, expo=2.0, fixed=False):
+        """
+        :param max_rate: arcsec/s at full deflection for variable rate
+            slews; ignored for fixed rates, which go up to 9
+        :param deadzone: deflection below which the axis is stopped
+        :param expo: response curve exponent, >1 gives finer control
+            near the centre
+        :param fixed: map to the hand controller's fixed rates 0-9
+        """
+        self.max_rate = max_rate
+        self.deadzone = deadzone
+        self.expo = expo
+        self.fixed = fixed
+
+    def __call__(self, value):
+        _magnitude = abs(value)
+        if _magnitude <= self.deadzone:
+            return 0
+        _scaled = ((_magnitude - self.deadzone) /
+                   (1.0 - self.deadzone)) ** self.expo
+        _rate = int(round(_scaled * (9 if self.fixed else self.max_rate)))
+        return _rate if value > 0 else -_rate
+
+
+class ManualControl(object):
+
+    def __init__(self, telescope, mapper=None, send_rate=10.0,
+                 on_error=None):
+        """
+        :param telescope: connected NexStarSLT130
+        :param mapper: RateMapper turning deflection into axis rates
+        :param send_rate: most slew commands per second, per axis
+        :param on_error: called with the exception if sending fails; the
+            sender then tries to stop both axes and quits, and close()
+            raises the exception
+        """
+        self.telescope = telescope
+        self.mapper = mapper or RateMapper()
+        self.min_interval = 1.0 / send_rate
+        self.wanted = {'az': 0, 'el': 0}
+        self.sent = {'az': 0, 'el': 0}
+        self.commands_sent = 0
+        self.on_error = on_error
+        self.error = None
+        self._last_send = {'az': 0.0, 'el': 0.0}
+        self._changed = threading.Condition()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def set_axis(self, axis, value):
+        """Sets the wanted deflection of an axis, value in [-1, 1]"""
+        _rate = self.mapper(value)
+        with self._changed:
+            if self.wanted[axis] != _rate:
+                self.wanted[axis] = _rate
+                self._changed.notify()
+
+    def feed(self, events):
+        """Consumes (axis, value) events until they run out"""
+        for axis, value in events:
+            self.set_axis(axis, value)
+
+    def _send(self, axis, rate):
+        _direction = (self.telescope.DIR_AZIMUTH if axis == 'az'
+                      else self.telescope.DIR_ELEVATION)
+        if self.mapper.fixed:
+            self.telescope._fixed_slew_command(_direction, rate)
+        else:
+            self.telescope._var_slew_command(_direction, rate)
+        self.commands_sent += 1
+
+    def _due(self, now):
+        """Axes whose rate changed and may be sent, and the next deadline"""
+        _due, _wake = [], None
+        for axis in AXES:
+            if self.wanted[axis] == self.sent[axis]:
+                continue
+            _ready = self._last_send[axis] + self.min_interval
+            # a stop is never held back
+            if self.wanted[axis] == 0 or _ready <= now:
+                _due.append((axis, self.wanted[axis]))
+            else:
+                _wake = _ready if _wake is None else min(_wake, _ready)
+        return _due, _wake
+
+    def _run(self):
+        try:
+            self._send_changes()
+        except Exception as e:
+            self.error = e
+            self._stop_axes()
+            if self.on_error is not None:
+                self.on_error(e)
+
+    def _stop_axes(self):
+        """Best effort zero rates after a failed send"""
+        for axis in AXES:
+            try:
+                self._send(axis, 0)
+            except Exception:
+                continue
+            self.sent[axis] = 0
+
+    def _send_changes(self):
+        while True:
+            with self._changed:
+                while True:
+                    _due, _wake = self._due(time.time())
+                    if _due or self._closed:
+                        break
+                    self._changed.wait(None if _wake is None
+                                       else _wake - time.time())
+                if self._closed and not _due:
+                    return
+            for axis, rate in _due:
+                self._send(axis, rate)
+                self._last_send[axis] = time.time()
+                self.sent[axis] = rate
+            if hasattr(self.telescope, '_command_motion'):
+                self.telescope._command_motion(
+                    'slew_fixed' if self.mapper.fixed else 'slew_var',
+                    (self.sent['az'], self.sent['el']))
+
+    def close(self):
+        """Stops both axes and the sender thread, raises the error that
+        stopped the sender if there was one"""
+        with self._changed:
+            if self._closed:
+                return
+            self.wanted = {'az': 0, 'el': 0}
+            self._closed = True
+            self._changed.notify()
+        self._thread.join()
+        if self.error is not None:
+            raise self.error
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-d", default="/dev/ttyUSB0",
+                        help="Port telescope is connected to."
+                             "Default = /dev/ttyUSB0")
+    parser.add_argument("--input", default="/dev/input/js0",
+                        help="Joystick device, or - for 'az|el value' "
+                             "lines on stdin")
+    parser.add_argument("--az_axis", type=int, default=0)
+    parser.add_argument("--el_axis", type=int, default=1)
+    parser.add_argument("--fixed", action="store_true",
+                        help="Use the fixed rates 0-9 instead of "
+                             "variable rates")
+    parser.add_argument("--max_rate", type=int, default=3600,
+                        help="arcsec/s at full deflection")
+    parser.add_argument("--send_rate", type=float, default=10.0,
+                        help="Most commands per second per axis")
+    args = parser.parse_args()
+
+    if args.input == '-':
+        _events = read_lines(sys.stdin)
+    else:
+        _events = read_joystick(args.input, {args.az_axis: 'az',
+                                             args.el_axis: 'el'})
+    telescope = telescopes.NexStarSLT130(args.d)
+    control = ManualControl(telescope, RateMapper(args.max_rate,
+                                                  fixed=args.fixed),
+                            args.send_rate,
+                            on_error=lambda e: sys.stderr.write(
+                                "sending failed, stopped: %s\n" % e))
+    try:
+        control.feed(_events)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        control.close()
+        telescope.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,230 @@
+"""Motion watchdog fed by the driver's position stream.
+
+The watchdog listens to the 'e', 'z' and 'L' replies the driver already
+reads for whoever is polling (the shell status line, a goto wait loop, a
+tracking loop) and compares each sample with the motion last commanded.
+It never sends a query of its own, so it adds no link traffic; detection
+latency is one poll interval.
+
+A trip stops the mount (cancel_goto, then zero-rate slews on both axes)
+from the thread that delivered the offending sample.
+"""
+import math
+import time
+from collections import namedtuple
+
+import astrometry
+
+SIDEREAL_RATE = 360.0 / 86164.0905
+
+# degrees per second of the hand controller's fixed slew rates 0-9
+FIXED_RATES = (0.0, 0.5 * SIDEREAL_RATE, SIDEREAL_RATE, 4 * SIDEREAL_RATE,
+               8 * SIDEREAL_RATE, 16 * SIDEREAL_RATE, 64 * SIDEREAL_RATE,
+               0.5, 2.0, 4.0)
+
+Trip = namedtuple('Trip', ['kind', 'detail', 'time'])
+
+
+def _wrap(delta):
+    return (delta + 180.0) % 360.0 - 180.0
+
+
+def _distance(a0, b0, a1, b1):
+    """Small-angle separation of two (longitude, latitude) pairs"""
+    _da = _wrap(a1 - a0) * math.cos(math.radians((b0 + b1) / 2.0))
+    return math.hypot(_da, b1 - b0)
+
+
+def commanded_rates(motion):
+    """(az, alt) rates in degrees per second asked for by a slew motion"""
+    if motion.kind == 'slew_var':
+        return motion.values[0] / 3600.0, motion.values[1] / 3600.0
+    return tuple(math.copysign(FIXED_RATES[int(abs(v))], v)
+                 for v in motion.values)
+
+
+class MotionWatchdog(object):
+
+    def __init__(self, telescope, horizon_mask=None, location=None,
+                 stall_time=3.0, stall_distance=0.05, overshoot=2.0,
+                 arrive_distance=0.5, max_az_travel=360.0, runaway_rate=1.0,
+                 wrong_way_rate=0.1, min_rate_interval=0.2, on_trip=None):
+        """
+        :param telescope: NexStarSLT130 (anything with add_stream_listener
+            and commanded_motion)
+        :param horizon_mask: horizon.HorizonMask to enforce, or None
+        :param location: site (latitude, longitude); read from the mount
+            once when None, needed to follow RA/Dec gotos in alt/az
+        :param stall_time: seconds a commanded motion may go without
+            moving stall_distance degrees
+        :param overshoot: degrees a goto may move back away from its target
+        :param arrive_distance: degrees from the target at which a goto
+            counts as arrived and is no longer watched
+        :param max_az_travel: degrees of azimuth one motion may turn
+            through before it is treated as a cable wrap runaway
+        :param runaway_rate: degrees per second an axis may exceed its
+            commanded slew rate by
+        :param wrong_way_rate: degrees per second an axis may move against
+            its commanded direction
+        :param min_rate_interval: shortest sample spacing in seconds used
+            to estimate axis rates
+        :param on_trip: called with the Trip after the mount is stopped
+        """
+        self.telescope = telescope
+        self.horizon_mask = horizon_mask
+        self.location = location
+        self.stall_time = stall_time
+        self.stall_distance = stall_distance
+        self.overshoot = overshoot
+        self.arrive_distance = arrive_distance
+        self.max_az_travel = max_az_travel
+        self.runaway_rate = runaway_rate
+        self.wrong_way_rate = wrong_way_rate
+        self.min_rate_interval = min_rate_interval
+        self.on_trip = on_trip
+        self.trips = []
+        self._motion = None
+        self._attached = False
+
+    def attach(self):
+        if self.location is None:
+            self.location = self.telescope.get_location_lat_long()
+        self.telescope.add_stream_listener(self.observe)
+        self._attached = True
+        return self
+
+    def detach(self):
+        if self._attached:
+            self.telescope.remove_stream_listener(self.observe)
+            self._attached = False
+
+    def _reset(self, motion):
+        self._motion = motion
+        self._arrived = False
+        self._anchor = None
+        self._moved_at = motion.started if motion is not None else None
+        # closest approach per frame, 'z' alt/az and 'e' RA/Dec
+        self._min_distance = {}
+        self._az_travel = 0.0
+        self._last_z = None
+        self._rate_reference = None
+
+    def _target_altaz(self, now):
+        _values = self._motion.values
+        if self._motion.kind == 'goto_altaz':
+            return _values[1], _values[0]
+        _alt, _az = astrometry.radec_to_altaz(_values[0], _values[1],
+                                              self.location[0],
+                                              self.location[1], now)
+        return float(_az), float(_alt)
+
+    def observe(self, timestamp, command, value):
+        """Stream listener, checks one sample"""
+        _motion = getattr(self.telescope, 'commanded_motion', None)
+        if _motion is not self._motion:
+            self._reset(_motion)
+        if command == 'L':
+            if not value:
+                self._arrived = True
+            return
+        if _motion is None:
+            return
+        if command == 'z':
+            # 'z' replies carry azimuth first
+            _az, _alt = value
+            if (self.horizon_mask is not None and
+                    not self.horizon_mask.is_safe(_az % 360.0, _alt)):
+                return self.trip('limit', "az %.2f alt %.2f outside the "
+                                          "horizon mask" % (_az, _alt))
+        if self._arrived:
+            return
+        if _motion.kind.startswith('goto'):
+            self._check_goto(timestamp, command, value)
+        elif command == 'z':
+            self._check_slew(timestamp, value)
+
+    def _check_stall(self, timestamp, position):
+        if (self._anchor is None or
+                _distance(self._anchor[0], self._anchor[1], position[0],
+                          position[1]) > self.stall_distance):
+            self._anchor = position
+            self._moved_at = timestamp
+            return False
+        if timestamp - self._moved_at > self.stall_time:
+            self.trip('stall', "no motion for %.1fs" %
+                      (timestamp - self._moved_at))
+            return True
+        return False
+
+    def _check_az_travel(self, az, alt):
+        if self._last_z is not None:
+            self._az_travel += abs(_wrap(az - self._last_z[0]))
+        self._last_z = (az, alt)
+        if self._az_travel > self.max_az_travel:
+            self.trip('runaway', "azimuth turned %.1f degrees" %
+                      self._az_travel)
+            return True
+        return False
+
+    def _check_goto(self, timestamp, command, value):
+        if command == 'z':
+            _target = self._target_altaz(timestamp)
+            if self._check_az_travel(*value):
+                return
+        elif self._motion.kind == 'goto_radec':
+            _target = self._motion.values
+        else:
+            return
+        _distance_left = _distance(_target[0], _target[1], value[0], value[1])
+        if _distance_left < self.arrive_distance:
+            self._arrived = True
+            return
+        _closest = self._min_distance.get(command)
+        if _closest is None or _distance_left < _closest:
+            self._min_distance[command] = _distance_left
+        elif _distance_left > _closest + self.overshoot:
+            return self.trip('overshoot', "%.2f degrees from target, was "
+                                          "%.2f" % (_distance_left, _closest))
+        if command == 'z':
+            self._check_stall(timestamp, value)
+
+    def _check_slew(self, timestamp, value):
+        if self._check_az_travel(*value):
+            return
+        _rates = commanded_rates(self._motion)
+        if max(abs(r) for r in _rates) * self.stall_time > \
+                2 * self.stall_distance:
+            if self._check_stall(timestamp, value):
+                return
+        if self._rate_reference is None:
+            self._rate_reference = (timestamp, value)
+            return
+        _dt = timestamp - self._rate_reference[0]
+        if _dt < self.min_rate_interval:
+            return
+        _previous = self._rate_reference[1]
+        self._rate_reference = (timestamp, value)
+        _observed = (_wrap(value[0] - _previous[0]) / _dt,
+                     (value[1] - _previous[1]) / _dt)
+        for axis, observed, commanded in zip(('az', 'alt'), _observed, _rates):
+            if abs(observed) > abs(commanded) + self.runaway_rate:
+                return self.trip('runaway', "%s moving %.2f deg/s, commanded "
+                                            "%.2f" % (axis, observed,
+                                                      commanded))
+            if observed * commanded < 0 and abs(observed) > self.wrong_way_rate:
+                return self.trip('runaway', "%s moving %.2f deg/s against "
+                                            "commanded %.2f" %
+                                 (axis, observed, commanded))
+
+    def trip(self, kind, detail):
+        """Stops the mount and records why"""
+        _trip = Trip(kind, detail, time.time())
+        self.trips.append(_trip)
+        try:
+            self.telescope.cancel_goto()
+        finally:
+            self.telescope.slew_var(0, 0)
+            self._reset(getattr(self.telescope, 'commanded_motion', None))
+        if self.on_trip is not None:
+            self.on_trip(_trip)
+        return _trip
@@ -1,7 +1,13 @@
 #!/usr/bin/python
 
+import time
+
 import serial
 
+import astrometry
+import horizon
+import protocol
+
 
 class TelescopeError(Exception):
     def __init__(self, msg):
@@ -15,32 +21,31 @@ class TelescopeAlignmentNotSet(TelescopeError):
 
 
 class NexStar:
-    def __init__(self, device):
+    def __init__(self, device, horizon_mask=None):
+        """
+        :param horizon_mask: horizon.HorizonMask checked by the safe_goto
+            methods, defaults to the flat horizon
+        """
         self.serial = serial.Serial(device, baudrate=9600, timeout=1)
         self.DIR_AZIMUTH = 0
         self.DIR_ELEVATION = 1
+        self.horizon_mask = (horizon_mask if horizon_mask is not None
+                             else horizon.HorizonMask.flat())
+
+    def _command(self, codec, *args):
+        """Encodes, exchanges and decodes one protocol.Codec command"""
+        self.serial.write(codec.encode(*args))
+        return codec.decode(self.serial.read(codec.reply_length))
 
     @staticmethod
     def _validate_command(response):
         assert response == '#', 'Command failed'
 
-    @staticmethod
-    def _precise_to_degrees(string):
-        return int(string, 16) / 2. ** 32 * 360.
-
-    @staticmethod
-    def _degrees_to_precise(degrees):
-        print "_degrees_to_precise(%s)" % degrees
-        rounded = round(degrees / 360. * 2. ** 32)
-        print "_rounded_off %s" % rounded
-        return '%08X' % rounded
-
     def _get_position(self, command):
         self.serial.write(command)
         response = self.serial.read(18)
         print response
-        return (self._precise_to_degrees(response[:8]),
-                self._precise_to_degrees(response[9:17]))
+        return protocol.GET_RA_DEC.decode(response)
 
     @staticmethod
     def _convert_radec_to_atlaz(_ra, _dec):
@@ -53,44 +58,47 @@ class NexStar:
         return self._get_position('e')
 
     def _goto_command(self, char, values):
-        command = (char + self._degrees_to_precise(values[0]) + ',' +
-                   self._degrees_to_precise(values[1]))
+        _codec = protocol.GOTO_BY_OPCODE[char]
+        command = _codec.encode(*values)
         print command
         self.serial.write(command)
-        response = self.serial.read(1)
-        self._validate_command(response)
+        self._validate_command(self.serial.read(_codec.reply_length))
 
     def safe_goto_azel(self, az, el):
         if not self.alignment_complete():
             raise TelescopeAlignmentNotSet
-        if el > 90.0:
-            raise TelescopeError(
-                "elevation larger than 90 degrees not allowed")
         if az >= 360.0:
             az = 0.0
+        if not self.determine_azel_are_safe(az, el):
+            raise TelescopeError(
+                "Az: %s, El: %s are not safe at current location" % (az, el))
         self.goto_azel(az, el)
 
     def goto_azel(self, az, el):
         print "going to %s %s" % (az, el)
         self._goto_command('b', (az, el))
 
-    @staticmethod
-    def determine_azel_are_safe(_az, _el):
-        """Checks if ra and dec are safe for telescope
-
-        Based on the location this function should determine if the
-        given Right Assention and Declination are safe for the telescope
-        to point to. (we don't want pointing at floor :)
+    def determine_azel_are_safe(self, _az, _el):
+        """Checks if az and el clear the horizon mask (we don't want
+        pointing at floor :)
         :param _el:
         :param _az:
         """
-        if _az and _el:
-            return True
+        return self.horizon_mask.is_safe(_az, _el)
+
+    def determine_radec_are_safe(self, _ra, _dec):
+        """Checks if ra and dec are safe for telescope right now, at the
+        site the mount reports and the host clock's time"""
+        _lat, _long = self._command(protocol.GET_LOCATION)
+        _el, _az = astrometry.radec_to_altaz(
+            _ra, _dec, protocol.dms_to_degrees(_lat),
+            protocol.dms_to_degrees(_long), time.time())
+        return self.determine_azel_are_safe(float(_az), float(_el))
 
     def safe_goto_radec(self, ra, dec):
         if not self.alignment_complete():
             raise TelescopeAlignmentNotSet
-        if not self.DetermineRaDecAreSafe(ra, dec):
+        if not self.determine_radec_are_safe(ra, dec):
             raise TelescopeError(
                 "Ra: %s, Dec: %s are not safe at current location" %
                 (ra, dec))
@@ -104,43 +112,20 @@ class NexStar:
         self._goto_command('s', (ra, dec))
 
     def get_tracking_mode(self):
-        self.serial.write('t')
-        response = self.serial.read(2)
-        return ord(response[0])
+        return self._command(protocol.GET_TRACKING_MODE)
 
     def set_tracking_mode(self, mode):
-        command = 'T' + chr(mode)
-        self.serial.write(command)
-        response = self.serial.read(1)
-        self._validate_command(response)
+        self._command(protocol.SET_TRACKING_MODE, mode)
 
     def _var_slew_command(self, direction, rate):
-        negative_rate = True if rate < 0 else False
-        track_rate_high = (int(abs(rate)) * 4) / 256
-        track_rate_low = (int(abs(rate)) * 4) % 256
-        direction_char = chr(16) if direction == self.DIR_AZIMUTH else chr(17)
-        sign_char = chr(7) if negative_rate is True else chr(6)
-        command = ('P' + chr(3) + direction_char + sign_char +
-                   chr(track_rate_high) + chr(track_rate_low) + chr(0) +
-                   chr(0))
-        self.serial.write(command)
-        response = self.serial.read(1)
-        self._validate_command(response)
+        self._command(protocol.VAR_SLEW, direction, rate)
 
     def slew_var(self, az_rate, el_rate):
         self._var_slew_command(self.DIR_AZIMUTH, az_rate)
         self._var_slew_command(self.DIR_ELEVATION, el_rate)
 
     def _fixed_slew_command(self, direction, rate):
-        negative_rate = True if rate < 0 else False
-        sign_char = chr(37) if negative_rate is True else chr(36)
-        direction_char = chr(16) if direction == self.DIR_AZIMUTH else chr(17)
-        rate_char = chr(int(abs(rate)))
-        command = ('P' + chr(2) + direction_char + sign_char + rate_char +
-                   chr(0) + chr(0) + chr(0))
-        self.serial.write(command)
-        response = self.serial.read(1)
-        self._validate_command(response)
+        self._command(protocol.FIXED_SLEW, direction, rate)
 
     def slew_fixed(self, az_rate, el_rate):
         assert (az_rate >= -9) and (az_rate <= 9), 'az_rate out of range'
@@ -149,14 +134,7 @@ class NexStar:
         self._fixed_slew_command(self.DIR_ELEVATION, el_rate)
 
     def get_location(self):
-        self.serial.write('w')
-        response = self.serial.read(9)
-        lat = ()
-        for char in response[:4]:
-            lat = lat + (ord(char),)
-        _long = ()
-        for char in response[4:-1]:
-            _long = _long + (ord(char),)
+        lat, _long = self._command(protocol.GET_LOCATION)
         ns_char = 'N' if lat[3] == 0 else 'S'
         ew_char = 'E' if _long[3] == 0 else 'W'
         print(str(lat[0]) + ' ' + str(lat[1]) + "'" + str(lat[2]) +
@@ -166,58 +144,28 @@ class NexStar:
         return lat, _long
 
     def set_location(self, lat, lon):
-        command = 'W'
-        for p in lat:
-            command += chr(p)
-        for p in lon:
-            command += chr(p)
-        self.serial.write(command)
-        response = self.serial.read(1)
-        self._validate_command(response)
+        self._command(protocol.SET_LOCATION, lat, lon)
 
     def get_time(self):
-        self.serial.write('h')
-        response = self.serial.read(9)
-        time = ()
-        for char in response[:-1]:
-            time = time + (ord(char),)
-        return time
+        return self._command(protocol.GET_TIME)
 
     def set_time(self, time):
-        command = 'H'
-        for p in time:
-            command += chr(p)
-        self.serial.write(command)
-        response = self.serial.read(1)
-        self._validate_command(response)
+        self._command(protocol.SET_TIME, time)
 
     def get_version(self):
-        self.serial.write('V')
-        response = self.serial.read(3)
-        return ord(response[0]) + ord(response[1]) / 10.0
+        return self._command(protocol.GET_VERSION)
 
     def get_model(self):
-        self.serial.write('m')
-        response = self.serial.read(2)
-        return ord(response[0])
+        return self._command(protocol.GET_MODEL)
 
     def echo(self, x):
-        command = 'K' + chr(x)
-        self.serial.write(command)
-        response = self.serial.read(2)
-        return ord(response[0])
+        return self._command(protocol.ECHO, x)
 
     def alignment_complete(self):
-        self.serial.write('J')
-        response = self.serial.read(2)
-        return True if ord(response[0]) == 1 else False
+        return self._command(protocol.ALIGNMENT_COMPLETE)
 
     def goto_in_progress(self):
-        self.serial.write('L')
-        response = self.serial.read(2)
-        return True if int(response[0]) == 1 else False
+        return self._command(protocol.GOTO_IN_PROGRESS)
 
     def cancel_goto(self):
-        self.serial.write('M')
-        response = self.serial.read(1)
-        self._validate_command(response)
+        self._command(protocol.CANCEL_GOTO)
@@ -1,25 +1,44 @@
 #!/usr/bin/env python
-import telescopes
+import timing
+# everything below, astropy above all, is the import phase --profile reports
+_IMPORT_START = timing.monotonic()
 import argparse
+import sys
+import time
 from astropy import units as u
 from astropy.time import Time
 from astropy.coordinates import EarthLocation
 from astropy.coordinates import SkyCoord
 from astropy.coordinates import AltAz
 
+import batch
+import catalog
+import ephemeris
+import scheduler
+import slewmodel
+import telescopes
+import tracing
+import viscache
+_IMPORT_END = timing.monotonic()
+
+SCHEDULE_HOURS = 8.0
+
 
 def _convert_azel_to_radec(_az, _el, _location, _time):
-    _azel = SkyCoord(alt=_el * u.deg, az=_az * u.deg, frame='altaz',
-                     obstime=_time, location=_location)
-    _radec = _azel.icrs
-    return _radec.ra.degree, _radec.dec.degree
+    with tracing.span('astropy', 'azel_to_radec'):
+        _azel = SkyCoord(alt=_el * u.deg, az=_az * u.deg, frame='altaz',
+                         obstime=_time, location=_location)
+        _radec = _azel.icrs
+        return _radec.ra.degree, _radec.dec.degree
 
 
 def _convert_radec_to_azel(_ra, _dec, _location, _time):
     # collect latitude and logitude from the telescope
-    _radec = SkyCoord(ra=_ra * u.degree, dec=_dec * u.degree, frame='icrs')
-    _azel = _radec.transform_to(AltAz(obstime=_time, location=_location))
-    return _azel.az.degree, _azel.alt.degree
+    with tracing.span('astropy', 'radec_to_azel'):
+        _radec = SkyCoord(ra=_ra * u.degree, dec=_dec * u.degree,
+                          frame='icrs')
+        _azel = _radec.transform_to(AltAz(obstime=_time, location=_location))
+        return _azel.az.degree, _azel.alt.degree
 
 
 def _get_telescope_location(telescope):
@@ -35,17 +54,27 @@ def _get_telescope_location(telescope):
     if _longitude[3] > 0:
         _longitude_deg *= -1.0
 
-    telescope_location = EarthLocation(lat=_latitude_deg * u.deg,
-                                       lon=_longitude_deg * u.deg)
+    with tracing.span('astropy', 'earth_location'):
+        telescope_location = EarthLocation(lat=_latitude_deg * u.deg,
+                                           lon=_longitude_deg * u.deg)
     return telescope_location
 
 
+def _action(args):
+    """Name of the option that selected the action, for the profile"""
+    for name, value in sorted(vars(args).items()):
+        if name not in ('d', 'profile') and value not in (None, False):
+            return name
+    return 'help'
+
+
 def main():
     parser = argparse.ArgumentParser()
+    parser.add_argument("-d", default="/dev/ttyUSB0",
+                        help="Port telescope is connected to, "
+                             "tcp://host:port of a network bridge, or "
+                             "emulator://. Default = /dev/ttyUSB0")
     group = parser.add_mutually_exclusive_group()
-    group.add_argument("-d",
-                       help="Port telescope is connected to."
-                            "Default = /dev/ttyUSB0")
     group.add_argument("--get_altaz", action="store_true")
     group.add_argument("--get_location", action="store_true")
     group.add_argument("--get_model", action="store_true")
@@ -53,11 +82,19 @@ def main():
     group.add_argument("--get_time", action="store_true")
     group.add_argument("--get_tracking_mode", action="store_true")
     group.add_argument("--get_version", action="store_true")
+    group.add_argument("--get_axis_positions", action="store_true",
+                       help="Raw azimuth and altitude encoder counts")
     group.add_argument("--set_location", nargs=2,
                        metavar=("latitude", "longitude"))
     group.add_argument("--goto_azel", nargs=2, metavar=("az", "el"))
     group.add_argument("--goto_in_progress", action="store_true")
+    group.add_argument("--wait_for_goto", action="store_true")
     group.add_argument("--goto_radec", nargs=2, metavar=("Ra", "Dec"))
+    group.add_argument("--goto_name", metavar="name",
+                       help="Goto a catalog object, the Moon or a planet, "
+                            "e.g. M31, Vega or Jupiter")
+    group.add_argument("--identify", action="store_true",
+                       help="Name the catalog object the mount points at")
     group.add_argument("--radec_to_azel", nargs=2, metavar=("Ra", "Dec"))
     group.add_argument("--set_tracking_mode", metavar="tracking_mode")
     group.add_argument("--set_time")
@@ -68,15 +105,36 @@ def main():
     group.add_argument("--slew_var", nargs=2, metavar=("az_rate", "el_rate"))
     group.add_argument("--sync", nargs=2, metavar=("ra", "dec"))
     group.add_argument("--move_ra", )
+    group.add_argument("--schedule", metavar="target_file")
+    group.add_argument("--fit_slew_model", action="store_true")
+    group.add_argument("--script", metavar="script_file",
+                       help="Run commands from a file, - for stdin")
+    parser.add_argument("--profile", metavar="trace_file",
+                        help="Write a Chrome trace-event JSON of where the "
+                             "time went and print a summary table")
 
     args = parser.parse_args()
 
-    if args.d:
-        device = args.d
-    else:
-        device = '/dev/ttyUSB0'
+    if args.profile:
+        tracing.enable()
+        tracing.add_span('startup', 'import', _IMPORT_START,
+                         _IMPORT_END - _IMPORT_START)
+    _start = timing.monotonic()
+    try:
+        with tracing.span('cli', _action(args)):
+            return _run(parser, args)
+    finally:
+        if args.profile:
+            tracing.write_chrome_trace(args.profile)
+            sys.stderr.write(tracing.format_summary(
+                timing.monotonic() - _IMPORT_START) + "\n")
+            sys.stderr.write("run %.3fs after %.3fs of imports, trace in %s\n"
+                             % (timing.monotonic() - _start,
+                                _IMPORT_END - _IMPORT_START, args.profile))
+
 
-    telescope = telescopes.NexStarSLT130(device)
+def _run(parser, args):
+    telescope = telescopes.NexStarSLT130(args.d)
 
     if args.get_altaz:
         print(telescope.get_altaz())
@@ -92,6 +150,10 @@ def main():
         print(telescope.get_tracking_mode())
     elif args.get_version:
         print(telescope.get_version())
+    elif args.get_axis_positions:
+        _counts = telescope.get_axis_positions()
+        print("%d %d (%.4f %.4f degrees)" % (
+            _counts + tuple(map(telescope.axis_counts_to_degrees, _counts))))
     elif args.get_time:
         print(telescope.get_time())
     elif args.set_location:
@@ -114,10 +176,32 @@ def main():
             print("Yes")
         else:
             print("No")
+    elif args.wait_for_goto:
+        print("arrived after %.1fs" % telescope.wait_for_goto())
     elif args.goto_radec:
         _ra = float(args.goto_radec[0])
         _dec = float(args.goto_radec[1])
         telescope.goto_radec(_ra, _dec)
+    elif args.goto_name:
+        if ephemeris.is_body(args.goto_name):
+            _ra, _dec = ephemeris.EphemerisCache.for_telescope(
+                telescope).position(args.goto_name, time.time())
+            _object = catalog.CatalogObject(args.goto_name, _ra, _dec, None)
+        else:
+            try:
+                _object = catalog.Catalog.load().lookup(args.goto_name)
+            except KeyError:
+                sys.stderr.write("unknown object %s\n" % args.goto_name)
+                return 1
+        print("goto: %s %s %s" % _object[:3])
+        telescope.goto_ra_dec(_object.ra, _object.dec)
+    elif args.identify:
+        _ra, _dec = telescope.get_ra_dec()
+        _object, _separation = catalog.Catalog.load().nearest(_ra, _dec)
+        if _object is None:
+            print("nothing catalogued nearby")
+        else:
+            print("%s, %.2f degrees away" % (_object.name, _separation))
     elif args.alignment_complete:
         if telescope.alignment_complete():
             print("Yes")
@@ -168,9 +252,39 @@ def main():
         print _az, _el
         telescope.goto_azel(_az, _el)
 
+    elif args.schedule:
+        _latitude, _longitude = telescope.get_location_lat_long()
+        # the 'z' reply carries azimuth first
+        _az, _alt = telescope.get_alt_az()
+        _start = time.time()
+        _scheduler = scheduler.Scheduler(
+            scheduler.load_targets(args.schedule), _latitude, _longitude,
+            _start, _start + SCHEDULE_HOURS * 3600.0,
+            slew_time=slewmodel.SlewModel.load(),
+            visibility_cache=viscache.VisibilityCache.for_telescope(telescope))
+        _plan = _scheduler.plan(_az, _alt)
+        for entry in _plan:
+            print("%s %s alt=%.1f az=%.1f" % (
+                Time(entry.start, format='unix').isot, entry.target.name,
+                entry.alt, entry.az))
+        print("total slew time: %.0fs" % scheduler.total_slew_time(_plan))
+        scheduler.execute(slewmodel.SlewRecorder(telescope), _plan)
+    elif args.script:
+        if args.script == '-':
+            _ok = batch.run_script(telescope, sys.stdin, sys.stdout)
+        else:
+            with open(args.script) as _script:
+                _ok = batch.run_script(telescope, _script, sys.stdout)
+        # the script stops at its first failing step
+        return 0 if _ok else 1
+    elif args.fit_slew_model:
+        _model = slewmodel.SlewModel.fit(slewmodel.load_records())
+        _model.save()
+        print(_model.to_dict())
+
     else:
         print(parser.print_help())
 
 
 if __name__ == '__main__':
-    main()
+    sys.exit(main())
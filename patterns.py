@@ -0,0 +1,269 @@
+#!/usr/bin/env python
+"""Mosaic tiles and spiral search patterns, and running them.
+
+Patterns are laid out as offsets on the tangent plane around a center
+RA/Dec (gnomonic projection, so tiles keep their size and overlap away
+from the equator) and turned into Pointings.
+
+Mosaics are walked serpentine, row by row or column by column, which
+keeps every move to one neighbouring tile; of the eight serpentine walks
+(four start corners, two directions) order_for_travel keeps the one with
+the least predicted slew time from where the mount is. Spirals walk a
+square spiral outwards from the center, so the likeliest fields come
+first.
+
+execute() checks all pointings and the slews between them against the
+horizon mask, at the mount's site and time, and encodes every goto
+before the first one is sent. On the mount
+each arrival is followed by the callback and then straight away by the
+next precomputed goto, so between tiles the host only decodes one 'L'
+reply and writes one command.
+"""
+import argparse
+import itertools
+import time
+from collections import namedtuple
+
+import numpy as np
+
+import astrometry
+import protocol
+import slewmodel
+import telescopes
+
+Pointing = namedtuple('Pointing', ['name', 'ra', 'dec'])
+
+# goto issued and arrival seen (unix times) per pointing
+TileTiming = namedtuple('TileTiming', ['pointing', 'issued', 'arrived'])
+
+
+def tangent_to_radec(ra, dec, x, y):
+    """Inverse gnomonic projection of tangent plane offsets.
+
+    :param x: offsets towards increasing RA, degrees
+    :param y: offsets towards north, degrees
+    :return: (ra, dec) arrays in degrees
+    """
+    _x = np.radians(np.asarray(x, dtype=np.float64))
+    _y = np.radians(np.asarray(y, dtype=np.float64))
+    _dec0 = np.radians(dec)
+    # tangent plane coordinates are tangents, the plane touches at x = y = 0
+    _x, _y = np.tan(_x), np.tan(_y)
+    _dec = np.arcsin((np.sin(_dec0) + _y * np.cos(_dec0)) /
+                     np.sqrt(1.0 + _x * _x + _y * _y))
+    _ra = np.radians(ra) + np.arctan2(_x, np.cos(_dec0) - _y * np.sin(_dec0))
+    return np.mod(np.degrees(_ra), 360.0), np.degrees(_dec)
+
+
+def _pointings(prefix, ra, dec, x, y):
+    _ra, _dec = tangent_to_radec(ra, dec, x, y)
+    return [Pointing("%s%d" % (prefix, i + 1), float(r), float(d))
+            for i, (r, d) in enumerate(zip(_ra, _dec))]
+
+
+def serpentine(columns, rows, by_column=False, flip_x=False, flip_y=False):
+    """Grid cells (column, row) in serpentine order"""
+    _outer, _inner = (columns, rows) if by_column else (rows, columns)
+    _cells = []
+    for i in range(_outer):
+        _line = range(_inner) if i % 2 == 0 else range(_inner - 1, -1, -1)
+        for j in _line:
+            _column, _row = (i, j) if by_column else (j, i)
+            if flip_x:
+                _column = columns - 1 - _column
+            if flip_y:
+                _row = rows - 1 - _row
+            _cells.append((_column, _row))
+    return _cells
+
+
+def mosaic(ra, dec, columns, rows, width, height=None, overlap=0.1,
+           by_column=False, flip_x=False, flip_y=False):
+    """Tiles covering columns x rows fields centered on ra, dec.
+
+    :param width: field of view along RA, degrees
+    :param height: field of view along Dec, degrees, default width
+    :param overlap: fraction of a field shared with each neighbour
+    """
+    if height is None:
+        height = width
+    _cells = np.array(serpentine(columns, rows, by_column, flip_x, flip_y),
+                      dtype=np.float64)
+    _x = (_cells[:, 0] - (columns - 1) / 2.0) * width * (1.0 - overlap)
+    _y = (_cells[:, 1] - (rows - 1) / 2.0) * height * (1.0 - overlap)
+    return _pointings("tile", ra, dec, _x, _y)
+
+
+def spiral_offsets(rings):
+    """Square spiral grid steps (x, y) from the center out to rings"""
+    _offsets = [(0, 0)]
+    _x = _y = 0
+    for ring in range(1, rings + 1):
+        # step out to the next ring, then walk its four sides
+        _x, _y = _x + 1, _y - 1
+        for _dx, _dy in ((0, 1), (-1, 0), (0, -1), (1, 0)):
+            for _ in range(2 * ring):
+                _x, _y = _x + _dx, _y + _dy
+                _offsets.append((_x, _y))
+    return _offsets
+
+
+def spiral(ra, dec, step, rings):
+    """Spiral search fields around ra, dec, step degrees apart"""
+    _offsets = np.array(spiral_offsets(rings), dtype=np.float64) * step
+    return _pointings("search", ra, dec, _offsets[:, 0], _offsets[:, 1])
+
+
+def travel_time(pointings, latitude, longitude, when, start=None,
+                slew_time=None):
+    """Predicted total slew time through pointings at unix time when.
+
+    :param start: (az, alt) the mount starts from, or None to count only
+        the moves between pointings
+    :param slew_time: callable like slewmodel.SlewModel.predict
+    """
+    if slew_time is None:
+        slew_time = slewmodel.SlewModel()
+    _alt, _az = astrometry.radec_to_altaz([p.ra for p in pointings],
+                                          [p.dec for p in pointings],
+                                          latitude, longitude, when)
+    if start is not None:
+        _az = np.concatenate(([start[0]], _az))
+        _alt = np.concatenate(([start[1]], _alt))
+    return float(np.sum(slew_time(_az[:-1], _alt[:-1], _az[1:], _alt[1:])))
+
+
+def order_for_travel(ra, dec, columns, rows, width, height=None,
+                     overlap=0.1, latitude=0.0, longitude=0.0, when=None,
+                     start=None, slew_time=None):
+    """The serpentine mosaic with the least predicted slew time"""
+    if when is None:
+        when = time.time()
+    _best = None
+    for by_column in (False, True):
+        for flip_x in (False, True):
+            for flip_y in (False, True):
+                _tiles = mosaic(ra, dec, columns, rows, width, height,
+                                overlap, by_column, flip_x, flip_y)
+                _cost = travel_time(_tiles, latitude, longitude, when, start,
+                                    slew_time)
+                if _best is None or _cost < _best[0]:
+                    _best = (_cost, _tiles)
+    return _best[1]
+
+
+def check_safe(telescope, pointings):
+    """Checks every pointing, and the slew to it from the one before (or
+    from where the mount points), against the telescope's horizon mask
+    for the site and clock the mount reports.
+
+    :raises telescopes.TelescopeError: naming the first unsafe pointing
+    """
+    _latitude, _longitude = telescope.get_location_lat_long()
+    _alt, _az = astrometry.radec_to_altaz([p.ra for p in pointings],
+                                          [p.dec for p in pointings],
+                                          _latitude, _longitude,
+                                          telescope.get_unix_time())
+    _mask = telescope.horizon_mask
+    _safe = _mask.are_safe(_az, _alt)
+    _from = telescope.get_alt_az()
+    for pointing, az, alt, safe in zip(pointings, _az, _alt, _safe):
+        if not (safe and _mask.path_is_safe(_from[0], _from[1], az, alt,
+                                            telescope.slew_model)):
+            raise telescopes.TelescopeError(
+                "%s at Az: %.2f, El: %.2f, or the slew to it, is not safe "
+                "at current location" % (pointing.name, az, alt))
+        _from = (az, alt)
+
+
+def execute(telescope, pointings, on_arrival=None, predicted=None,
+            min_interval=0.05, max_interval=1.0):
+    """Gotos every pointing in turn, the next as soon as the last arrives.
+
+    All pointings are checked with check_safe before the first goto.
+
+    :param on_arrival: called with (index, pointing) on each arrival,
+        e.g. to take an exposure; the next goto waits for it to return
+    :param predicted: expected slew durations in seconds, one per
+        pointing, to poll sparsely early in long slews
+    :return: list of TileTiming
+    """
+    check_safe(telescope, pointings)
+    _gotos = [(p, protocol.GOTO_RA_DEC.encode(p.ra, p.dec), (p.ra, p.dec))
+              for p in pointings]
+    if predicted is None:
+        predicted = [None] * len(_gotos)
+    _timings = []
+    for i, ((pointing, command, values), expected) in enumerate(
+            zip(_gotos, predicted)):
+        _issued = time.time()
+        if not telescope.send_encoded_goto(command, values):
+            raise telescopes.TelescopeError("goto to %s rejected" %
+                                            pointing.name)
+        if expected is None:
+            _intervals = itertools.repeat(min_interval)
+        else:
+            _intervals = telescopes.goto_poll_intervals(
+                expected, min_interval, max_interval)
+        for _interval in _intervals:
+            time.sleep(_interval)
+            if not telescope.goto_in_progress():
+                break
+        _timings.append(TileTiming(pointing, _issued, time.time()))
+        if on_arrival is not None:
+            on_arrival(i, pointing)
+    return _timings
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Run a mosaic or spiral search pattern")
+    parser.add_argument("-d", default="/dev/ttyUSB0",
+                        help="Port telescope is connected to. "
+                             "Default = /dev/ttyUSB0")
+    group = parser.add_mutually_exclusive_group(required=True)
+    group.add_argument("--mosaic", nargs=5, type=float,
+                       metavar=("ra", "dec", "columns", "rows", "fov"),
+                       help="Tile grid centered on ra, dec")
+    group.add_argument("--spiral", nargs=4, type=float,
+                       metavar=("ra", "dec", "step", "rings"),
+                       help="Square spiral search around ra, dec")
+    parser.add_argument("--overlap", type=float, default=0.1)
+    parser.add_argument("--dwell", type=float, default=0.0,
+                        help="Seconds to stay on each pointing")
+    parser.add_argument("--dry_run", action="store_true",
+                        help="Print the pointings without moving")
+    args = parser.parse_args()
+
+    telescope = telescopes.NexStarSLT130(args.d)
+    try:
+        if args.mosaic:
+            _latitude, _longitude = telescope.get_location_lat_long()
+            _az, _alt = telescope.get_alt_az()
+            _ra, _dec, _columns, _rows, _fov = args.mosaic
+            _pointings = order_for_travel(
+                _ra, _dec, int(_columns), int(_rows), _fov,
+                overlap=args.overlap, latitude=_latitude,
+                longitude=_longitude, start=(_az, _alt),
+                slew_time=slewmodel.SlewModel.load())
+        else:
+            _ra, _dec, _step, _rings = args.spiral
+            _pointings = spiral(_ra, _dec, _step, int(_rings))
+        for pointing in _pointings:
+            print("%s %.4f %.4f" % pointing)
+        if args.dry_run:
+            return
+
+        def _arrived(index, pointing):
+            print("on %s" % pointing.name)
+            time.sleep(args.dwell)
+
+        _timings = execute(telescope, _pointings, _arrived)
+        print("%d pointings in %.1fs" % (
+            len(_timings), _timings[-1].arrived - _timings[0].issued))
+    finally:
+        telescope.close()
+
+
+if __name__ == '__main__':
+    main()
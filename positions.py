@@ -0,0 +1,126 @@
+"""Compact position samples.
+
+A PositionSample is what one 'e' or 'z' reply becomes: the two raw axis
+counts, the frame they are in and when they were read, in a single
+__slots__ object. Degrees are computed on access and the astropy SkyCoord
+(with its Time and EarthLocation) only on the first access to skycoord,
+then kept, so a poll loop that logs floats never touches astropy.
+"""
+from astropy import units as u
+from astropy.coordinates import AltAz, EarthLocation, SkyCoord
+from astropy.time import Time
+
+import angles
+import protocol
+import tracing
+
+RADEC = 'radec'
+ALTAZ = 'altaz'
+
+_DEGREES_PER_COUNT = 360.0 / angles.REVOLUTION
+
+
+class PositionSample(object):
+    __slots__ = ('first', 'second', 'frame', 'timestamp', 'uncertainty',
+                 'location', '_skycoord')
+
+    def __init__(self, first, second, frame, timestamp, location=None,
+                 uncertainty=0.0):
+        """
+        :param first: RA or azimuth in 1/2**32 revolutions (reply order)
+        :param second: Dec or altitude in 1/2**32 revolutions
+        :param frame: RADEC or ALTAZ
+        :param timestamp: unix time the position was sampled
+        :param uncertainty: +/- seconds on timestamp
+        :param location: site as an EarthLocation, a (latitude, longitude)
+            tuple or a callable returning either; only used to build an
+            alt/az SkyCoord
+        """
+        self.first = first
+        self.second = second
+        self.frame = frame
+        self.timestamp = timestamp
+        self.location = location
+        self.uncertainty = uncertainty
+        self._skycoord = None
+
+    @classmethod
+    def from_reply(cls, response, frame, timestamp, location=None,
+                   uncertainty=0.0):
+        _first, _second = protocol.position_counts(response)
+        return cls(_first, _second, frame, timestamp, location, uncertainty)
+
+    @property
+    def degrees(self):
+        """Both axes in degrees, in reply order; the second (Dec or
+        altitude) is signed"""
+        return (self.first * _DEGREES_PER_COUNT,
+                angles.signed_degrees(self.second))
+
+    def __iter__(self):
+        return iter(self.degrees)
+
+    @property
+    def angles(self):
+        return angles.Angle(self.first), angles.Angle(self.second)
+
+    @property
+    def ra(self):
+        return self.first * _DEGREES_PER_COUNT
+
+    @property
+    def dec(self):
+        return angles.signed_degrees(self.second)
+
+    # alt/az replies carry azimuth first
+    az = ra
+    alt = dec
+
+    def _earth_location(self):
+        _location = self.location
+        if callable(_location):
+            _location = _location()
+        if isinstance(_location, EarthLocation):
+            return _location
+        return EarthLocation(lat=_location[0] * u.deg, lon=_location[1] * u.deg)
+
+    @property
+    def skycoord(self):
+        """The sample as an astropy SkyCoord, built once on first use"""
+        if self._skycoord is None:
+            with tracing.span('astropy', 'skycoord', frame=self.frame):
+                self._skycoord = self._build_skycoord()
+        return self._skycoord
+
+    def _build_skycoord(self):
+        _a, _b = self.degrees
+        if self.frame == RADEC:
+            return SkyCoord(ra=_a * u.deg, dec=_b * u.deg, frame='icrs')
+        return SkyCoord(
+            az=_a * u.deg, alt=_b * u.deg,
+            frame=AltAz(obstime=Time(self.timestamp, format='unix'),
+                        location=self._earth_location()))
+
+    def __repr__(self):
+        return "PositionSample(%s %.6f %.6f @ %.3f)" % (
+            (self.frame,) + self.degrees + (self.timestamp,))
+
+
+class Snapshot(object):
+    """Positions and goto state read together in one pipelined exchange.
+
+    Every field keeps its own estimated sampling time on the same time
+    base; timestamp is their mean.
+    """
+    __slots__ = ('radec', 'altaz', 'goto_in_progress', 'timestamp')
+
+    def __init__(self, radec, altaz, goto_in_progress):
+        self.radec = radec
+        self.altaz = altaz
+        self.goto_in_progress = goto_in_progress
+        self.timestamp = (radec.timestamp + altaz.timestamp) / 2.0
+
+    @property
+    def skew(self):
+        """Seconds between the RA/Dec and alt/az samples"""
+        return self.altaz.timestamp - self.radec.timestamp
@@ -0,0 +1,195 @@
+"""NexStar serial protocol table.
+
+Every command the drivers use is one row of PROTOCOL: name, opcode,
+argument layout, argument converter, reply length and reply decoder.
+build() turns each row into a Codec once, at import:
+
+* commands without arguments are pre-encoded to their constant bytes,
+* struct layouts become precompiled struct.Struct objects (big endian),
+* 'precise' layouts (two 8 hex digit angles) become one % format,
+* decoders are plain functions picked from DECODERS by name.
+
+telescopes.NexStarSLT130, better_nexstart.NexStarSLT130 and
+nexstar.NexStar all encode and decode through these codecs.
+"""
+import struct
+from collections import namedtuple
+
+import angles
+
+AZIMUTH_DEVICE = 16
+ALTITUDE_DEVICE = 17
+
+_REVOLUTION_DEGREES = 360.0 / angles.REVOLUTION
+_NINE_BYTES = struct.Struct('8Bx')
+
+# value of every pair of hex digits read as one big endian 16 bit integer,
+# so 'XXXXXXXX,YYYYYYYY' decodes with a single unpack_from and 8 lookups
+# on a str, bytearray or memoryview alike, without slicing it
+_HEX_PAIRS = [0] * 65536
+for _high in range(16):
+    for _low in range(16):
+        for _a in set('%x%X' % (_high, _high)):
+            for _b in set('%x%X' % (_low, _low)):
+                _HEX_PAIRS[(ord(_a) << 8) | ord(_b)] = (_high << 4) | _low
+del _high, _low, _a, _b
+_HEX_POSITION = struct.Struct('>4Hx4H')
+
+
+def _counts(value):
+    if isinstance(value, angles.Angle):
+        return value.counts
+    return angles.degrees_to_counts(value)
+
+
+def _device(direction):
+    """Axis direction (0 azimuth, 1 elevation) to its motor controller"""
+    return AZIMUTH_DEVICE if direction == 0 else ALTITUDE_DEVICE
+
+
+def _var_slew_arguments(direction, rate):
+    return _device(direction), 7 if rate < 0 else 6, int(abs(rate)) * 4
+
+
+def _fixed_slew_arguments(direction, rate):
+    return _device(direction), 37 if rate < 0 else 36, int(abs(rate))
+
+
+def _axis_query(message, reply_length):
+    def _arguments(direction):
+        return _device(direction), message, reply_length
+    return _arguments
+
+
+def _location_arguments(lat, lon):
+    return tuple(lat) + tuple(lon)
+
+
+def _ack(response):
+    assert response == '#', 'Command failed'
+
+
+def position_counts(response, offset=0):
+    """Both axes of an 'e'/'z' reply in 1/2**32 revolutions"""
+    _a, _b, _c, _d, _e, _f, _g, _h = _HEX_POSITION.unpack_from(response,
+                                                               offset)
+    _pairs = _HEX_PAIRS
+    return ((_pairs[_a] << 24 | _pairs[_b] << 16 | _pairs[_c] << 8 |
+             _pairs[_d]),
+            (_pairs[_e] << 24 | _pairs[_f] << 16 | _pairs[_g] << 8 |
+             _pairs[_h]))
+
+
+def _position(response):
+    """RA or azimuth in [0, 360), Dec or altitude signed"""
+    _first, _second = position_counts(response)
+    return _first * _REVOLUTION_DEGREES, angles.signed_degrees(_second)
+
+
+def _location(response):
+    """((deg, min, sec, south), (deg, min, sec, west)) as sent"""
+    _values = _NINE_BYTES.unpack_from(response)
+    return _values[:4], _values[4:]
+
+
+DECODERS = {
+    'raw': lambda response: response,
+    'ack': _ack,
+    'accepted': lambda response: '#' in response,
+    'byte': lambda response: ord(response[0]),
+    'flag': lambda response: ord(response[0]) == 1,
+    'digit_flag': lambda response: response[:1] == '1',
+    'version': lambda response: ord(response[0]) + ord(response[1]) / 10.0,
+    'position': _position,
+    'location': _location,
+    'time': _NINE_BYTES.unpack_from,
+    'counts24': lambda response: ((ord(response[0]) << 16) |
+                                  (ord(response[1]) << 8) | ord(response[2])),
+    'slew_done': lambda response: ord(response[0]) == 0xFF,
+}
+
+# name, opcode, argument layout, argument converter, reply length, decoder
+PROTOCOL = (
+    ('get_ra_dec', 'e', None, None, 18, 'position'),
+    ('get_az_alt', 'z', None, None, 18, 'position'),
+    ('goto_ra_dec', 'r', 'precise', None, 1, 'accepted'),
+    ('goto_az_alt', 'b', 'precise', None, 1, 'accepted'),
+    ('sync', 's', 'precise', None, 1, 'accepted'),
+    ('get_tracking_mode', 't', None, None, 2, 'byte'),
+    ('set_tracking_mode', 'T', 'B', None, 1, 'ack'),
+    ('var_slew', 'P\x03', 'BBH2x', _var_slew_arguments, 1, 'ack'),
+    ('fixed_slew', 'P\x02', 'BBB3x', _fixed_slew_arguments, 1, 'ack'),
+    ('axis_position', 'P\x01', 'BB3xB', _axis_query(0x01, 3), 4, 'raw'),
+    ('axis_slew_done', 'P\x01', 'BB3xB', _axis_query(0x13, 1), 2, 'raw'),
+    ('axis_guide_rate', 'P\x01', 'BB3xB', _axis_query(0x47, 1), 2, 'raw'),
+    ('get_location', 'w', None, None, 9, 'location'),
+    ('set_location', 'W', '8B', _location_arguments, 1, 'ack'),
+    ('get_time', 'h', None, None, 9, 'time'),
+    ('set_time', 'H', '8B', tuple, 1, 'ack'),
+    ('get_version', 'V', None, None, 3, 'version'),
+    ('get_model', 'm', None, None, 2, 'byte'),
+    ('echo', 'K', 'B', None, 2, 'byte'),
+    ('alignment_complete', 'J', None, None, 2, 'flag'),
+    ('goto_in_progress', 'L', None, None, 2, 'digit_flag'),
+    ('cancel_goto', 'M', None, None, 1, 'ack'),
+)
+
+Codec = namedtuple('Codec', ['name', 'opcode', 'command', 'encode',
+                             'reply_length', 'decode'])
+
+
+def _encoder(opcode, layout, converter):
+    if layout is None:
+        return lambda: opcode
+    if layout == 'precise':
+        _format = opcode.replace('%', '%%') + '%08X,%08X'
+        return lambda first, second: _format % (_counts(first),
+                                                _counts(second))
+    _pack = struct.Struct('>' + layout).pack
+    if converter is None:
+        return lambda *args: opcode + _pack(*args)
+    return lambda *args: opcode + _pack(*converter(*args))
+
+
+def build(table):
+    _codecs = {}
+    for name, opcode, layout, converter, reply_length, decoder in table:
+        _codecs[name] = Codec(name, opcode, opcode if layout is None else None,
+                              _encoder(opcode, layout, converter),
+                              reply_length, DECODERS[decoder])
+    return _codecs
+
+
+COMMANDS = build(PROTOCOL)
+
+GET_RA_DEC = COMMANDS['get_ra_dec']
+GET_AZ_ALT = COMMANDS['get_az_alt']
+GOTO_RA_DEC = COMMANDS['goto_ra_dec']
+GOTO_AZ_ALT = COMMANDS['goto_az_alt']
+SYNC = COMMANDS['sync']
+GET_TRACKING_MODE = COMMANDS['get_tracking_mode']
+SET_TRACKING_MODE = COMMANDS['set_tracking_mode']
+VAR_SLEW = COMMANDS['var_slew']
+FIXED_SLEW = COMMANDS['fixed_slew']
+AXIS_POSITION = COMMANDS['axis_position']
+AXIS_SLEW_DONE = COMMANDS['axis_slew_done']
+AXIS_GUIDE_RATE = COMMANDS['axis_guide_rate']
+GET_LOCATION = COMMANDS['get_location']
+SET_LOCATION = COMMANDS['set_location']
+GET_TIME = COMMANDS['get_time']
+SET_TIME = COMMANDS['set_time']
+GET_VERSION = COMMANDS['get_version']
+GET_MODEL = COMMANDS['get_model']
+ECHO = COMMANDS['echo']
+ALIGNMENT_COMPLETE = COMMANDS['alignment_complete']
+GOTO_IN_PROGRESS = COMMANDS['goto_in_progress']
+CANCEL_GOTO = COMMANDS['cancel_goto']
+
+# goto commands by the opcode the drivers' _goto_command take
+GOTO_BY_OPCODE = {'r': GOTO_RA_DEC, 'b': GOTO_AZ_ALT, 's': SYNC}
+
+
+def dms_to_degrees(dms):
+    """(degrees, minutes, seconds, negative flag) to signed degrees"""
+    _degrees = dms[0] + dms[1] / 60.0 + dms[2] / 3600.0
+    return -_degrees if dms[3] != 0 else _degrees
@@ -0,0 +1,321 @@
+"""Visibility aware observing scheduler.
+
+Takes a list of targets, computes their visibility over the night on a
+vectorized time grid and orders them so that the total slew time is small
+while every target is observed between the altitude limits.  Ordering is a
+greedy nearest-neighbour pass followed by windowed 2-opt improvement.
+"""
+import time
+from collections import namedtuple
+
+import numpy as np
+
+import astrometry
+import telescopes
+
+Target = namedtuple('Target', ['name', 'ra', 'dec'])
+ScheduledTarget = namedtuple('ScheduledTarget',
+                             ['target', 'goto_time', 'start', 'end',
+                              'alt', 'az'])
+
+DEFAULT_AXIS_RATE = 4.0    # degrees per second, both axes
+DEFAULT_SETTLE_TIME = 2.0  # seconds
+
+
+def load_targets(path):
+    """Reads a target list file.
+
+    One target per line as ``name ra dec`` (degrees), separated by
+    whitespace or commas. Names may contain spaces. Text after '#' is
+    ignored.
+    """
+    targets = []
+    with open(path) as _file:
+        for line_number, line in enumerate(_file, 1):
+            line = line.split('#', 1)[0].strip()
+            if not line:
+                continue
+            fields = line.replace(',', ' ').split()
+            if len(fields) < 3:
+                raise ValueError("%s:%d: expected 'name ra dec'" %
+                                 (path, line_number))
+            targets.append(Target(' '.join(fields[:-2]),
+                                  float(fields[-2]), float(fields[-1])))
+    return targets
+
+
+def time_grid(start, end, step=300.0):
+    """Unix times from start to end (inclusive) every step seconds"""
+    return np.arange(start, end + step / 2.0, step)
+
+
+def default_slew_time(az0, alt0, az1, alt1):
+    """Slew time estimate assuming both axes move together at a fixed rate"""
+    _daz = np.abs(astrometry.wrap_delta(az0, az1))
+    _dalt = np.abs(np.asarray(alt1) - np.asarray(alt0))
+    return np.maximum(_daz, _dalt) / DEFAULT_AXIS_RATE + DEFAULT_SETTLE_TIME
+
+
+class Visibility(object):
+    """Altitude/azimuth of every target on a common time grid"""
+
+    def __init__(self, times, alt, az, min_alt=20.0, max_alt=85.0):
+        self.times = np.asarray(times, dtype=np.float64)
+        self.alt = alt
+        self.az = az
+        self.visible = (alt >= min_alt) & (alt <= max_alt)
+
+    @classmethod
+    def compute(cls, ra, dec, latitude, longitude, times,
+                min_alt=20.0, max_alt=85.0):
+        _times = np.asarray(times, dtype=np.float64)
+        _alt, _az = astrometry.radec_to_altaz(
+            np.asarray(ra)[:, None], np.asarray(dec)[:, None],
+            latitude, longitude, _times[None, :])
+        return cls(_times, _alt.astype(np.float32), _az.astype(np.float32),
+                   min_alt, max_alt)
+
+    def ever_visible(self):
+        return self.visible.any(axis=1)
+
+    def windows(self, index):
+        """Returns the (start, end) unix time spans when target is visible"""
+        _row = self.visible[index].astype(np.int8)
+        _edges = np.diff(np.concatenate(([0], _row, [0])))
+        _starts = np.nonzero(_edges == 1)[0]
+        _ends = np.nonzero(_edges == -1)[0] - 1
+        return [(self.times[s], self.times[e]) for s, e in zip(_starts, _ends)]
+
+
+class Scheduler(object):
+
+    def __init__(self, targets, latitude, longitude, start, end,
+                 step=300.0, min_alt=20.0, max_alt=85.0, dwell=60.0,
+                 slew_time=default_slew_time, opt_window=50, opt_passes=3,
+                 visibility_cache=None):
+        """
+        :param targets: sequence of Target
+        :param latitude: site latitude in degrees
+        :param longitude: site longitude in degrees, east positive
+        :param start: unix time the night's observing starts
+        :param end: unix time the night's observing ends
+        :param step: visibility grid step in seconds
+        :param dwell: seconds spent on each target after arrival
+        :param slew_time: callable(az0, alt0, az1, alt1) returning seconds,
+            must accept numpy arrays for the destination.
+        :param opt_window: longest segment reversed by 2-opt
+        :param opt_passes: number of 2-opt passes
+        :param visibility_cache: viscache.VisibilityCache to take the
+            visibility grid from instead of computing it
+        """
+        self.targets = list(targets)
+        self.latitude = latitude
+        self.longitude = longitude
+        self.start = start
+        self.end = end
+        self.step = step
+        self.min_alt = min_alt
+        self.max_alt = max_alt
+        self.dwell = dwell
+        self.slew_time = slew_time
+        self.opt_window = opt_window
+        self.opt_passes = opt_passes
+        self.visibility_cache = visibility_cache
+        self.ra = np.array([t.ra for t in self.targets], dtype=np.float64)
+        self.dec = np.array([t.dec for t in self.targets], dtype=np.float64)
+        self._visibility = None
+
+    def visibility(self):
+        if self._visibility is None and self.visibility_cache is not None:
+            self._visibility = Visibility(
+                *self.visibility_cache.grid(self.ra, self.dec,
+                                            self.start, self.end),
+                min_alt=self.min_alt, max_alt=self.max_alt)
+        elif self._visibility is None:
+            self._visibility = Visibility.compute(
+                self.ra, self.dec, self.latitude, self.longitude,
+                time_grid(self.start, self.end, self.step),
+                self.min_alt, self.max_alt)
+        return self._visibility
+
+    def _altaz(self, indices, when):
+        return astrometry.radec_to_altaz(self.ra[indices], self.dec[indices],
+                                         self.latitude, self.longitude, when)
+
+    def _observable(self, indices, arrival):
+        """Mask of targets that stay within limits for the whole dwell"""
+        _ok = np.ones(len(indices), dtype=bool)
+        for _when in (arrival, arrival + self.dwell):
+            _alt, _ = self._altaz(indices, _when)
+            _ok &= (_alt >= self.min_alt) & (_alt <= self.max_alt)
+        return _ok & (arrival + self.dwell <= self.end)
+
+    def _greedy(self, az, alt):
+        _remaining = np.nonzero(self.visibility().ever_visible())[0]
+        _times = self.visibility().times
+        _now = self.start
+        order = []
+        while len(_remaining) and _now < self.end:
+            _alt, _az = self._altaz(_remaining, _now)
+            _cost = self.slew_time(az, alt, _az, _alt)
+            _ok = self._observable(_remaining, _now + _cost)
+            if not _ok.any():
+                # nothing can be observed right now, skip to the next grid
+                # slot where a remaining target is up
+                _later = _times > _now
+                _up = self.visibility().visible[_remaining][:, _later]
+                _columns = np.nonzero(_up.any(axis=0))[0]
+                if not len(_columns):
+                    break
+                _next = _times[_later][_columns[0]]
+                _now = _next if _next > _now else _now + self.step
+                continue
+            _pick = np.nonzero(_ok)[0][np.argmin(_cost[_ok])]
+            _arrival = _now + _cost[_pick]
+            order.append(_remaining[_pick])
+            alt, az = self._altaz(_remaining[_pick], _arrival)
+            alt, az = float(alt), float(az)
+            _now = _arrival + self.dwell
+            _remaining = np.delete(_remaining, _pick)
+        return order
+
+    def _arrival(self, index, when, az, alt):
+        _t_alt, _t_az = self._altaz(index, when)
+        return when + float(self.slew_time(az, alt, _t_az, _t_alt))
+
+    def _earliest_goto(self, index, when, az, alt):
+        """Earliest goto time after when at which index can be observed.
+
+        Scans the visibility grid and then bisects down to a second, so
+        waiting for a target to rise never costs a whole grid step.
+        """
+        _times = self.visibility().times
+        _candidates = _times[_times > when]
+        _feasible = None
+        for _t in _candidates:
+            _arrival = self._arrival(index, _t, az, alt)
+            if _arrival + self.dwell > self.end:
+                return None
+            if self._observable(np.array([index]), _arrival)[0]:
+                _feasible = _t
+                break
+            when = _t
+        if _feasible is None:
+            return None
+        while _feasible - when > 1.0:
+            _middle = (when + _feasible) / 2.0
+            _arrival = self._arrival(index, _middle, az, alt)
+            if self._observable(np.array([index]), _arrival)[0]:
+                _feasible = _middle
+            else:
+                when = _middle
+        return _feasible
+
+    def _simulate(self, order, az, alt):
+        """Replays an ordering and returns the (order, plan) actually kept.
+
+        Targets that can no longer be fitted in (they set, or the night
+        ends) are left out of the plan.
+        """
+        kept = []
+        plan = []
+        _now = self.start
+        for index in order:
+            _arrival = self._arrival(index, _now, az, alt)
+            if not self._observable(np.array([index]), _arrival)[0]:
+                _when = self._earliest_goto(index, _now, az, alt)
+                if _when is None:
+                    continue
+                _now = _when
+                _arrival = self._arrival(index, _now, az, alt)
+            _t_alt, _t_az = self._altaz(index, _arrival)
+            kept.append(index)
+            plan.append(ScheduledTarget(self.targets[index], _now, _arrival,
+                                        _arrival + self.dwell,
+                                        float(_t_alt), float(_t_az)))
+            az, alt = float(_t_az), float(_t_alt)
+            _now = _arrival + self.dwell
+        return kept, plan
+
+    def _two_opt(self, order, plan):
+        """Windowed 2-opt on the slew costs between planned positions.
+
+        A reversal is only taken if every moved target is still observable
+        at the time slot it moves into.
+        """
+        _order = np.array(order)
+        _az = np.array([p.az for p in plan])
+        _alt = np.array([p.alt for p in plan])
+        _slots = np.array([p.start for p in plan])
+        _n = len(_order)
+        _improved = False
+        for i in range(1, _n - 1):
+            _j = np.arange(i + 1, min(i + self.opt_window, _n - 1))
+            if not len(_j):
+                continue
+            _before = (self.slew_time(_az[i - 1], _alt[i - 1], _az[i], _alt[i]) +
+                       self.slew_time(_az[_j], _alt[_j], _az[_j + 1], _alt[_j + 1]))
+            _after = (self.slew_time(_az[i - 1], _alt[i - 1], _az[_j], _alt[_j]) +
+                      self.slew_time(_az[i], _alt[i], _az[_j + 1], _alt[_j + 1]))
+            _gain = _before - _after
+            for _k in np.argsort(-_gain)[:3]:
+                if _gain[_k] <= 1e-6:
+                    break
+                j = _j[_k]
+                _moved = _order[i:j + 1][::-1]
+                if not self._observable(_moved, _slots[i:j + 1]).all():
+                    continue
+                for _array in (_order, _az, _alt):
+                    _array[i:j + 1] = _array[i:j + 1][::-1].copy()
+                _improved = True
+                break
+        return list(_order), _improved
+
+    def plan(self, az=0.0, alt=0.0):
+        """Computes the observing plan.
+
+        :param az: current azimuth of the mount in degrees
+        :param alt: current altitude of the mount in degrees
+        :return: list of ScheduledTarget in observing order
+        """
+        order = self._greedy(az, alt)
+        order, plan = self._simulate(order, az, alt)
+        for _ in range(self.opt_passes):
+            if len(plan) < 4:
+                break
+            candidate, improved = self._two_opt(order, plan)
+            if not improved:
+                break
+            candidate, candidate_plan = self._simulate(candidate, az, alt)
+            if (len(candidate_plan) < len(plan) or
+                    total_slew_time(candidate_plan) >= total_slew_time(plan)):
+                break
+            order, plan = candidate, candidate_plan
+        return plan
+
+
+def total_slew_time(plan):
+    return sum(entry.start - entry.goto_time for entry in plan)
+
+
+def execute(telescope, plan, on_arrival=None):
+    """Runs a plan through the telescope driver.
+
+    Each goto is issued at its planned time (never early, since the target
+    may not have risen yet) and waited for using the planned slew time as
+    the prediction. After arrival on_arrival(entry) is called if given,
+    otherwise the dwell time is slept away.
+    """
+    for entry in plan:
+        _wait = entry.goto_time - time.time()
+        if _wait > 0:
+            time.sleep(_wait)
+        telescope.goto_ra_dec(entry.target.ra, entry.target.dec)
+        telescopes.wait_for_goto(telescope,
+                                 predicted=entry.start - entry.goto_time)
+        if on_arrival is not None:
+            on_arrival(entry)
+        else:
+            _wait = entry.end - time.time()
+            if _wait > 0:
+                time.sleep(_wait)
@@ -0,0 +1,36 @@
+"""Preallocated reply buffer for the serial link.
+
+Replies are read with readinto() straight into one bytearray ring and
+handed out as memoryviews; the protocol decoders read fields from them in
+place with struct.unpack_from, so a poll doesn't create a string for the
+reply or for each field sliced out of it. A view stays valid until the
+ring wraps around to its bytes again, so decode it before the next
+capacity / reply_length exchanges.
+"""
+
+DEFAULT_CAPACITY = 4096
+
+
+class ReplyRing(object):
+
+    def __init__(self, capacity=DEFAULT_CAPACITY):
+        self.capacity = capacity
+        self.buffer = bytearray(capacity)
+        self._view = memoryview(self.buffer)
+        self._head = 0
+
+    def read(self, port, n_bytes):
+        """Reads up to n_bytes from port (anything with readinto), stopping
+        early on timeout, and returns a memoryview of what arrived"""
+        if self._head + n_bytes > self.capacity:
+            self._head = 0
+        _start = self._head
+        _end = _start + n_bytes
+        _got = _start
+        while _got < _end:
+            _count = port.readinto(self._view[_got:_end])
+            if not _count:
+                break
+            _got += _count
+        self._head = _got
+        return self._view[_start:_got]
@@ -0,0 +1,192 @@
+"""Auto-reconnecting driver session.
+
+Session wraps a driver and forwards every call to it. If a call fails
+because the link dropped (a USB serial adapter re-enumerating, a network
+bridge restarting), the session:
+
+1. closes the dead driver and reopens the device, trying again straight
+   away and then backing off exponentially up to max_backoff,
+2. reads tracking mode and site location from the mount and re-sends
+   only whichever differs from what the session last knew, so a link
+   hiccup costs two queries while a mount that lost power gets its
+   state back,
+3. retries the call if it is an idempotent query or a stop, and raises
+   a TelescopeError for anything else (a goto or slew that may or may
+   not have reached the mount is left to the caller).
+
+Stream listeners added through the session are carried over to every
+new driver.
+"""
+import socket
+import threading
+import time
+
+import serial
+
+import protocol
+import telescopes
+import timing
+import tracing
+
+# errors that mean the port or connection went away
+DISCONNECT_ERRORS = (serial.SerialException, socket.error, IOError, OSError)
+
+# NexStarSLT130 calls that can be repeated without side effects beyond
+# the first; the stops are in here because stopping twice is still stopped
+IDEMPOTENT = frozenset([
+    'get_ra_dec', 'get_radec', 'get_alt_az', 'get_altaz',
+    'get_ra_dec_angles', 'get_alt_az_angles', 'sample_ra_dec',
+    'sample_alt_az', 'snapshot', 'goto_in_progress', 'alignment_complete',
+    'is_aligned', 'get_tracking_mode', 'get_location_lat_long',
+    'get_earth_location', 'get_time', 'get_time_initializer', 'get_unix_time',
+    'get_version', 'get_model', 'echo', 'get_axis_position',
+    'get_axis_positions', 'axis_slew_done', 'get_axis_guide_rate',
+    'cancel_goto',
+    'cancel_current_operation',
+])
+
+# opcodes of the commands that only read, for pipelines of them
+_QUERY_OPCODES = frozenset(['e', 'z', 't', 'w', 'h', 'V', 'm', 'J', 'L', 'K',
+                            'P\x01'])
+
+
+def _idempotent(name, args):
+    if name == 'pipeline':
+        return all(cmd[:1] in _QUERY_OPCODES or cmd[:2] in _QUERY_OPCODES
+                   for cmd, _ in args[0])
+    return name in IDEMPOTENT
+
+
+# NexStarSLT130 calls after which the session re-reads the state it
+# restores
+_STATE_SETTERS = frozenset(['set_tracking_mode', 'set_location'])
+
+
+class Session(object):
+
+    def __init__(self, device, telescope_class=telescopes.NexStarSLT130,
+                 backoff=0.05, max_backoff=2.0, reconnect_timeout=30.0,
+                 **driver_args):
+        """
+        :param device: passed to telescope_class on every (re)open
+        :param backoff: seconds before the second reopen attempt, doubling
+            after every failed attempt up to max_backoff
+        :param reconnect_timeout: seconds of failed attempts after which
+            the session gives up and raises TelescopeError
+        :param driver_args: extra keyword arguments for telescope_class
+        """
+        self.device = device
+        self.telescope_class = telescope_class
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.reconnect_timeout = reconnect_timeout
+        self.driver_args = driver_args
+        self.reconnects = 0
+        self.last_recovery = None
+        self.state = {}
+        self._listeners = []
+        self._generation = 0
+        self._lock = threading.RLock()
+        self.telescope = telescope_class(device, **driver_args)
+        self._remember_state()
+
+    def __getattr__(self, name):
+        if name == 'telescope':
+            raise AttributeError(name)
+        _value = getattr(self.telescope, name)
+        if not callable(_value):
+            return _value
+
+        def _call(*args, **kwargs):
+            return self.call(name, *args, **kwargs)
+        _call.__name__ = name
+        return _call
+
+    def call(self, name, *args, **kwargs):
+        """Calls a driver method, reconnecting if the link dropped"""
+        _generation = self._generation
+        try:
+            _result = getattr(self.telescope, name)(*args, **kwargs)
+        except DISCONNECT_ERRORS as e:
+            self.reconnect(_generation)
+            if not _idempotent(name, args):
+                raise telescopes.TelescopeError(
+                    "link lost during %s, reconnected but not retried: %s"
+                    % (name, e))
+            _result = getattr(self.telescope, name)(*args, **kwargs)
+        if name in _STATE_SETTERS:
+            self._remember_state()
+        return _result
+
+    def _read_state(self, telescope):
+        return {'tracking_mode': telescope.get_tracking_mode(),
+                'location': telescope._command(protocol.GET_LOCATION)}
+
+    def _remember_state(self):
+        self.state = self._read_state(self.telescope)
+
+    def _restore_state(self, telescope):
+        """Re-sends the state the mount lost; returns what was restored"""
+        _current = self._read_state(telescope)
+        _restored = []
+        if _current['tracking_mode'] != self.state['tracking_mode']:
+            telescope.set_tracking_mode(self.state['tracking_mode'])
+            _restored.append('tracking_mode')
+        if _current['location'] != self.state['location']:
+            telescope.set_location(*self.state['location'])
+            _restored.append('location')
+        return _restored
+
+    def reconnect(self, generation=None):
+        """Reopens the device and restores state.
+
+        :param generation: the connection the caller saw fail; if another
+            thread has replaced it meanwhile nothing is done
+        """
+        with self._lock:
+            if generation is not None and generation != self._generation:
+                return
+            with tracing.span('session', 'reconnect', device=self.device):
+                _start = timing.monotonic()
+                try:
+                    self.telescope.close()
+                except DISCONNECT_ERRORS:
+                    pass
+                self.telescope = self._reopen(_start)
+                for callback in self._listeners:
+                    self.telescope.add_stream_listener(callback)
+                self._generation += 1
+                self.reconnects += 1
+                self.last_recovery = timing.monotonic() - _start
+
+    def _reopen(self, start):
+        _delay = 0.0
+        while True:
+            try:
+                _telescope = self.telescope_class(self.device,
+                                                  **self.driver_args)
+            except DISCONNECT_ERRORS as e:
+                _error = e
+            else:
+                try:
+                    self._restore_state(_telescope)
+                    return _telescope
+                except DISCONNECT_ERRORS as e:
+                    _error = e
+                    _telescope.close()
+            if timing.monotonic() - start + _delay > self.reconnect_timeout:
+                raise telescopes.TelescopeError(
+                    "could not reopen %s: %s" % (self.device, _error))
+            time.sleep(_delay)
+            _delay = min(max(_delay * 2, self.backoff), self.max_backoff)
+
+    def add_stream_listener(self, callback):
+        self._listeners.append(callback)
+        self.telescope.add_stream_listener(callback)
+
+    def remove_stream_listener(self, callback):
+        self._listeners.remove(callback)
+        self.telescope.remove_stream_listener(callback)
+
+    def close(self):
+        self.telescope.close()
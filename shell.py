@@ -0,0 +1,261 @@
+#!/usr/bin/env python
+"""Interactive shell keeping one telescope session open.
+
+A background poller refreshes position and goto state and draws them on the
+top line of the terminal without disturbing the prompt. Commands that only
+need that state (radec, altaz) answer from the cache; site location is read
+once when the shell starts.
+"""
+import argparse
+import cmd
+import sys
+import threading
+import time
+
+import catalog
+import ephemeris
+import horizon
+import motionwatchdog
+import scheduler
+import session
+import telescopes
+
+STATUS_INTERVAL = 1.0
+
+# save cursor, jump to the top line, clear it, restore cursor
+_STATUS_FORMAT = "\0337\033[1;1H\033[2K%s\0338"
+
+
+class TelescopeState(object):
+    """Last values seen from the mount, shared with the poller thread"""
+
+    def __init__(self):
+        self.ra_dec = None
+        self.az_alt = None
+        self.goto_in_progress = None
+        self.updated = None
+
+
+class TelescopeShell(cmd.Cmd):
+    intro = "NexStar shell, 'help' lists commands."
+    prompt = "nexstar> "
+
+    def __init__(self, telescope, targets=(), stdout=None,
+                 status_interval=STATUS_INTERVAL, catalog=None,
+                 ephemeris=None):
+        """
+        :param telescope: connected NexStarSLT130 or session.Session
+        :param targets: scheduler.Target objects that can be used by name
+        :param catalog: catalog.Catalog whose names can be used with goto
+        :param ephemeris: ephemeris.EphemerisCache for goto by Moon or
+            planet name
+        :param status_interval: seconds between background polls, 0 to
+            disable the status line
+        """
+        cmd.Cmd.__init__(self, stdout=stdout)
+        self.telescope = telescope
+        self.targets = dict((t.name.lower(), t) for t in targets)
+        self.catalog = catalog
+        self.ephemeris = ephemeris
+        self.state = TelescopeState()
+        self.status_interval = status_interval
+        self.show_status = status_interval > 0
+        self._lock = threading.RLock()
+        self._stop = threading.Event()
+        self.location = telescope.get_location_lat_long()
+        self._poller = None
+        if status_interval > 0:
+            self._poller = threading.Thread(target=self._poll)
+            self._poller.daemon = True
+            self._poller.start()
+
+    def _poll(self):
+        while not self._stop.wait(self.status_interval):
+            try:
+                with self._lock:
+                    _replies = self.telescope.pipeline(
+                        [('e', 18), ('z', 18), ('L', 2)])
+                self.state.ra_dec = self.telescope._parse_position(_replies[0])
+                self.state.az_alt = self.telescope._parse_position(_replies[1])
+                self.state.goto_in_progress = _replies[2][:1] == '1'
+                self.state.updated = time.time()
+            except Exception as e:
+                self._draw_status("poll failed: %s" % e)
+                continue
+            self._draw_status(self.status_text())
+
+    def _draw_status(self, text):
+        if self.show_status:
+            self.stdout.write(_STATUS_FORMAT % text)
+            self.stdout.flush()
+
+    def status_text(self):
+        _state = self.state
+        if _state.updated is None:
+            return "no status yet"
+        return ("RA %8.4f Dec %+8.4f | Az %8.4f Alt %+8.4f | %s" %
+                (_state.ra_dec + _state.az_alt +
+                 ("slewing" if _state.goto_in_progress else "idle",)))
+
+    def _call(self, method, *args):
+        if getattr(self.telescope, 'scheduler', None) is not None:
+            # the driver orders commands itself, a stop must not wait for
+            # the poller to let go of the lock
+            return getattr(self.telescope, method)(*args)
+        with self._lock:
+            return getattr(self.telescope, method)(*args)
+
+    def _numbers(self, arg, count):
+        _values = [float(v) for v in arg.split()]
+        if len(_values) != count:
+            raise ValueError("expected %d numbers" % count)
+        return _values
+
+    def onecmd(self, line):
+        try:
+            return cmd.Cmd.onecmd(self, line)
+        except (ValueError, telescopes.TelescopeError, AssertionError) as e:
+            self.stdout.write("error: %s\n" % e)
+
+    def emptyline(self):
+        pass
+
+    def do_radec(self, arg):
+        """radec: print RA/Dec (cached by the status poller if running)"""
+        _value = self.state.ra_dec or self._call('get_ra_dec')
+        self.stdout.write("%.4f %.4f\n" % _value)
+
+    def do_altaz(self, arg):
+        """altaz: print Az/Alt (cached by the status poller if running)"""
+        _value = self.state.az_alt or self._call('get_alt_az')
+        self.stdout.write("%.4f %.4f\n" % _value)
+
+    def _resolve(self, name):
+        _target = self.targets.get(name.strip().lower())
+        if _target is not None:
+            return _target.ra, _target.dec
+        if self.ephemeris is not None and ephemeris.is_body(name):
+            return self.ephemeris.position(name, time.time())
+        if self.catalog is not None:
+            index = self.catalog.find(name)
+            if index is not None:
+                return self.catalog.ra[index], self.catalog.dec[index]
+        return None
+
+    def do_goto(self, arg):
+        """goto <ra> <dec> | goto <target, catalog, moon or planet name>"""
+        _position = self._resolve(arg)
+        if _position is None:
+            _position = self._numbers(arg, 2)
+        self._call('goto_ra_dec', *_position)
+
+    def complete_goto(self, text, line, begidx, endidx):
+        _prefix = line[len('goto '):].lower()
+        _skip = len(_prefix) - len(text)
+        _names = set(self.targets[name].name for name in self.targets
+                     if name.startswith(_prefix))
+        if self.ephemeris is not None:
+            _names.update(name for name in ephemeris.BODIES
+                          if name.startswith(_prefix))
+        if self.catalog is not None:
+            _names.update(name for name in self.catalog.complete(_prefix)
+                          if name.lower().startswith(_prefix))
+        return sorted(name[_skip:] for name in _names)
+
+    def do_whatsthis(self, arg):
+        """whatsthis: nearest catalog object to where the mount points"""
+        if self.catalog is None:
+            raise ValueError("no catalog loaded")
+        _ra, _dec = self.state.ra_dec or self._call('get_ra_dec')
+        _object, _separation = self.catalog.nearest(_ra, _dec)
+        if _object is None:
+            self.stdout.write("nothing catalogued nearby\n")
+        else:
+            self.stdout.write("%s, %.2f degrees away\n" %
+                              (_object.name, _separation))
+
+    def do_gotoaltaz(self, arg):
+        """gotoaltaz <alt> <az>"""
+        self._call('goto_alt_az', *self._numbers(arg, 2))
+
+    def do_sync(self, arg):
+        """sync <ra> <dec>"""
+        self._call('sync', *self._numbers(arg, 2))
+
+    def do_wait(self, arg):
+        """wait [timeout]: wait for the current goto to finish"""
+        _timeout = self._numbers(arg, 1)[0] if arg.strip() else None
+        self.stdout.write("arrived after %.1fs\n" %
+                          self._call('wait_for_goto', None, _timeout))
+
+    def do_cancel(self, arg):
+        """cancel: stop the current goto"""
+        self._call('cancel_goto')
+
+    def do_slew(self, arg):
+        """slew <az_rate> <el_rate>: variable rate slew, 0 0 stops"""
+        self._call('slew_var', *self._numbers(arg, 2))
+
+    def do_tracking(self, arg):
+        """tracking [mode]: show or set the tracking mode"""
+        if arg.strip():
+            self._call('set_tracking_mode', int(arg))
+        else:
+            self.stdout.write("%d\n" % self._call('get_tracking_mode'))
+
+    def do_location(self, arg):
+        """location: print the cached site latitude and longitude"""
+        self.stdout.write("%.4f %.4f\n" % self.location)
+
+    def do_refresh(self, arg):
+        """refresh: re-read the cached site location from the mount"""
+        self.location = self._call('get_location_lat_long')
+
+    def do_status(self, arg):
+        """status [on|off]: print status, or toggle the status line"""
+        if arg.strip() in ('on', 'off'):
+            self.show_status = arg.strip() == 'on'
+        else:
+            self.stdout.write(self.status_text() + "\n")
+
+    def do_quit(self, arg):
+        """quit: leave the shell"""
+        self._stop.set()
+        return True
+
+    do_EOF = do_quit
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-d", default="/dev/ttyUSB0",
+                        help="Port telescope is connected to, "
+                             "tcp://host:port of a network bridge, or "
+                             "emulator://. Default = /dev/ttyUSB0")
+    parser.add_argument("--targets", metavar="target_file",
+                        help="Target list whose names can be used with goto")
+    parser.add_argument("--watchdog", action="store_true",
+                        help="Stop the mount on stalled or runaway motion "
+                             "seen by the status poller")
+    parser.add_argument("--horizon", metavar="horizon_file",
+                        help="Horizon mask the watchdog enforces")
+    args = parser.parse_args()
+    _targets = scheduler.load_targets(args.targets) if args.targets else ()
+    telescope = session.Session(args.d, command_scheduler=True)
+    if args.watchdog:
+        _mask = horizon.HorizonMask.load(args.horizon) if args.horizon else None
+        motionwatchdog.MotionWatchdog(
+            telescope, _mask,
+            on_trip=lambda trip: sys.stdout.write(
+                "\nwatchdog stopped the mount: %s\n" % trip.detail)).attach()
+    try:
+        TelescopeShell(
+            telescope, _targets, catalog=catalog.Catalog.load(),
+            ephemeris=ephemeris.EphemerisCache.for_telescope(telescope)
+        ).cmdloop()
+    finally:
+        telescope.close()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
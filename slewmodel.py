@@ -0,0 +1,223 @@
+"""Per-axis slew time model for the mount.
+
+Each axis accelerates at a constant rate up to a maximum speed, cruises and
+decelerates (a trapezoidal velocity profile). Both axes move at the same
+time so a goto lasts as long as the slower axis, plus a fixed settle time.
+The parameters can be fitted from logged goto histories, see SlewRecorder.
+"""
+import json
+import os
+import time
+from collections import namedtuple
+
+import numpy as np
+
+import astrometry
+
+SLEW_LOG_PATH = os.path.expanduser("~/.nexstar_slews.log")
+SLEW_MODEL_PATH = os.path.expanduser("~/.nexstar_slew_model.json")
+
+SlewRecord = namedtuple('SlewRecord',
+                        ['az0', 'alt0', 'az1', 'alt1', 'duration'])
+
+_ACCELERATIONS = np.logspace(-1.0, 1.5, 26)   # degrees / s^2
+_SPEEDS = np.logspace(-0.5, 1.3, 26)          # degrees / s
+
+
+class AxisModel(object):
+
+    def __init__(self, acceleration=2.0, max_speed=4.0):
+        """
+        :param acceleration: degrees per second squared
+        :param max_speed: degrees per second
+        """
+        self.acceleration = acceleration
+        self.max_speed = max_speed
+
+    def duration(self, distance):
+        """Seconds to move distance degrees (any sign, arrays allowed)"""
+        return _trapezoid_time(np.abs(distance), self.acceleration,
+                               self.max_speed)
+
+    def position(self, distance, elapsed):
+        """Degrees travelled elapsed seconds into a move of distance degrees.
+
+        Broadcasts over both arguments; the result has the sign of distance
+        and stays at distance once the move is over.
+        """
+        _distance = np.abs(np.asarray(distance, dtype=np.float64))
+        _a = self.acceleration
+        # peak speed is max_speed unless the move is too short to reach it
+        _peak = np.minimum(np.sqrt(_a * _distance), self.max_speed)
+        _ramp_time = _peak / _a
+        _total = _trapezoid_time(_distance, _a, self.max_speed)
+        _t = np.clip(elapsed, 0.0, _total)
+        _travelled = np.where(
+            _t < _ramp_time, 0.5 * _a * _t * _t,
+            np.where(_t < _total - _ramp_time,
+                     0.5 * _a * _ramp_time * _ramp_time +
+                     _peak * (_t - _ramp_time),
+                     _distance - 0.5 * _a * (_total - _t) ** 2))
+        return np.sign(distance) * _travelled
+
+
+def _trapezoid_time(distance, acceleration, max_speed):
+    # distance spent accelerating to and decelerating from max_speed
+    _ramp = max_speed * max_speed / acceleration
+    return np.where(distance < _ramp,
+                    2.0 * np.sqrt(distance / acceleration),
+                    distance / max_speed + max_speed / acceleration)
+
+
+class SlewModel(object):
+
+    def __init__(self, az_axis=None, alt_axis=None, settle_time=2.0):
+        self.az_axis = az_axis if az_axis is not None else AxisModel()
+        self.alt_axis = alt_axis if alt_axis is not None else AxisModel()
+        self.settle_time = settle_time
+
+    def predict(self, az0, alt0, az1, alt1):
+        """Predicted goto duration in seconds between two alt/az positions.
+
+        Arguments may be numpy arrays, so the model can be used directly as
+        the slew_time of a scheduler.Scheduler.
+        """
+        _az_time = self.az_axis.duration(astrometry.wrap_delta(az0, az1))
+        _alt_time = self.alt_axis.duration(np.asarray(alt1) - np.asarray(alt0))
+        return np.maximum(_az_time, _alt_time) + self.settle_time
+
+    __call__ = predict
+
+    def path(self, az0, alt0, az1, alt1, samples=64):
+        """Predicted (az, alt) arrays along a goto, both axes moving at once"""
+        _daz = astrometry.wrap_delta(az0, az1)
+        _dalt = alt1 - alt0
+        _times = np.linspace(0.0, float(max(self.az_axis.duration(_daz),
+                                            self.alt_axis.duration(_dalt))),
+                             samples)
+        return (np.mod(az0 + self.az_axis.position(_daz, _times), 360.0),
+                alt0 + self.alt_axis.position(_dalt, _times))
+
+    def to_dict(self):
+        return {'az_acceleration': self.az_axis.acceleration,
+                'az_max_speed': self.az_axis.max_speed,
+                'alt_acceleration': self.alt_axis.acceleration,
+                'alt_max_speed': self.alt_axis.max_speed,
+                'settle_time': self.settle_time}
+
+    @classmethod
+    def from_dict(cls, values):
+        return cls(AxisModel(values['az_acceleration'], values['az_max_speed']),
+                   AxisModel(values['alt_acceleration'],
+                             values['alt_max_speed']),
+                   values['settle_time'])
+
+    def save(self, path=SLEW_MODEL_PATH):
+        with open(path, 'w') as _file:
+            json.dump(self.to_dict(), _file, indent=2, sort_keys=True)
+
+    @classmethod
+    def load(cls, path=SLEW_MODEL_PATH):
+        """Loads a saved model, or returns the default model if none"""
+        if not os.path.exists(path):
+            return cls()
+        with open(path) as _file:
+            return cls.from_dict(json.load(_file))
+
+    @classmethod
+    def fit(cls, records, iterations=4):
+        """Fits the model to a sequence of SlewRecord.
+
+        Coordinate descent over the two axes: each step grid searches one
+        axis' acceleration and speed with the other held fixed, taking the
+        least squares settle time for every candidate.
+        """
+        _records = np.array([tuple(r) for r in records], dtype=np.float64)
+        if len(_records) < 3:
+            raise ValueError("need at least 3 slews to fit a model")
+        _daz = np.abs(astrometry.wrap_delta(_records[:, 0], _records[:, 2]))
+        _dalt = np.abs(_records[:, 3] - _records[:, 1])
+        _duration = _records[:, 4]
+        _a = _ACCELERATIONS[:, None, None]
+        _v = _SPEEDS[None, :, None]
+
+        def _best(distance, other_time):
+            _times = np.maximum(
+                _trapezoid_time(distance[None, None, :], _a, _v), other_time)
+            _settle = np.clip((_duration - _times).mean(axis=2), 0.0, None)
+            _error = ((_times + _settle[:, :, None] - _duration) ** 2).sum(axis=2)
+            i, j = np.unravel_index(np.argmin(_error), _error.shape)
+            return AxisModel(_ACCELERATIONS[i], _SPEEDS[j]), _settle[i, j]
+
+        # start with both axes sharing the same parameters
+        model = cls()
+        model.az_axis, model.settle_time = _best(np.maximum(_daz, _dalt), 0.0)
+        model.alt_axis = AxisModel(model.az_axis.acceleration,
+                                   model.az_axis.max_speed)
+        for _ in range(iterations):
+            model.az_axis, model.settle_time = _best(
+                _daz, model.alt_axis.duration(_dalt))
+            model.alt_axis, model.settle_time = _best(
+                _dalt, model.az_axis.duration(_daz))
+        return model
+
+
+def load_records(path=SLEW_LOG_PATH):
+    records = []
+    with open(path) as _file:
+        for line in _file:
+            line = line.strip()
+            if line and not line.startswith('#'):
+                records.append(SlewRecord(*map(float, line.split(','))))
+    return records
+
+
+class SlewRecorder(object):
+    """Wraps a telescope and logs every goto it observes.
+
+    Callers use it exactly like the telescope. A goto starts when
+    goto_ra_dec/goto_alt_az is called and ends at the first
+    goto_in_progress() poll that answers False; the arrival time is taken
+    half way between that poll and the previous one.
+    """
+
+    def __init__(self, telescope, path=SLEW_LOG_PATH):
+        self.telescope = telescope
+        self.path = path
+        self._start = None
+        self._last_busy = None
+
+    def __getattr__(self, name):
+        return getattr(self.telescope, name)
+
+    def _begin(self):
+        # the 'z' reply carries azimuth first
+        _az, _alt = self.telescope.get_alt_az()
+        self._start = (time.time(), _az, _alt)
+        self._last_busy = self._start[0]
+
+    def goto_ra_dec(self, _ra, _dec):
+        self._begin()
+        return self.telescope.goto_ra_dec(_ra, _dec)
+
+    def goto_alt_az(self, _alt, _az):
+        self._begin()
+        return self.telescope.goto_alt_az(_alt, _az)
+
+    def goto_in_progress(self):
+        _busy = self.telescope.goto_in_progress()
+        _now = time.time()
+        if self._start is not None:
+            if _busy:
+                self._last_busy = _now
+            else:
+                _t0, _az0, _alt0 = self._start
+                self._start = None
+                _az1, _alt1 = self.telescope.get_alt_az()
+                self.log(SlewRecord(_az0, _alt0, _az1, _alt1,
+                                    (self._last_busy + _now) / 2.0 - _t0))
+        return _busy
+
+    def log(self, record):
+        with open(self.path, 'a') as _file:
+            _file.write(','.join('%.6f' % x for x in record) + '\n')
@@ -5,18 +5,185 @@ from astropy.coordinates import SkyCoord
 from astropy.coordinates import AltAz
 from abc import ABCMeta
 from abc import abstractmethod
-
-import serial
+from collections import namedtuple
+import calendar
+import threading
+import time
+
+import angles
+import astrometry
+import commandqueue
+import horizon
+import positions
+import protocol
+import serialio
+import timing
+import tracing
+import transport
+from commandqueue import PRIORITY_SAFETY, PRIORITY_CONTROL, PRIORITY_QUERY
 
 
 class TelescopeError(Exception):
     def __init__(self, msg):
         self.msg = msg
 
+class GotoTimeout(TelescopeError):
+    pass
+
+
+class TelescopeAlignmentNotSet(TelescopeError):
+    def __init__(self, msg="Telescope alignment not set"):
+        super(TelescopeAlignmentNotSet, self).__init__(msg)
+
+
 class TelescopeCommand(object):
     _cmd = ""
 
 
+# Last motion the driver was asked for. kind is 'goto_altaz' (values
+# alt, az), 'goto_radec' (ra, dec), 'slew_var' (az, el rates in arcsec/s)
+# or 'slew_fixed' (az, el rate indexes); started is the unix time it was sent
+MotionCommand = namedtuple('MotionCommand', ['kind', 'values', 'started'])
+
+
+def goto_poll_intervals(predicted=None, min_interval=0.1, max_interval=5.0):
+    """Yields the delays between goto_in_progress polls.
+
+    With a predicted slew duration the first polls are sparse, halving the
+    remaining time each step, and become dense (min_interval) around the
+    expected arrival. If the mount is still busy well past the prediction
+    the interval backs off again towards max_interval. Without a
+    prediction a fixed half second is used.
+
+    :param predicted: expected goto duration in seconds, or None
+    """
+    if predicted is None:
+        while True:
+            yield 0.5
+    _elapsed = 0.0
+    while _elapsed < predicted:
+        _interval = min(max(0.5 * (predicted - _elapsed), min_interval),
+                        max_interval)
+        _elapsed += _interval
+        yield _interval
+    _interval = min_interval
+    while True:
+        yield _interval
+        _elapsed += _interval
+        if _elapsed > 1.5 * predicted:
+            _interval = min(2.0 * _interval, max_interval)
+
+
+class GotoCompletion(object):
+    """Future for a goto in progress.
+
+    A background thread polls goto_in_progress() on the schedule from
+    goto_poll_intervals() until the mount arrives, the timeout expires or
+    cancel() is called; the latter two issue cancel_goto(). The thread owns
+    the serial link until the goto completes.
+    """
+    ARRIVED = 'arrived'
+    CANCELLED = 'cancelled'
+    TIMED_OUT = 'timed out'
+
+    def __init__(self, telescope, predicted=None, timeout=None,
+                 min_interval=0.1, max_interval=5.0):
+        self.telescope = telescope
+        self.predicted = predicted
+        self.timeout = timeout
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.state = None
+        self.exception = None
+        self.polls = 0
+        self.started = time.time()
+        self.finished = None
+        self._cancel = threading.Event()
+        self._done = threading.Event()
+        self._lock = threading.Lock()
+        self._callbacks = []
+        self._thread = threading.Thread(target=self._run)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def _run(self):
+        _state = None
+        try:
+            for _interval in goto_poll_intervals(self.predicted,
+                                                 self.min_interval,
+                                                 self.max_interval):
+                if self.timeout is not None:
+                    _remaining = self.started + self.timeout - time.time()
+                    _interval = max(min(_interval, _remaining), 0.0)
+                if self._cancel.wait(_interval):
+                    self.telescope.cancel_goto()
+                    _state = self.CANCELLED
+                    break
+                self.polls += 1
+                if not self.telescope.goto_in_progress():
+                    _state = self.ARRIVED
+                    break
+                if (self.timeout is not None and
+                        time.time() - self.started >= self.timeout):
+                    self.telescope.cancel_goto()
+                    _state = self.TIMED_OUT
+                    break
+        except Exception as e:
+            self.exception = e
+        self._finish(_state)
+
+    def _finish(self, state):
+        with self._lock:
+            self.state = state
+            self.finished = time.time()
+            self._done.set()
+            _callbacks, self._callbacks = self._callbacks, []
+        for callback in _callbacks:
+            callback(self)
+
+    def add_done_callback(self, callback):
+        """Calls callback(completion) once the goto has finished"""
+        with self._lock:
+            if not self._done.is_set():
+                self._callbacks.append(callback)
+                return
+        callback(self)
+
+    def cancel(self):
+        self._cancel.set()
+
+    def done(self):
+        return self._done.is_set()
+
+    def wait(self, timeout=None):
+        """Blocks until finished, returns False if timeout expired first"""
+        return self._done.wait(timeout)
+
+    def result(self, timeout=None):
+        """Waits for the goto and returns the elapsed time in seconds.
+
+        Raises GotoTimeout if the goto timed out and TelescopeError if it
+        was cancelled; errors from the poller are re-raised.
+        """
+        if not self._done.wait(timeout):
+            raise GotoTimeout("goto still in progress")
+        if self.exception is not None:
+            raise self.exception
+        if self.state == self.TIMED_OUT:
+            raise GotoTimeout("goto timed out after %ss" % self.timeout)
+        if self.state == self.CANCELLED:
+            raise TelescopeError("goto cancelled")
+        return self.finished - self.started
+
+
+def wait_for_goto(telescope, predicted=None, timeout=None, callback=None):
+    """Blocks until telescope finishes its goto, see GotoCompletion"""
+    _completion = GotoCompletion(telescope, predicted, timeout)
+    if callback is not None:
+        _completion.add_done_callback(callback)
+    return _completion.result()
+
+
 class BaseTelescope(object):
     """Base class for telescope"""
     __metaclass__ = ABCMeta
@@ -78,6 +245,35 @@ class BaseTelescope(object):
     def goto_radec(self, _radec):
         self.goto_ra_dec(_radec.ra.degree, _radec.dec.degree)
 
+    def goto_in_progress(self):
+        """Returns True while a goto is running"""
+        return False
+
+    def cancel_goto(self):
+        """Stops a goto in progress"""
+        pass
+
+    def wait_for_goto(self, predicted=None, timeout=None, callback=None):
+        """Blocks until the current goto finishes.
+
+        :param predicted: expected goto duration in seconds, used to poll
+            sparsely until shortly before arrival
+        :param timeout: seconds after which the goto is cancelled
+        :param callback: called with the GotoCompletion on arrival
+        :return: seconds spent waiting
+        """
+        return wait_for_goto(self, predicted, timeout, callback)
+
+    def goto_ra_dec_async(self, _ra, _dec, predicted=None, timeout=None):
+        """Starts a goto and returns a GotoCompletion for it"""
+        self.goto_ra_dec(_ra, _dec)
+        return GotoCompletion(self, predicted, timeout)
+
+    def goto_alt_az_async(self, _alt, _az, predicted=None, timeout=None):
+        """Starts a goto and returns a GotoCompletion for it"""
+        self.goto_alt_az(_alt, _az)
+        return GotoCompletion(self, predicted, timeout)
+
 
     def get_alt_az(self):
         """Gets Altitude (elevation) and azimuth telescope is pointing to
@@ -175,12 +371,48 @@ class BaseTelescope(object):
 class NexStarSLT130(BaseTelescope):
 
     time_format = 'isot'
+    # seconds between a reply reaching the port and becoming readable,
+    # e.g. the latency timer of a USB serial adapter
+    reply_latency = 0.0
 
-    def __init__(self, device):
+    def __init__(self, device, command_scheduler=False, link_budget=None,
+                 horizon_mask=None, slew_model=None):
+        """
+        :param device: serial port the hand controller is on, tcp://host:port
+            of a network bridge, emulator:// or an open transport; see
+            transport.open_transport
+        :param command_scheduler: send everything through a prioritized
+            commandqueue.CommandScheduler, so cancels and stops jump ahead
+            of queued polls from other threads
+        :param link_budget: bytes per second routine queries may use,
+            implies command_scheduler
+        :param horizon_mask: horizon.HorizonMask checked by the safe_goto
+            methods, defaults to the flat horizon
+        :param slew_model: slewmodel.SlewModel used to predict slew paths
+        """
         super(NexStarSLT130, self).__init__(device)
-        self.serial = serial.Serial(device, baudrate=9600, timeout=2)
+        with tracing.span('driver', 'open', device=device):
+            self.serial = transport.open_transport(device, timeout=2)
         self.DIR_AZIMUTH = 0
         self.DIR_ELEVATION = 1
+        self.commanded_motion = None
+        self.horizon_mask = (horizon_mask if horizon_mask is not None
+                             else horizon.HorizonMask.flat())
+        self.slew_model = slew_model
+        self._stream_listeners = []
+        self._site = None
+        self._ring = serialio.ReplyRing()
+        # one bound method shared by every alt/az sample
+        self._site_provider = self._site_location
+        self.scheduler = None
+        if command_scheduler or link_budget:
+            self.scheduler = commandqueue.CommandScheduler(
+                self.send_command, self.read_response, link_budget)
+
+    def close(self):
+        if self.scheduler is not None:
+            self.scheduler.close()
+        self.serial.close()
 
     def send_command(self, cmd):
         self.serial.write(cmd)
@@ -194,19 +426,86 @@ class NexStarSLT130(BaseTelescope):
         """
         return self.serial.read(n_bytes)
 
+    def read_response_into(self, n_bytes=1):
+        """Reads a reply into the preallocated reply ring.
 
-    @staticmethod
-    def _validate_command(response):
-        assert response == '#', 'Command failed'
+        :return: memoryview of the reply, valid until the ring wraps
+        """
+        return self._ring.read(self.serial, n_bytes)
+
+    def _exchange_view(self, cmd, n_bytes, priority=PRIORITY_QUERY):
+        """_exchange for replies that are decoded straight away; reads
+        into the reply ring unless the command scheduler owns the port"""
+        with tracing.span('serial', cmd[:1]):
+            if self.scheduler is not None:
+                return self.scheduler.exchange(cmd, n_bytes, priority)
+            self.send_command(cmd)
+            return self.read_response_into(n_bytes)
+
+    def _exchange(self, cmd, n_bytes, priority=PRIORITY_QUERY, flush=False):
+        """Sends a command and returns its reply.
+
+        With the command scheduler enabled the command waits its turn by
+        priority; otherwise it goes straight to the port.
+        """
+        with tracing.span('serial', cmd[:1]):
+            if self.scheduler is None:
+                self.send_command(cmd)
+                return self.read_response(n_bytes)
+            return self.scheduler.exchange(cmd, n_bytes, priority, flush)
 
-    @staticmethod
-    def _convert_hex_to_percentage_of_revolution(string):
-        return int(string, 16) / 2. ** 32 * 360.
+    def _command(self, codec, args=(), priority=PRIORITY_QUERY, flush=False):
+        """Encodes, exchanges and decodes one protocol.Codec command"""
+        return codec.decode(self._exchange(codec.encode(*args),
+                                           codec.reply_length, priority, flush))
+
+    def _timed_exchange(self, cmd, n_bytes, priority=PRIORITY_QUERY):
+        """Like _exchange, also estimating when the mount took the reply.
+
+        :return: (reply, unix sample time, uncertainty in seconds)
+        """
+        with tracing.span('serial', cmd[:1]):
+            if self.scheduler is None:
+                _sent = timing.monotonic()
+                self.send_command(cmd)
+                response = self.read_response_into(n_bytes)
+                _received = timing.monotonic()
+            else:
+                _request = self.scheduler.submit(cmd, n_bytes, priority)
+                response = _request.result()
+                _sent, _received = _request.sent, _request.received
+        _sampled, _uncertainty = timing.sample_window(
+            _sent, _received, len(cmd), len(response), self.reply_latency)
+        return response, timing.to_unix(_sampled), _uncertainty
+
+    def add_stream_listener(self, callback):
+        """Calls callback(timestamp, command, value) for every position
+        ('e', 'z') or goto state ('L') reply the driver reads, whoever
+        asked for it. Positions are parsed tuples, goto state a bool.
+        """
+        self._stream_listeners.append(callback)
+
+    def remove_stream_listener(self, callback):
+        self._stream_listeners.remove(callback)
+
+    def _observe(self, cmd, response, timestamp=None):
+        if not self._stream_listeners or cmd not in ('e', 'z', 'L'):
+            return
+        if timestamp is None:
+            timestamp = timing.now()
+        _value = (response[:1] == '1' if cmd == 'L'
+                  else self._parse_position(response))
+        for callback in list(self._stream_listeners):
+            callback(timestamp, cmd, _value)
+
+    def _command_motion(self, kind, values):
+        self.commanded_motion = (MotionCommand(kind, values, timing.now())
+                                 if any(values) or kind.startswith('goto')
+                                 else None)
 
     @staticmethod
-    def _convert_to_percentage_of_revolution_in_hex(degrees):
-        rounded = round(degrees / 360. * 2. ** 32)
-        return '%08X' % rounded
+    def _validate_command(response):
+        assert response == '#', 'Command failed'
 
     def _get_position(self, coordinate_system):
         """Returns telescope postion in the requested coordinate system.
@@ -214,10 +513,129 @@ class NexStarSLT130(BaseTelescope):
         Possible coordinagte systems are radec(e) and azel(z)
 
         """
-        self.send_command(coordinate_system)
-        response = self.read_response(18)
-        return (self._convert_hex_to_percentage_of_revolution(response[:8]),
-                self._convert_hex_to_percentage_of_revolution(response[9:17]))
+        response, _timestamp, _ = self._timed_exchange(coordinate_system, 18)
+        self._observe(coordinate_system, response, _timestamp)
+        return self._parse_position(response)
+
+    def _get_position_angles(self, coordinate_system):
+        """Like _get_position, as exact angles.Angle pairs"""
+        response, _timestamp, _ = self._timed_exchange(coordinate_system, 18)
+        self._observe(coordinate_system, response, _timestamp)
+        return self._parse_position_angles(response)
+
+    @staticmethod
+    def _parse_position_angles(response):
+        _first, _second = protocol.position_counts(response)
+        return angles.Angle(_first), angles.Angle(_second)
+
+    def _site_location(self):
+        """Site EarthLocation, read from the mount once"""
+        if self._site is None:
+            self._site = self.get_earth_location()
+        return self._site
+
+    def _get_sample(self, coordinate_system, frame, location=None):
+        response, _timestamp, _uncertainty = self._timed_exchange(
+            coordinate_system, 18)
+        self._observe(coordinate_system, response, _timestamp)
+        return positions.PositionSample.from_reply(
+            response, frame, _timestamp, location, _uncertainty)
+
+    def sample_ra_dec(self):
+        """Current RA/Dec as a positions.PositionSample"""
+        return self._get_sample('e', positions.RADEC)
+
+    def sample_alt_az(self):
+        """Current az/alt as a positions.PositionSample; the site location
+        is only read if its SkyCoord is used"""
+        return self._get_sample('z', positions.ALTAZ, self._site_provider)
+
+    def snapshot(self):
+        """RA/Dec, az/alt and goto state in one pipelined exchange"""
+        (_radec, _altaz, _goto) = self._pipeline_timed([('e', 18), ('z', 18),
+                                                       ('L', 2)])
+        return positions.Snapshot(
+            positions.PositionSample.from_reply(
+                _radec[0], positions.RADEC, _radec[1], None, _radec[2]),
+            positions.PositionSample.from_reply(
+                _altaz[0], positions.ALTAZ, _altaz[1], self._site_provider,
+                _altaz[2]),
+            _goto[0][:1] == '1')
+
+    def get_radec(self):
+        return self.sample_ra_dec().skycoord
+
+    def get_altaz(self):
+        return self.sample_alt_az().skycoord
+
+    def get_ra_dec_angles(self):
+        return self._get_position_angles('e')
+
+    def get_alt_az_angles(self):
+        """Axis angles as (az, alt), in the order the mount sends them"""
+        return self._get_position_angles('z')
+
+    _parse_position = staticmethod(protocol.GET_RA_DEC.decode)
+
+    def pipeline(self, commands):
+        """Sends several commands back to back, then reads all replies.
+
+        Only for commands that don't depend on each other. Saves one
+        command/reply turnaround per command.
+
+        :param commands: sequence of (command, reply_length)
+        :return: list of raw replies in command order
+        """
+        return [reply for reply, _, _ in self._pipeline_timed(commands)]
+
+    def _pipeline_timed(self, commands):
+        """pipeline(), with the estimated sample time of every reply.
+
+        A pipelined reply can't have been sampled before its own command
+        arrived, nor before the previous reply was sent.
+
+        :return: list of (reply, unix sample time, uncertainty in seconds)
+        """
+        _windows = []
+        with tracing.span('serial', 'pipeline', commands=len(commands)):
+            if self.scheduler is not None:
+                _requests = [self.scheduler.submit(cmd, n_bytes)
+                             for cmd, n_bytes in commands]
+                _replies = [request.result() for request in _requests]
+                _windows = [(request.sent, request.received)
+                            for request in _requests]
+                _command_bytes = [len(cmd) for cmd, _ in commands]
+            else:
+                _sent = timing.monotonic()
+                for cmd, _ in commands:
+                    self.send_command(cmd)
+                _replies = []
+                _command_bytes = []
+                _written = 0
+                for cmd, n_bytes in commands:
+                    _replies.append(self.read_response(n_bytes))
+                    _written += len(cmd)
+                    _windows.append((_sent, timing.monotonic()))
+                    _command_bytes.append(_written)
+        if tracing.enabled():
+            for (cmd, _), (sent, received) in zip(commands, _windows):
+                tracing.add_span('serial', cmd[:1], sent, received - sent,
+                                 pipelined=True)
+        _timed = []
+        _previous = None
+        for (cmd, _), reply, (sent, received), command_bytes in zip(
+                commands, _replies, _windows, _command_bytes):
+            if (_previous is not None and
+                    _previous > sent + command_bytes * timing.BYTE_TIME):
+                # starts after the previous reply, no command bytes left
+                sent, command_bytes = _previous, 0
+            _sampled, _uncertainty = timing.sample_window(
+                sent, received, command_bytes, len(reply), self.reply_latency)
+            _previous = received - self.reply_latency
+            _timestamp = timing.to_unix(_sampled)
+            self._observe(cmd, reply, _timestamp)
+            _timed.append((reply, _timestamp, _uncertainty))
+        return _timed
 
     def get_alt_az(self):
         return self._get_position('z')
@@ -226,64 +644,165 @@ class NexStarSLT130(BaseTelescope):
         return self._get_position('e')
 
     def _goto_command(self, char, values):
-        command = (char + self._convert_to_percentage_of_revolution_in_hex(values[0]) + ',' +
-                   self._convert_to_percentage_of_revolution_in_hex(values[1]))
-        self.send_command(command)
-        response = self.read_response(1)
-        return "#" in response
+        return self._command(protocol.GOTO_BY_OPCODE[char], values,
+                             PRIORITY_CONTROL)
 
     def goto_alt_az(self, _alt, _az):
         self._goto_command('b', (_az, _alt))
+        self._command_motion('goto_altaz', (_alt, _az))
 
     def goto_ra_dec(self, _ra, _dec):
         self._goto_command('r', (_ra, _dec))
+        self._command_motion('goto_radec', (_ra, _dec))
+
+    def send_encoded_goto(self, command, values):
+        """Sends a goto encoded ahead of time with protocol.GOTO_BY_OPCODE
+
+        :param command: the encoded 'r' or 'b' command
+        :param values: the (ra, dec) or (az, alt) it was encoded from
+        :return: True if the mount accepted it
+        """
+        _codec = protocol.GOTO_BY_OPCODE[command[0]]
+        _accepted = _codec.decode(self._exchange(command, _codec.reply_length,
+                                                 PRIORITY_CONTROL))
+        if command[0] == 'r':
+            self._command_motion('goto_radec', tuple(values))
+        elif command[0] == 'b':
+            self._command_motion('goto_altaz', (values[1], values[0]))
+        return _accepted
+
+    def determine_azel_are_safe(self, _az, _el):
+        """Checks if az and el are safe for telescope
+
+        Both the destination and the predicted slew path from the current
+        position have to clear the horizon mask (we don't want pointing at
+        floor :)
+        """
+        if not self.horizon_mask.is_safe(_az % 360.0, _el):
+            return False
+        _az0, _el0 = self.get_alt_az()
+        return self.horizon_mask.path_is_safe(_az0, _el0, _az % 360.0, _el,
+                                              self.slew_model)
+
+    def determine_radec_are_safe(self, _ra, _dec):
+        """Checks if ra and dec are safe for telescope right now, at the
+        site and time the mount reports"""
+        _lat, _long = self.get_location_lat_long()
+        _el, _az = astrometry.radec_to_altaz(_ra, _dec, _lat, _long,
+                                             self.get_unix_time())
+        return self.determine_azel_are_safe(float(_az), float(_el))
+
+    def safe_goto_azel(self, az, el):
+        # an unaligned mount's alt/az mean nothing, so neither does a
+        # horizon check on them
+        if not self.alignment_complete():
+            raise TelescopeAlignmentNotSet
+        if not self.determine_azel_are_safe(az, el):
+            raise TelescopeError(
+                "Az: %s, El: %s are not safe at current location" % (az, el))
+        self.goto_alt_az(el, az)
+
+    def safe_goto_radec(self, ra, dec):
+        if not self.alignment_complete():
+            raise TelescopeAlignmentNotSet
+        if not self.determine_radec_are_safe(ra, dec):
+            raise TelescopeError(
+                "Ra: %s, Dec: %s are not safe at current location" %
+                (ra, dec))
+        self.goto_ra_dec(ra, dec)
 
     def sync(self, ra, dec):
         self._goto_command('s', (ra, dec))
 
     def get_tracking_mode(self):
-        self.send_command('t')
-        response = self.read_response(2)
-        return ord(response[0])
+        return self._command(protocol.GET_TRACKING_MODE)
 
     def set_tracking_mode(self, mode):
-        self.send_command('T' + chr(mode))
-        response = self.read_response(1)
-        self._validate_command(response)
+        self._command(protocol.SET_TRACKING_MODE, (mode,), PRIORITY_CONTROL)
+
+    # motor controller passthrough queries (see the 'P' rows of the
+    # protocol table) ask the axis controllers directly, skipping the hand
+    # controller's coordinate conversion; positions are 24 bit
+    AXIS_COUNTS = 2 ** 24
+
+    def passthrough(self, codec, direction):
+        """Sends a passthrough query, returns the raw reply data"""
+        response = self._exchange(codec.encode(direction), codec.reply_length)
+        if response[-1:] != '#':
+            raise TelescopeError("%s on axis %d failed" % (codec.name,
+                                                           direction))
+        return response[:-1]
+
+    def get_axis_position(self, direction):
+        """Raw encoder position of one axis in 1/2**24 revolutions"""
+        return protocol.DECODERS['counts24'](
+            self.passthrough(protocol.AXIS_POSITION, direction))
+
+    def get_axis_positions(self):
+        """Raw (azimuth, altitude) encoder positions, both queries
+        pipelined"""
+        _codec = protocol.AXIS_POSITION
+        _replies = self.pipeline([
+            (_codec.encode(direction), _codec.reply_length)
+            for direction in (self.DIR_AZIMUTH, self.DIR_ELEVATION)])
+        for reply in _replies:
+            if reply[-1:] != '#':
+                raise TelescopeError("axis position query failed")
+        return tuple(protocol.DECODERS['counts24'](reply)
+                     for reply in _replies)
+
+    def axis_slew_done(self, direction):
+        """True once the axis has finished its last goto"""
+        return protocol.DECODERS['slew_done'](
+            self.passthrough(protocol.AXIS_SLEW_DONE, direction))
+
+    def get_axis_guide_rate(self, direction):
+        """Autoguide rate of one axis in 1/256ths of the sidereal rate.
+
+        The motor controllers have no query for the current slew rate;
+        diff get_axis_position readings for that.
+        """
+        return ord(self.passthrough(protocol.AXIS_GUIDE_RATE, direction))
+
+    @classmethod
+    def axis_counts_to_degrees(cls, counts):
+        return counts * 360.0 / cls.AXIS_COUNTS
 
     def _var_slew_command(self, direction, rate):
-        negative_rate = True if rate < 0 else False
-        track_rate_high = (int(abs(rate)) * 4) / 256
-        track_rate_low = (int(abs(rate)) * 4) % 256
-        direction_char = chr(16) if direction == self.DIR_AZIMUTH else chr(17)
-        sign_char = chr(7) if negative_rate is True else chr(6)
-        command = ('P' + chr(3) + direction_char + sign_char +
-                   chr(track_rate_high) + chr(track_rate_low) + chr(0) +
-                   chr(0))
-        self.send_command(command)
-        response = self.read_response(1)
-        self._validate_command(response)
+        # a zero rate is a stop and goes ahead of everything else
+        self._command(protocol.VAR_SLEW, (direction, rate),
+                      PRIORITY_SAFETY if rate == 0 else PRIORITY_CONTROL)
 
     def slew_var(self, az_rate, el_rate):
         self._var_slew_command(self.DIR_AZIMUTH, az_rate)
         self._var_slew_command(self.DIR_ELEVATION, el_rate)
+        self._command_motion('slew_var', (az_rate, el_rate))
+
+    def safe_slew_var(self, az_rate, el_rate, az, el, lookahead=2.0):
+        """slew_var that refuses rates heading past the horizon mask
+
+        :param az: current azimuth, as last polled by the caller
+        :param el: current elevation, as last polled by the caller
+        :param lookahead: seconds ahead the projected position is checked
+        """
+        if not self.horizon_mask.rates_are_safe(az, el, az_rate / 3600.0,
+                                                el_rate / 3600.0, lookahead):
+            self.slew_var(0, 0)
+            raise TelescopeError(
+                "slew at %s, %s arcsec/s from Az: %s, El: %s is not safe" %
+                (az_rate, el_rate, az, el))
+        self.slew_var(az_rate, el_rate)
 
     def _fixed_slew_command(self, direction, rate):
-        negative_rate = True if rate < 0 else False
-        sign_char = chr(37) if negative_rate is True else chr(36)
-        direction_char = chr(16) if direction == self.DIR_AZIMUTH else chr(17)
-        rate_char = chr(int(abs(rate)))
-        command = ('P' + chr(2) + direction_char + sign_char + rate_char +
-                   chr(0) + chr(0) + chr(0))
-        self.send_command(command)
-        response = self.read_response(1)
-        self._validate_command(response)
+        self._command(protocol.FIXED_SLEW, (direction, rate),
+                      PRIORITY_SAFETY if rate == 0 else PRIORITY_CONTROL)
 
     def slew_fixed(self, az_rate, el_rate):
         assert (az_rate >= -9) and (az_rate <= 9), 'az_rate out of range'
         assert (el_rate >= -9) and (el_rate <= 9), 'az_rate out of range'
         self._fixed_slew_command(self.DIR_AZIMUTH, az_rate)
         self._fixed_slew_command(self.DIR_ELEVATION, el_rate)
+        self._command_motion('slew_fixed', (az_rate, el_rate))
 
 
 
@@ -299,42 +818,14 @@ class NexStarSLT130(BaseTelescope):
 
         :return:
         """
-        self.send_command('w')
-        response = self.read_response(9)
-
-        lat = ()
-        for char in response[:4]:
-            lat = lat + (ord(char),)
-        _lat_degrees= lat[0] + (lat[1] / 60.0) + (lat[2]/(60.0 * 60.0))
-        if lat[3] != 0:
-            _lat_degrees *= -1.0
-
-        _long = ()
-        for char in response[4:-1]:
-            _long = _long + (ord(char),)
-        _long_degrees= _long[0] + (_long[1] / 60.0) + (_long[2]/(60.0 * 60.0))
-        if _long[3] != 0:
-            _long_degrees *= -1.0
-
-        return _lat_degrees, _long_degrees
+        lat, _long = self._command(protocol.GET_LOCATION)
+        return protocol.dms_to_degrees(lat), protocol.dms_to_degrees(_long)
 
     def set_location(self, lat, lon):
-        command = 'W'
-        for p in lat:
-            command += chr(p)
-        for p in lon:
-            command += chr(p)
-        self.send_command(command)
-        response = self.read_response(1)
-        self._validate_command(response)
+        self._command(protocol.SET_LOCATION, (lat, lon), PRIORITY_CONTROL)
 
     def _get_time(self):
-        self.send_command('h')
-        response = self.read_response(9)
-        time = ()
-        for char in response[:-1]:
-            time = time + (ord(char),)
-        return time
+        return self._command(protocol.GET_TIME)
 
     def get_time_initializer(self):
         """Returns time initializer  of the format YYYYMMDDTHHmmss"""
@@ -349,45 +840,46 @@ class NexStarSLT130(BaseTelescope):
     def get_time(self):
         return Time(self.get_time_initializer())
 
+    def get_unix_time(self):
+        """Mount clock as unix time; the clock keeps local time, so its
+        GMT offset and daylight saving hour are taken back out"""
+        (_hour, _minute, _seconds, _month, _day_of_month, _year,
+         _gmt_offset, _daylight_savings) = self._get_time()
+        if _gmt_offset > 127:
+            # zones west of Greenwich are sent as 256 - hours
+            _gmt_offset -= 256
+        _local = calendar.timegm((2000 + _year, _month, _day_of_month,
+                                  _hour, _minute, _seconds))
+        return _local - (_gmt_offset + _daylight_savings) * 3600
+
 
     def set_time_initializer(self, time):
-        command = 'H'
-        for p in time:
-            command += chr(p)
-        self.send_command(command)
-        response = self.read_response(1)
-        self._validate_command(response)
+        self._command(protocol.SET_TIME, (time,), PRIORITY_CONTROL)
 
     def get_version(self):
-        self.send_command('V')
-        response = self.read_response(3)
-        return ord(response[0]) + ord(response[1]) / 10.0
+        return self._command(protocol.GET_VERSION)
 
     def get_model(self):
-        self.send_command('m')
-        response = self.read_response(2)
-        return ord(response[0])
+        return self._command(protocol.GET_MODEL)
 
     def echo(self, x):
-        command = 'K' + chr(x)
-        self.send_command(command)
-        response = self.read_response(2)
-        return ord(response[0])
+        return self._command(protocol.ECHO, (x,))
 
     def alignment_complete(self):
-        self.send_command('J')
-        response = self.read_response(2)
-        return True if ord(response[0]) == 1 else False
+        return self._command(protocol.ALIGNMENT_COMPLETE)
 
     def goto_in_progress(self):
-        self.send_command('L')
-        response = self.read_response(2)
-        return True if int(response[0]) == 1 else False
+        _codec = protocol.GOTO_IN_PROGRESS
+        response = self._exchange_view(_codec.command, _codec.reply_length)
+        self._observe('L', response)
+        return _codec.decode(response)
 
     def cancel_goto(self):
-        self.send_command('M')
-        response = self.read_response(1)
-        self._validate_command(response)
+        # drop queued gotos and slews too, so nothing stale runs after the stop
+        try:
+            self._command(protocol.CANCEL_GOTO, (), PRIORITY_SAFETY, flush=True)
+        finally:
+            self.commanded_motion = None
 
 
     def cancel_current_operation(self):
@@ -0,0 +1,80 @@
+from unittest import TestCase
+import numpy as np
+import alignment
+import astrometry
+import catalog
+import emulator
+import horizon
+import telescopes
+
+_WHEN = 1700000000.0   # 2023-11-14 22:13:20 UTC
+
+
+class TestChooseStars(TestCase):
+
+    def setUp(self):
+        self.stars = catalog.Catalog.load()
+
+    def test_visible_and_separated(self):
+        _chosen = alignment.choose_stars(self.stars, 45.0, -75.0, _WHEN,
+                                         min_separation=40.0)
+        self.assertEqual(len(_chosen), 3)
+        for star in _chosen:
+            self.assertTrue(20.0 <= star.alt <= 75.0)
+            self.assertLessEqual(star.mag, 2.5)
+        for a, b in [(0, 1), (0, 2), (1, 2)]:
+            self.assertGreaterEqual(astrometry.angular_separation(
+                _chosen[a].ra, _chosen[a].dec, _chosen[b].ra, _chosen[b].dec),
+                40.0)
+
+    def test_respects_horizon_mask(self):
+        # nothing below 60 degrees in the north half of the sky
+        _mask = horizon.HorizonMask([60.0] * 90 + [0.0] * 180 + [60.0] * 90)
+        _chosen = alignment.choose_stars(self.stars, 45.0, -75.0, _WHEN,
+                                         mask=_mask)
+        self.assertTrue(_chosen)
+        self.assertTrue(all(_mask.is_safe(s.az, s.alt) for s in _chosen))
+
+    def test_first_star_is_near_the_mount(self):
+        _indices, _alt, _az = alignment.candidates(self.stars, 45.0, -75.0,
+                                                   _WHEN)
+        _start = (_az[0], _alt[0])
+        _chosen = alignment.choose_stars(self.stars, 45.0, -75.0, _WHEN,
+                                         count=2, start=_start)
+        _cost = alignment.slewmodel.SlewModel()(
+            _start[0], _start[1], np.array([s.az for s in _chosen]),
+            np.array([s.alt for s in _chosen]))
+        self.assertLessEqual(_cost[0], _cost[1])
+
+    def test_only_stars(self):
+        # the Pleiades are bright enough to pass the magnitude cut
+        _pleiades = self.stars.find("M45")
+        for hours in range(0, 24, 2):
+            _indices, _, _ = alignment.candidates(
+                self.stars, 45.0, -75.0, _WHEN + hours * 3600.0)
+            self.assertTrue(len(_indices))
+            self.assertNotIn(_pleiades, _indices)
+            self.assertTrue(all(self.stars.kind[_indices] == 'star'))
+
+    def test_impossible(self):
+        self.assertEqual(alignment.choose_stars(
+            self.stars, 45.0, -75.0, _WHEN, min_separation=179.0), [])
+
+
+class TestAlign(TestCase):
+
+    def test_choose_for_telescope_and_align(self):
+        _mount = emulator.MountEmulator()
+        # 45N 75W, 2023-11-14 22:13:20 UTC kept as 17:13:20 GMT-5
+        _mount.location = '\x2d\x00\x00\x00\x4b\x00\x00\x01'
+        _mount.time = '\x11\x0d\x14\x0b\x0e\x17\xfb\x00'
+        dut = telescopes.NexStarSLT130('emulator://')
+        dut.serial.handler = _mount.feed
+        _chosen = alignment.choose_for_telescope(dut)
+        self.assertEqual(_chosen, alignment.choose_stars(
+            catalog.Catalog.load(), 45.0, -75.0, _WHEN, start=(0.0, 0.0)))
+        _synced = alignment.align(dut, _chosen,
+                                  lambda star: star is not _chosen[1])
+        self.assertEqual(_synced, [_chosen[0], _chosen[2]])
+        self.assertEqual([c[0] for c in _mount.received
+                          if c[0] in 'rs'], ['r', 's', 'r', 'r', 's'])
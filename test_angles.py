@@ -0,0 +1,25 @@
+from unittest import TestCase
+import angles
+
+
+class TestAngle(TestCase):
+
+    def test_hex_round_trip_is_exact(self):
+        for text in ('00000000', '12AB34CD', 'FFFFFFFF'):
+            self.assertEqual(angles.Angle.from_hex(text).hex(), text)
+
+    def test_degrees(self):
+        self.assertEqual(angles.Angle.from_hex('80000000').degrees, 180.0)
+        self.assertEqual(angles.Angle.from_degrees(90.0).hex(), '40000000')
+        # rounds up to a full turn, which wraps to zero
+        self.assertEqual(angles.Angle.from_degrees(359.99999999).hex(),
+                         '00000000')
+        self.assertEqual(angles.Angle.from_degrees(-90.0).hex(), 'C0000000')
+
+    def test_difference_wraps(self):
+        _a = angles.Angle.from_hex('FFFFFFF0')
+        _b = angles.Angle.from_hex('00000010')
+        self.assertEqual(_b - _a, 0x20)
+        self.assertEqual(_a - _b, -0x20)
+        self.assertEqual(_a + 0x20, _b)
+
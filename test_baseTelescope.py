@@ -1,5 +1,6 @@
 from unittest import TestCase
 from testfixtures import replace
+import telescopes
 from telescopes import BaseTelescope
 from mock import Mock
 import time
@@ -17,3 +18,53 @@ class TestBaseTelescope(TestCase):
         mock_time_init.return_value = time.time()
 
         print(self.dut.get_altaz())
+
+
+class _BusyTelescope(object):
+    def __init__(self, polls):
+        self.polls = polls
+        self.cancelled = False
+
+    def goto_in_progress(self):
+        self.polls -= 1
+        return self.polls > 0
+
+    def cancel_goto(self):
+        self.cancelled = True
+
+
+class TestGotoCompletion(TestCase):
+
+    def test_poll_intervals(self):
+        _intervals = telescopes.goto_poll_intervals(10.0, 0.1, 5.0)
+        _first = [next(_intervals) for _ in range(8)]
+        self.assertEqual(_first[0], 5.0)
+        self.assertTrue(_first[0] > _first[1] > _first[2])
+        self.assertAlmostEqual(sum(_first[:7]), 10.0, delta=0.2)
+
+    def test_arrival_fires_callback(self):
+        _telescope = _BusyTelescope(3)
+        _arrived = []
+        _completion = telescopes.GotoCompletion(_telescope, predicted=0.05,
+                                                min_interval=0.01)
+        _completion.add_done_callback(_arrived.append)
+        self.assertTrue(_completion.result(timeout=5.0) >= 0.0)
+        self.assertEqual(_arrived, [_completion])
+        self.assertEqual(_completion.state, telescopes.GotoCompletion.ARRIVED)
+        self.assertFalse(_telescope.cancelled)
+
+    def test_timeout_cancels(self):
+        _telescope = _BusyTelescope(10 ** 6)
+        _completion = telescopes.GotoCompletion(_telescope, predicted=0.01,
+                                                timeout=0.1,
+                                                min_interval=0.01)
+        self.assertRaises(telescopes.GotoTimeout, _completion.result, 5.0)
+        self.assertTrue(_telescope.cancelled)
+
+    def test_cancel(self):
+        _telescope = _BusyTelescope(10 ** 6)
+        _completion = telescopes.GotoCompletion(_telescope, predicted=60.0)
+        _completion.cancel()
+        self.assertTrue(_completion.wait(5.0))
+        self.assertEqual(_completion.state, telescopes.GotoCompletion.CANCELLED)
+        self.assertTrue(_telescope.cancelled)
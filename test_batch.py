@@ -0,0 +1,61 @@
+from unittest import TestCase
+from StringIO import StringIO
+import json
+import batch
+
+
+class _ScriptTelescope(object):
+    def __init__(self):
+        self.calls = []
+
+    def pipeline(self, commands):
+        self.calls.append(('pipeline', [c for c, _ in commands]))
+        _replies = {'e': '40000000,20000000#', 't': '\x02#', 'L': '0#'}
+        return [_replies[c] for c, _ in commands]
+
+    def _parse_position(self, response):
+        return (int(response[:8], 16) / 2. ** 32 * 360.,
+                int(response[9:17], 16) / 2. ** 32 * 360.)
+
+    def goto_ra_dec(self, _ra, _dec):
+        self.calls.append(('goto_ra_dec', _ra, _dec))
+
+    def wait_for_goto(self, timeout=None):
+        self.calls.append(('wait_for_goto', timeout))
+        return 0.0
+
+
+class TestBatch(TestCase):
+
+    def setUp(self):
+        self.dut = _ScriptTelescope()
+
+    def test_parse_errors(self):
+        self.assertRaises(ValueError, batch.parse, ["fly_away"])
+        self.assertRaises(ValueError, batch.parse, ["goto_radec 1"])
+        self.assertRaises(ValueError, batch.parse, ["sleep soon"])
+
+    def test_queries_are_pipelined(self):
+        _out = StringIO()
+        self.assertTrue(batch.run_script(self.dut, [
+            "get_radec", "get_tracking_mode  # comment", "",
+            "goto_radec 10 20", "wait 5",
+            "goto_in_progress", "get_radec"], _out))
+        self.assertEqual(self.dut.calls, [
+            ('pipeline', ['e', 't']),
+            ('goto_ra_dec', 10.0, 20.0),
+            ('wait_for_goto', 5.0),
+            ('pipeline', ['L', 'e'])])
+        _records = [json.loads(line) for line in _out.getvalue().splitlines()]
+        self.assertEqual([r['line'] for r in _records], [1, 2, 4, 5, 6, 7])
+        self.assertEqual(_records[0]['result'], [90.0, 45.0])
+        self.assertEqual(_records[1]['result'], 2)
+        self.assertEqual(_records[4]['result'], False)
+
+    def test_stops_on_error(self):
+        _out = StringIO()
+        self.assertFalse(batch.run_script(self.dut, ["sync 1 2", "get_radec"],
+                                          _out))
+        _records = [json.loads(line) for line in _out.getvalue().splitlines()]
+        self.assertEqual(len(_records), 1)
+        self.assertTrue('error' in _records[0])
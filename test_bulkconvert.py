@@ -0,0 +1,30 @@
+from unittest import TestCase
+import numpy as np
+import astrometry
+import bulkconvert
+
+
+class TestBulkConvert(TestCase):
+
+    def setUp(self):
+        _random = np.random.RandomState(2)
+        self._radec = np.column_stack((_random.uniform(0, 360, 1000),
+                                       _random.uniform(-90, 90, 1000)))
+        self._lines = ["%.6f,%.6f\n" % tuple(row) for row in self._radec]
+
+    def _expected(self):
+        _alt, _az = astrometry.radec_to_altaz(
+            self._radec[:, 0], self._radec[:, 1], 37.5, -121.0, 1.7e9)
+        return np.column_stack((_alt, _az))
+
+    def test_convert_block_parses_lines(self):
+        _text = bulkconvert.convert_block(self._lines, 37.5, -121.0, 1.7e9)
+        _result = np.loadtxt(_text.splitlines(), delimiter=',')
+        self.assertTrue(np.allclose(_result, self._expected(), atol=1e-5))
+
+    def test_stream_keeps_order(self):
+        _blocks = [self._lines[i:i + 64] for i in range(0, 1000, 64)]
+        _text = "".join(bulkconvert.convert_stream(
+            iter(_blocks), 37.5, -121.0, 1.7e9, workers=2, in_flight=3))
+        _result = np.loadtxt(_text.splitlines(), delimiter=',')
+        self.assertTrue(np.allclose(_result, self._expected(), atol=1e-5))
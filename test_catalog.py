@@ -0,0 +1,43 @@
+from unittest import TestCase
+import numpy as np
+import catalog
+
+
+class TestCatalog(TestCase):
+
+    def setUp(self):
+        self.dut = catalog.Catalog(**catalog.read_csv(catalog.DEFAULT_CATALOG))
+
+    def test_lookup_by_name_and_alias(self):
+        self.assertEqual(self.dut.lookup("M 31").name, "M31")
+        self.assertEqual(self.dut.lookup("ngc224").name, "M31")
+        self.assertEqual(self.dut.lookup("andromeda galaxy").name, "M31")
+        self.assertEqual(self.dut.find("not an object"), None)
+        self.assertRaises(KeyError, self.dut.lookup, "not an object")
+
+    def test_kinds(self):
+        self.assertEqual(self.dut.kind[self.dut.find("Vega")], "star")
+        self.assertEqual(self.dut.kind[self.dut.find("M45")], "cluster")
+        self.assertEqual(self.dut.kind[self.dut.find("M31")], "galaxy")
+        self.assertTrue(set(self.dut.kind) <= set(catalog.KINDS))
+
+    def test_complete(self):
+        self.assertEqual(self.dut.complete("veg"), ["Vega"])
+
+    def test_nearest(self):
+        _object, _separation = self.dut.nearest(83.8, -5.4)
+        self.assertEqual(_object.name, "M42")
+        self.assertTrue(_separation < 0.05)
+        self.assertEqual(self.dut.nearest(0.0, -89.0, max_radius=1.0),
+                         (None, None))
+
+    def test_cone_matches_brute_force(self):
+        _random = np.random.RandomState(1)
+        for ra, dec in zip(_random.uniform(0, 360, 20),
+                           _random.uniform(-90, 90, 20)):
+            _indices, _separations = self.dut.cone(ra, dec, 25.0)
+            _all = catalog.astrometry.angular_separation(
+                ra, dec, self.dut.ra, self.dut.dec)
+            self.assertEqual(sorted(_indices),
+                             list(np.nonzero(_all <= 25.0)[0]))
+            self.assertTrue(np.all(np.diff(_separations) >= 0))
@@ -0,0 +1,97 @@
+from unittest import TestCase
+import threading
+import time
+import commandqueue
+from commandqueue import PRIORITY_SAFETY, PRIORITY_CONTROL, PRIORITY_QUERY
+
+
+class _SlowLink(object):
+    """Serial stand-in whose replies take a while and can be held back"""
+
+    def __init__(self, delay=0.01):
+        self.delay = delay
+        self.sent = []
+        self.release = threading.Event()
+        self.release.set()
+
+    def send(self, command):
+        self.sent.append(command)
+
+    def read(self, n_bytes):
+        self.release.wait()
+        time.sleep(self.delay)
+        return '#' * n_bytes
+
+
+class TestCommandScheduler(TestCase):
+
+    def setUp(self):
+        self.link = _SlowLink()
+        self.dut = commandqueue.CommandScheduler(self.link.send,
+                                                 self.link.read)
+
+    def tearDown(self):
+        self.link.release.set()
+        self.dut.close()
+
+    def test_exchange(self):
+        self.assertEqual(self.dut.exchange('e', 18), '#' * 18)
+        self.assertEqual(self.link.sent, ['e'])
+
+    def test_safety_jumps_queued_polls(self):
+        self.link.release.clear()
+        _polls = [self.dut.submit('e', 18) for _ in range(20)]
+        time.sleep(0.05)
+        _stop = self.dut.submit('M', 1, PRIORITY_SAFETY)
+        self.link.release.set()
+        _stop.result(5)
+        # only the poll already on the wire went before the cancel
+        self.assertEqual(self.link.sent.index('M'), 1)
+        for poll in _polls:
+            poll.result(5)
+
+    def test_flush_drops_queued_control_commands(self):
+        self.link.release.clear()
+        _first = self.dut.submit('e', 18)
+        time.sleep(0.05)
+        _goto = self.dut.submit('r', 1, PRIORITY_CONTROL)
+        _poll = self.dut.submit('z', 18)
+        _stop = self.dut.submit('M', 1, PRIORITY_SAFETY, flush=True)
+        self.link.release.set()
+        self.assertEqual(_stop.result(5), '#')
+        self.assertRaises(commandqueue.CommandCancelled, _goto.result, 5)
+        self.assertEqual(_poll.result(5), '#' * 18)
+        _first.result(5)
+        self.assertEqual(self.link.sent, ['e', 'M', 'z'])
+
+    def test_link_budget_limits_queries_only(self):
+        self.dut.close()
+        self.link.delay = 0
+        self.dut = commandqueue.CommandScheduler(self.link.send,
+                                                 self.link.read,
+                                                 link_budget=190, burst=0.1)
+        _start = time.time()
+        for _ in range(3):
+            self.dut.exchange('e', 18)
+        # 19 bytes each at 190 bytes/s, the first one from the burst
+        self.assertGreater(time.time() - _start, 0.15)
+        _start = time.time()
+        for _ in range(3):
+            self.dut.exchange('M', 1, PRIORITY_SAFETY)
+        self.assertLess(time.time() - _start, 0.05)
+
+    def test_errors_reach_the_caller(self):
+        def _broken(n_bytes):
+            raise IOError("port gone")
+        self.dut.close()
+        self.dut = commandqueue.CommandScheduler(self.link.send, _broken)
+        self.assertRaises(IOError, self.dut.exchange, 'e', 18)
+
+    def test_close_fails_pending(self):
+        self.link.release.clear()
+        self.dut.submit('e', 18)
+        time.sleep(0.05)
+        _queued = self.dut.submit('z', 18)
+        threading.Timer(0.05, self.link.release.set).start()
+        self.dut.close()
+        self.assertRaises(commandqueue.CommandCancelled, _queued.result, 1)
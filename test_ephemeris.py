@@ -0,0 +1,50 @@
+import os
+import shutil
+import tempfile
+import time
+from unittest import TestCase
+import ephemeris
+import viscache
+
+
+class TestEphemerisCache(TestCase):
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        self.dut = ephemeris.EphemerisCache(45.0, -75.0, self.path)
+        self.when = 1700000000.0
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def test_night_start(self):
+        _start = ephemeris.night_start(self.when, -75.0)
+        self.assertLessEqual(_start, self.when)
+        self.assertLess(self.when - _start, ephemeris.DAY)
+        self.assertEqual(viscache.night_key(_start, -75.0),
+                         viscache.night_key(self.when, -75.0))
+
+    def test_interpolation_matches_direct_evaluation(self):
+        _when = self.when + 1234.5
+        _times, _ra, _dec = ephemeris.compute_night(
+            45.0, -75.0, _when, ephemeris.DAY, ('moon',))
+        _expected = _ra[0][0], _dec[0][0]
+        _ra, _dec = self.dut.position('Moon', _when)
+        self.assertAlmostEqual(_ra, _expected[0], delta=0.003)
+        self.assertAlmostEqual(_dec, _expected[1], delta=0.003)
+
+    def test_persisted_per_site_and_night(self):
+        _position = self.dut.position('jupiter', self.when)
+        _files = os.listdir(self.dut.path)
+        self.assertEqual(_files, [viscache.night_key(self.when, -75.0) +
+                                  ".npz"])
+        _reloaded = ephemeris.EphemerisCache(45.0, -75.0, self.path)
+        _start = time.time()
+        self.assertEqual(_reloaded.position('jupiter', self.when), _position)
+        # read back, not recomputed
+        self.assertLess(time.time() - _start, 0.5)
+
+    def test_unknown_and_sun(self):
+        self.assertRaises(KeyError, self.dut.position, 'sun', self.when)
+        self.assertFalse(ephemeris.is_body('M31'))
+        self.assertTrue(ephemeris.is_body(' Mars '))
@@ -0,0 +1,42 @@
+from unittest import TestCase
+import time
+import fleet
+import telescopes
+
+
+class _SlowTelescope(telescopes.BaseTelescope):
+    def __init__(self, device):
+        super(_SlowTelescope, self).__init__(device)
+        self.closed = False
+
+    def get_ra_dec(self):
+        time.sleep(0.1)
+        return 10.0, 20.0
+
+    def cancel_goto(self):
+        if self.device == "bad":
+            raise telescopes.TelescopeError("no reply")
+
+    def close(self):
+        self.closed = True
+
+
+class TestFleet(TestCase):
+
+    def setUp(self):
+        self.dut = fleet.Fleet(["a", "b", "c", "bad"], _SlowTelescope)
+
+    def tearDown(self):
+        self.dut.close()
+
+    def test_broadcast_runs_concurrently(self):
+        _results = self.dut.broadcast('get_ra_dec')
+        self.assertEqual([r.device for r in _results], ["a", "b", "c", "bad"])
+        self.assertEqual([r.value for r in _results], [(10.0, 20.0)] * 4)
+        self.assertTrue(self.dut.last_timing.wall < 0.35)
+        self.assertTrue(self.dut.last_timing.speedup > 1.5)
+
+    def test_errors_are_per_mount(self):
+        _results = self.dut.cancel_all()
+        self.assertEqual([r.error is None for r in _results],
+                         [True, True, True, False])
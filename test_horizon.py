@@ -0,0 +1,34 @@
+from unittest import TestCase
+import numpy as np
+import horizon
+
+
+class TestHorizonMask(TestCase):
+
+    def setUp(self):
+        # a wall to the east, open sky elsewhere
+        self.dut = horizon.HorizonMask.from_points(
+            [(0.0, 10.0), (80.0, 10.0), (90.0, 40.0), (100.0, 10.0)],
+            max_altitude=85.0)
+
+    def test_is_safe(self):
+        self.assertTrue(self.dut.is_safe(180.0, 15.0))
+        self.assertFalse(self.dut.is_safe(180.0, 5.0))
+        self.assertFalse(self.dut.is_safe(90.0, 30.0))
+        self.assertFalse(self.dut.is_safe(180.0, 88.0))
+        self.assertTrue(self.dut.is_safe(450.0 - 360.0, 45.0))
+
+    def test_are_safe_matches_is_safe(self):
+        _az = np.linspace(0.0, 359.9, 500)
+        _alt = np.linspace(0.0, 90.0, 500)
+        self.assertEqual(list(self.dut.are_safe(_az, _alt)),
+                         [self.dut.is_safe(a, e) for a, e in zip(_az, _alt)])
+
+    def test_path_is_safe(self):
+        self.assertTrue(self.dut.path_is_safe(180.0, 20.0, 200.0, 30.0))
+        # low slew straight through the wall
+        self.assertFalse(self.dut.path_is_safe(60.0, 20.0, 120.0, 20.0))
+
+    def test_rates_are_safe(self):
+        self.assertTrue(self.dut.rates_are_safe(180.0, 11.0, 0.0, 0.1))
+        self.assertFalse(self.dut.rates_are_safe(180.0, 11.0, 0.0, -1.0))
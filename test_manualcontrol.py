@@ -0,0 +1,130 @@
+from unittest import TestCase
+import os
+import struct
+import tempfile
+import time
+from StringIO import StringIO
+import manualcontrol
+
+
+class _SlewTelescope(object):
+    DIR_AZIMUTH = 0
+    DIR_ELEVATION = 1
+
+    def __init__(self):
+        self.commands = []
+
+    def _var_slew_command(self, direction, rate):
+        self.commands.append(('var', direction, rate))
+
+    def _fixed_slew_command(self, direction, rate):
+        self.commands.append(('fixed', direction, rate))
+
+    def _command_motion(self, kind, values):
+        self.motion = (kind, values)
+
+
+class _FailingTelescope(_SlewTelescope):
+    """Rejects motion on the azimuth axis, accepts stops"""
+
+    def _var_slew_command(self, direction, rate):
+        if direction == self.DIR_AZIMUTH and rate:
+            raise IOError("link down")
+        _SlewTelescope._var_slew_command(self, direction, rate)
+
+
+class TestRateMapper(TestCase):
+
+    def test_deadzone_and_full_scale(self):
+        dut = manualcontrol.RateMapper(max_rate=3600, deadzone=0.1)
+        self.assertEqual(dut(0.05), 0)
+        self.assertEqual(dut(1.0), 3600)
+        self.assertEqual(dut(-1.0), -3600)
+        self.assertLess(dut(0.5), 1800)
+
+    def test_fixed(self):
+        dut = manualcontrol.RateMapper(fixed=True, expo=1.0)
+        self.assertEqual(dut(1.0), 9)
+        self.assertEqual(dut(-1.0), -9)
+
+
+class TestManualControl(TestCase):
+
+    def setUp(self):
+        self.telescope = _SlewTelescope()
+        self.dut = manualcontrol.ManualControl(
+            self.telescope, manualcontrol.RateMapper(expo=1.0, deadzone=0.0),
+            send_rate=10.0)
+
+    def tearDown(self):
+        self.dut.close()
+
+    def _settle(self):
+        time.sleep(0.3)
+
+    def test_only_changed_axis_is_sent(self):
+        self.dut.set_axis('az', 0.5)
+        self._settle()
+        self.assertEqual(self.telescope.commands, [('var', 0, 1800)])
+        self.assertEqual(self.telescope.motion, ('slew_var', (1800, 0)))
+
+    def test_burst_is_coalesced(self):
+        self.dut.set_axis('az', 0.1)
+        for i in range(100):
+            self.dut.set_axis('az', i / 100.0)
+        self.dut.set_axis('az', 1.0)
+        self._settle()
+        self.assertLessEqual(len(self.telescope.commands), 3)
+        self.assertEqual(self.telescope.commands[-1], ('var', 0, 3600))
+
+    def test_first_change_is_immediate(self):
+        _start = time.time()
+        self.dut.set_axis('el', -1.0)
+        while not self.telescope.commands and time.time() - _start < 1.0:
+            time.sleep(0.001)
+        self.assertLess(time.time() - _start, 0.05)
+        self.assertEqual(self.telescope.commands, [('var', 1, -3600)])
+
+    def test_close_stops_moving_axes(self):
+        self.dut.set_axis('az', 1.0)
+        self._settle()
+        self.dut.close()
+        self.assertEqual(self.telescope.commands[-1], ('var', 0, 0))
+        self.assertEqual(len(self.telescope.commands), 2)
+
+    def test_failed_send_stops_and_is_reported(self):
+        self.dut.close()
+        self.telescope = _FailingTelescope()
+        _errors = []
+        self.dut = manualcontrol.ManualControl(
+            self.telescope, manualcontrol.RateMapper(expo=1.0, deadzone=0.0),
+            on_error=_errors.append)
+        self.dut.set_axis('el', 0.5)
+        self._settle()
+        self.dut.set_axis('az', 0.5)
+        self._settle()
+        self.assertEqual(len(_errors), 1)
+        self.assertEqual(self.telescope.commands[-2:],
+                         [('var', 0, 0), ('var', 1, 0)])
+        self.assertRaises(IOError, self.dut.close)
+
+
+class TestInputs(TestCase):
+
+    def test_read_lines(self):
+        _events = list(manualcontrol.read_lines(
+            StringIO("az 0.5\nbogus\nel -3\n")))
+        self.assertEqual(_events, [('az', 0.5), ('el', -1.0)])
+
+    def test_read_joystick(self):
+        _fd, _path = tempfile.mkstemp()
+        with os.fdopen(_fd, 'wb') as _file:
+            _file.write(struct.pack('<IhBB', 0, 32767, 0x82, 0))
+            _file.write(struct.pack('<IhBB', 1, 1, 0x01, 0))
+            _file.write(struct.pack('<IhBB', 2, -32767, 0x02, 1))
+            _file.write(struct.pack('<IhBB', 3, 100, 0x02, 5))
+        try:
+            self.assertEqual(list(manualcontrol.read_joystick(_path)),
+                             [('az', 1.0), ('el', -1.0)])
+        finally:
+            os.remove(_path)
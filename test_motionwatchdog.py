@@ -0,0 +1,170 @@
+from unittest import TestCase
+import horizon
+import motionwatchdog
+import telescopes
+
+
+class _StreamTelescope(object):
+    def __init__(self):
+        self.commanded_motion = None
+        self.listeners = []
+        self.calls = []
+
+    def add_stream_listener(self, callback):
+        self.listeners.append(callback)
+
+    def remove_stream_listener(self, callback):
+        self.listeners.remove(callback)
+
+    def get_location_lat_long(self):
+        self.calls.append('get_location_lat_long')
+        return 45.0, -75.0
+
+    def command(self, kind, values, started=0.0):
+        self.commanded_motion = telescopes.MotionCommand(kind, values, started)
+
+    def cancel_goto(self):
+        self.calls.append('cancel_goto')
+        self.commanded_motion = None
+
+    def slew_var(self, az_rate, el_rate):
+        self.calls.append(('slew_var', az_rate, el_rate))
+        self.commanded_motion = None
+
+    def feed(self, timestamp, command, value):
+        for callback in self.listeners:
+            callback(timestamp, command, value)
+
+
+class TestMotionWatchdog(TestCase):
+
+    def setUp(self):
+        self.telescope = _StreamTelescope()
+        self.dut = motionwatchdog.MotionWatchdog(
+            self.telescope, horizon.HorizonMask.flat(10.0)).attach()
+
+    def assertStopped(self, kind):
+        self.assertEqual(self.dut.trips[-1].kind, kind)
+        self.assertEqual(self.telescope.calls[-2:],
+                         ['cancel_goto', ('slew_var', 0, 0)])
+
+    def test_attach_reads_location_once(self):
+        self.assertEqual(self.dut.location, (45.0, -75.0))
+        self.assertEqual(self.telescope.calls, ['get_location_lat_long'])
+        self.dut.detach()
+        self.assertEqual(self.telescope.listeners, [])
+
+    def test_idle_mount_is_not_watched(self):
+        self.telescope.feed(0.0, 'z', (10.0, 5.0))
+        self.telescope.feed(100.0, 'z', (10.0, 5.0))
+        self.assertEqual(self.dut.trips, [])
+
+    def test_goto_progress_and_arrival(self):
+        self.telescope.command('goto_altaz', (40.0, 100.0))
+        for t, az in enumerate([20.0, 40.0, 60.0, 80.0, 99.9]):
+            self.telescope.feed(float(t), 'z', (az, 40.0))
+        # tracking slowly after arrival is not a stall
+        self.telescope.feed(10.0, 'z', (99.9, 40.0))
+        self.assertEqual(self.dut.trips, [])
+
+    def test_goto_stall(self):
+        self.telescope.command('goto_altaz', (40.0, 100.0))
+        self.telescope.feed(0.0, 'z', (20.0, 40.0))
+        self.telescope.feed(1.0, 'z', (30.0, 40.0))
+        self.telescope.feed(3.0, 'z', (30.01, 40.0))
+        self.assertEqual(self.dut.trips, [])
+        self.telescope.feed(4.5, 'z', (30.01, 40.0))
+        self.assertStopped('stall')
+        self.assertIsNone(self.telescope.commanded_motion)
+
+    def test_goto_overshoot(self):
+        self.telescope.command('goto_altaz', (40.0, 100.0))
+        self.telescope.feed(0.0, 'z', (90.0, 40.0))
+        self.telescope.feed(0.5, 'z', (97.0, 40.0))
+        self.telescope.feed(1.0, 'z', (94.0, 40.0))
+        self.assertStopped('overshoot')
+
+    def test_goto_radec_followed_in_radec(self):
+        self.telescope.command('goto_radec', (100.0, 20.0))
+        self.telescope.feed(0.0, 'e', (90.0, 20.0))
+        self.telescope.feed(1.0, 'e', (100.0, 20.0))
+        self.telescope.feed(20.0, 'e', (100.0, 20.0))
+        self.assertEqual(self.dut.trips, [])
+
+    def test_goto_radec_south_polled_in_both_frames(self):
+        # 'z' and 'e' distances are not compared with each other
+        self.telescope.command('goto_radec', (100.0, -20.0))
+        self.telescope.feed(0.0, 'z', (0.0, 80.0))
+        self.telescope.feed(0.0, 'e', (90.0, -20.0))
+        self.telescope.feed(0.5, 'e', (95.0, -20.0))
+        self.assertEqual(self.dut.trips, [])
+        self.telescope.feed(1.0, 'e', (85.0, -20.0))
+        self.assertStopped('overshoot')
+
+    def test_goto_finished_by_goto_state(self):
+        self.telescope.command('goto_altaz', (40.0, 100.0))
+        self.telescope.feed(0.0, 'z', (90.0, 40.0))
+        self.telescope.feed(0.5, 'L', False)
+        self.telescope.feed(10.0, 'z', (90.0, 40.0))
+        self.assertEqual(self.dut.trips, [])
+
+    def test_horizon_limit(self):
+        self.telescope.command('slew_var', (0, -3600))
+        self.telescope.feed(0.0, 'z', (10.0, 12.0))
+        self.telescope.feed(0.5, 'z', (10.0, 9.0))
+        self.assertStopped('limit')
+
+    def test_slew_wrong_way(self):
+        self.telescope.command('slew_var', (3600, 0))
+        self.telescope.feed(0.0, 'z', (10.0, 45.0))
+        self.telescope.feed(0.5, 'z', (9.5, 45.0))
+        self.assertStopped('runaway')
+
+    def test_slew_too_fast(self):
+        self.telescope.command('slew_fixed', (0, 7))
+        self.telescope.feed(0.0, 'z', (10.0, 20.0))
+        self.telescope.feed(0.5, 'z', (10.0, 20.2))
+        self.assertEqual(self.dut.trips, [])
+        self.telescope.feed(1.0, 'z', (10.0, 21.2))
+        self.assertStopped('runaway')
+
+    def test_cable_wrap_runaway(self):
+        self.dut.runaway_rate = 100.0
+        self.telescope.command('slew_var', (36000, 0))
+        for t in range(40):
+            self.telescope.feed(t * 0.5, 'z', ((t * 10.0) % 360.0, 45.0))
+            if self.dut.trips:
+                break
+        self.assertStopped('runaway')
+        self.assertIn('azimuth', self.dut.trips[-1].detail)
+
+
+class TestStreamListener(TestCase):
+
+    def test_pipeline_and_polls_feed_listeners(self):
+        class _Fake(telescopes.NexStarSLT130):
+            def __init__(self):
+                self.scheduler = None
+                self.commanded_motion = None
+                self._stream_listeners = []
+                self.sent = []
+
+            def send_command(self, cmd):
+                self.sent.append(cmd)
+
+            def read_response(self, n_bytes=1):
+                return {'e': '40000000,20000000#', 'z': '80000000,10000000#',
+                        'L': '1#', 'b': '#'}[self.sent.pop(0)[0]]
+
+            read_response_into = read_response
+
+        _samples = []
+        dut = _Fake()
+        dut.add_stream_listener(lambda t, c, v: _samples.append((c, v)))
+        dut.get_ra_dec()
+        dut.pipeline([('z', 18), ('L', 2)])
+        self.assertEqual(_samples, [('e', (90.0, 45.0)), ('z', (180.0, 22.5)),
+                                    ('L', True)])
+        dut.goto_alt_az(30.0, 40.0)
+        self.assertEqual(dut.commanded_motion.kind, 'goto_altaz')
+        self.assertEqual(dut.commanded_motion.values, (30.0, 40.0))
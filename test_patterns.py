@@ -0,0 +1,89 @@
+from unittest import TestCase
+import numpy as np
+import astrometry
+import emulator
+import patterns
+import telescopes
+
+
+class TestPatterns(TestCase):
+
+    def test_tangent_offsets_are_angular(self):
+        _ra, _dec = patterns.tangent_to_radec(100.0, 80.0, [0.0, 1.0, 0.0],
+                                              [0.0, 0.0, -2.0])
+        self.assertAlmostEqual(_ra[0], 100.0)
+        self.assertAlmostEqual(_dec[0], 80.0)
+        _separation = astrometry.angular_separation(100.0, 80.0, _ra, _dec)
+        np.testing.assert_allclose(_separation, [0.0, 1.0, 2.0], atol=1e-6)
+        self.assertAlmostEqual(_dec[2], 78.0)
+
+    def test_serpentine(self):
+        self.assertEqual(patterns.serpentine(3, 2),
+                         [(0, 0), (1, 0), (2, 0), (2, 1), (1, 1), (0, 1)])
+        self.assertEqual(patterns.serpentine(2, 2, by_column=True,
+                                             flip_x=True),
+                         [(1, 0), (1, 1), (0, 1), (0, 0)])
+
+    def test_mosaic_neighbours_overlap(self):
+        _tiles = patterns.mosaic(10.0, 0.0, 3, 2, 2.0, overlap=0.25)
+        self.assertEqual(len(_tiles), 6)
+        _steps = astrometry.angular_separation(
+            np.array([t.ra for t in _tiles[:-1]]),
+            np.array([t.dec for t in _tiles[:-1]]),
+            np.array([t.ra for t in _tiles[1:]]),
+            np.array([t.dec for t in _tiles[1:]]))
+        np.testing.assert_allclose(_steps, 1.5, rtol=1e-3)
+
+    def test_spiral(self):
+        _offsets = patterns.spiral_offsets(2)
+        self.assertEqual(len(_offsets), 25)
+        self.assertEqual(len(set(_offsets)), 25)
+        self.assertEqual(_offsets[:3], [(0, 0), (1, 0), (1, 1)])
+        for (x0, y0), (x1, y1) in zip(_offsets, _offsets[1:]):
+            self.assertEqual(abs(x1 - x0) + abs(y1 - y0), 1)
+
+    def test_order_for_travel_starts_near_the_mount(self):
+        _when = 1700000000.0
+        _tiles = patterns.mosaic(0.0, 0.0, 4, 3, 3.0)
+        _alt, _az = astrometry.radec_to_altaz(
+            [t.ra for t in _tiles], [t.dec for t in _tiles], 45.0, 0.0, _when)
+        _start = (_az[-1], _alt[-1])
+        _ordered = patterns.order_for_travel(
+            0.0, 0.0, 4, 3, 3.0, latitude=45.0, longitude=0.0, when=_when,
+            start=_start)
+        self.assertLessEqual(
+            patterns.travel_time(_ordered, 45.0, 0.0, _when, _start),
+            patterns.travel_time(_tiles, 45.0, 0.0, _when, _start))
+        self.assertEqual(_ordered[0][1:], _tiles[-1][1:])
+
+    def _mount(self, busy_polls=0):
+        _mount = emulator.MountEmulator(busy_polls)
+        # 45N 75W, 2023-11-14 22:13:20 UTC
+        _mount.location = '\x2d\x00\x00\x00\x4b\x00\x00\x01'
+        _mount.time = '\x16\x0d\x14\x0b\x0e\x17\x00\x00'
+        dut = telescopes.NexStarSLT130('emulator://')
+        dut.serial.handler = _mount.feed
+        return _mount, dut
+
+    def test_execute(self):
+        _mount, dut = self._mount(busy_polls=2)
+        _arrivals = []
+        _tiles = patterns.spiral(30.0, 20.0, 0.5, 1)
+        _timings = patterns.execute(
+            dut, _tiles, lambda i, p: _arrivals.append((i, p.name)),
+            min_interval=0.0)
+        self.assertEqual([i for i, _ in _arrivals], range(9))
+        self.assertEqual([t.pointing for t in _timings], _tiles)
+        _gotos = [c for c in _mount.received if c[0] == 'r']
+        self.assertEqual(len(_gotos), 9)
+        # the safety check's site, time and position queries, then two
+        # busy polls and the arrival poll per goto
+        self.assertEqual(len(_mount.received), 3 + 9 * 4)
+
+    def test_execute_refuses_pointings_below_the_horizon(self):
+        _mount, dut = self._mount()
+        # about 38 degrees below the horizon at that time
+        _tiles = patterns.spiral(30.0, -70.0, 0.5, 1)
+        self.assertRaises(telescopes.TelescopeError, patterns.execute, dut,
+                          _tiles)
+        self.assertFalse([c for c in _mount.received if c[0] == 'r'])
@@ -0,0 +1,53 @@
+from unittest import TestCase
+import positions
+
+
+class TestPositionSample(TestCase):
+
+    def test_degrees_from_reply(self):
+        dut = positions.PositionSample.from_reply('40000000,20000000#',
+                                                  positions.RADEC, 1000.0)
+        self.assertEqual(dut.degrees, (90.0, 45.0))
+        self.assertEqual((dut.ra, dut.dec), (90.0, 45.0))
+        _ra, _dec = dut
+        self.assertEqual((_ra, _dec), (90.0, 45.0))
+        self.assertEqual(dut.angles[0].hex(), '40000000')
+
+    def test_southern_dec_is_signed(self):
+        # Dec -20 is sent as 340 degrees
+        dut = positions.PositionSample.from_reply('40000000,F1C71C72#',
+                                                  positions.RADEC, 1000.0)
+        self.assertAlmostEqual(dut.dec, -20.0, 6)
+        self.assertAlmostEqual(dut.degrees[1], -20.0, 6)
+        self.assertAlmostEqual(dut.skycoord.dec.degree, -20.0, 6)
+        self.assertEqual(dut.angles[1].hex(), 'F1C71C72')
+
+    def test_slots(self):
+        dut = positions.PositionSample(0, 0, positions.RADEC, 0.0)
+        self.assertRaises(AttributeError, setattr, dut, 'extra', 1)
+
+    def test_radec_skycoord_is_cached(self):
+        dut = positions.PositionSample.from_reply('40000000,20000000#',
+                                                  positions.RADEC, 1000.0)
+        _coord = dut.skycoord
+        self.assertAlmostEqual(_coord.ra.degree, 90.0)
+        self.assertAlmostEqual(_coord.dec.degree, 45.0)
+        self.assertIs(dut.skycoord, _coord)
+
+    def test_altaz_location_is_lazy(self):
+        _calls = []
+
+        def _location():
+            _calls.append(1)
+            return 45.0, -75.0
+        dut = positions.PositionSample.from_reply(
+            '80000000,10000000#', positions.ALTAZ, 1500000000.0, _location)
+        self.assertEqual((dut.az, dut.alt), (180.0, 22.5))
+        self.assertEqual(_calls, [])
+        _coord = dut.skycoord
+        self.assertAlmostEqual(_coord.az.degree, 180.0)
+        self.assertAlmostEqual(_coord.alt.degree, 22.5)
+        self.assertAlmostEqual(_coord.location.lat.degree, 45.0)
+        self.assertAlmostEqual(_coord.obstime.unix, 1500000000.0)
+        dut.skycoord
+        self.assertEqual(_calls, [1])
@@ -0,0 +1,54 @@
+from unittest import TestCase
+import angles
+import protocol
+
+
+class TestProtocol(TestCase):
+
+    def test_constant_commands_are_pre_encoded(self):
+        self.assertEqual(protocol.GET_RA_DEC.command, 'e')
+        self.assertEqual(protocol.CANCEL_GOTO.encode(), 'M')
+        self.assertIsNone(protocol.GOTO_RA_DEC.command)
+
+    def test_goto_encoding(self):
+        self.assertEqual(protocol.GOTO_RA_DEC.encode(90.0, 45.0),
+                         'r40000000,20000000')
+        self.assertEqual(protocol.SYNC.encode(angles.Angle(1), 359.99999999),
+                         's00000001,00000000')
+
+    def test_slew_encoding_matches_the_hand_built_commands(self):
+        self.assertEqual(protocol.VAR_SLEW.encode(0, 300),
+                         'P' + chr(3) + chr(16) + chr(6) + chr(4) + chr(176) +
+                         chr(0) + chr(0))
+        self.assertEqual(protocol.VAR_SLEW.encode(1, -1),
+                         'P\x03\x11\x07\x00\x04\x00\x00')
+        self.assertEqual(protocol.FIXED_SLEW.encode(1, -9),
+                         'P\x02\x11\x25\x09\x00\x00\x00')
+        self.assertEqual(protocol.AXIS_SLEW_DONE.encode(0),
+                         'P\x01\x10\x13\x00\x00\x00\x01')
+
+    def test_argument_commands(self):
+        self.assertEqual(protocol.SET_TRACKING_MODE.encode(2), 'T\x02')
+        self.assertEqual(protocol.SET_LOCATION.encode((1, 2, 3, 0),
+                                                      (4, 5, 6, 1)),
+                         'W\x01\x02\x03\x00\x04\x05\x06\x01')
+        self.assertEqual(protocol.SET_TIME.encode([1, 2, 3, 4, 5, 6, 7, 8]),
+                         'H\x01\x02\x03\x04\x05\x06\x07\x08')
+
+    def test_decoders(self):
+        self.assertEqual(protocol.GET_RA_DEC.decode('40000000,20000000#'),
+                         (90.0, 45.0))
+        # southern Dec comes back signed, not as 340
+        _ra, _dec = protocol.GET_RA_DEC.decode('40000000,F1C71C72#')
+        self.assertAlmostEqual(_dec, -20.0, 6)
+        _lat, _long = protocol.GET_LOCATION.decode(
+            '\x2d\x1e\x00\x00\x4b\x00\x00\x01#')
+        self.assertEqual(protocol.dms_to_degrees(_lat), 45.5)
+        self.assertEqual(protocol.dms_to_degrees(_long), -75.0)
+        self.assertEqual(protocol.GET_TIME.decode('\x01\x02\x03\x04\x05\x06'
+                                                  '\x07\x08#'),
+                         (1, 2, 3, 4, 5, 6, 7, 8))
+        self.assertEqual(protocol.GET_VERSION.decode('\x04\x15#'), 6.1)
+        self.assertTrue(protocol.GOTO_IN_PROGRESS.decode('1#'))
+        self.assertFalse(protocol.ALIGNMENT_COMPLETE.decode('\x00#'))
+        self.assertRaises(AssertionError, protocol.CANCEL_GOTO.decode, '')
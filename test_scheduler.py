@@ -0,0 +1,45 @@
+from unittest import TestCase
+import os
+import tempfile
+import numpy as np
+import scheduler
+
+
+class TestScheduler(TestCase):
+
+    def setUp(self):
+        self._start = 1700000000.0
+        self._end = self._start + 6 * 3600.0
+        self._targets = [scheduler.Target("t%d" % i, ra, dec)
+                         for i, (ra, dec) in enumerate(
+                             zip(np.linspace(0, 350, 36),
+                                 np.tile([-10.0, 20.0, 50.0], 12)))]
+        self.dut = scheduler.Scheduler(self._targets, 37.5, -121.0,
+                                       self._start, self._end, dwell=120.0)
+
+    def test_load_targets(self):
+        _fd, _path = tempfile.mkstemp()
+        with os.fdopen(_fd, 'w') as _file:
+            _file.write("# comment\nM 31, 10.68, 41.27\nVega 279.23 38.78\n")
+        try:
+            _targets = scheduler.load_targets(_path)
+        finally:
+            os.remove(_path)
+        self.assertEqual(_targets[0], scheduler.Target("M 31", 10.68, 41.27))
+        self.assertEqual(_targets[1].name, "Vega")
+
+    def test_plan_respects_limits(self):
+        _plan = self.dut.plan()
+        self.assertTrue(len(_plan) > 0)
+        _names = [entry.target.name for entry in _plan]
+        self.assertEqual(len(_names), len(set(_names)))
+        for previous, entry in zip(_plan, _plan[1:]):
+            self.assertTrue(entry.goto_time >= previous.end - 1e-6)
+        for entry in _plan:
+            self.assertTrue(20.0 <= entry.alt <= 85.0)
+            self.assertTrue(entry.end <= self._end)
+
+    def test_visibility_windows(self):
+        _visibility = self.dut.visibility()
+        for start, end in _visibility.windows(0):
+            self.assertTrue(start <= end)
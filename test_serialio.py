@@ -0,0 +1,62 @@
+from unittest import TestCase
+import protocol
+import serialio
+
+
+class _ChunkedPort(object):
+    """Hands out pending bytes at most chunk at a time, like a slow port"""
+
+    def __init__(self, data, chunk=4):
+        self.data = data
+        self.chunk = chunk
+
+    def readinto(self, buffer):
+        _n = min(len(buffer), self.chunk, len(self.data))
+        buffer[:_n] = self.data[:_n]
+        self.data = self.data[_n:]
+        return _n
+
+
+class TestReplyRing(TestCase):
+
+    def test_reads_across_partial_reads(self):
+        dut = serialio.ReplyRing(64)
+        _reply = dut.read(_ChunkedPort('12AB34CD,FFFFFFFF#'), 18)
+        self.assertIsInstance(_reply, memoryview)
+        self.assertEqual(_reply.tobytes(), '12AB34CD,FFFFFFFF#')
+
+    def test_timeout_returns_short_reply(self):
+        dut = serialio.ReplyRing(64)
+        self.assertEqual(dut.read(_ChunkedPort('1'), 2).tobytes(), '1')
+        self.assertEqual(len(dut.read(_ChunkedPort(''), 2)), 0)
+
+    def test_wraps_instead_of_splitting_a_reply(self):
+        dut = serialio.ReplyRing(20)
+        _port = _ChunkedPort('40000000,20000000#80000000,10000000#')
+        _first = dut.read(_port, 18)
+        self.assertEqual(protocol.GET_RA_DEC.decode(_first), (90.0, 45.0))
+        _second = dut.read(_port, 18)
+        self.assertEqual(_second.tobytes(), '80000000,10000000#')
+        self.assertEqual(protocol.GET_AZ_ALT.decode(_second), (180.0, 22.5))
+
+
+class TestInPlaceDecode(TestCase):
+
+    def test_position_counts_match_int_parsing(self):
+        for _reply in ('00000000,FFFFFFFF#', '12ab34cd,9E3779B9#'):
+            _expected = (int(_reply[:8], 16), int(_reply[9:17], 16))
+            self.assertEqual(protocol.position_counts(_reply), _expected)
+            self.assertEqual(protocol.position_counts(bytearray(_reply)),
+                             _expected)
+            self.assertEqual(
+                protocol.position_counts(memoryview(bytearray(_reply))),
+                _expected)
+
+    def test_position_counts_at_offset(self):
+        self.assertEqual(protocol.position_counts('xx80000000,00000001#', 2),
+                         (0x80000000, 1))
+
+    def test_location_from_view(self):
+        _reply = memoryview(bytearray('\x2d\x01\x02\x00\x4b\x03\x04\x01#'))
+        self.assertEqual(protocol.GET_LOCATION.decode(_reply),
+                         ((45, 1, 2, 0), (75, 3, 4, 1)))
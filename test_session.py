@@ -0,0 +1,98 @@
+from unittest import TestCase
+import emulator
+import session
+import telescopes
+import transport
+
+
+class _UnpluggableMount(object):
+    """Opens drivers onto one emulated mount over loopback transports that
+    can be made to fail, like a USB adapter being pulled"""
+
+    def __init__(self):
+        self.mount = emulator.MountEmulator()
+        self.unplugged = False
+        self.refuse_opens = 0
+        self.opens = 0
+
+    def _handler(self, data):
+        if self.unplugged:
+            raise IOError("device disconnected")
+        return self.mount.feed(data)
+
+    def open(self, device, **driver_args):
+        self.opens += 1
+        if self.refuse_opens:
+            self.refuse_opens -= 1
+            raise OSError("no such device")
+        self.unplugged = False
+        return telescopes.NexStarSLT130(
+            transport.LoopbackTransport(self._handler), **driver_args)
+
+
+class TestCallNames(TestCase):
+
+    def test_names_are_driver_methods(self):
+        for name in session.IDEMPOTENT | session._STATE_SETTERS:
+            self.assertTrue(callable(getattr(telescopes.NexStarSLT130, name,
+                                             None)), name)
+
+
+class TestSession(TestCase):
+
+    def setUp(self):
+        self.link = _UnpluggableMount()
+        self.mount = self.link.mount
+        self.mount.ra, self.mount.dec = 0x40000000, 0x20000000
+        self.dut = session.Session('usb', self.link.open, backoff=0.001)
+        self.dut.set_tracking_mode(2)
+        self.dut.set_location((45, 0, 0, 0), (75, 0, 0, 1))
+        del self.mount.received[:]
+
+    def test_queries_are_retried(self):
+        self.link.unplugged = True
+        self.assertEqual(self.dut.get_ra_dec(), (90.0, 45.0))
+        self.assertEqual(self.dut.reconnects, 1)
+        self.assertLess(self.dut.last_recovery, 1.0)
+
+    def test_unchanged_state_is_not_resent(self):
+        self.link.unplugged = True
+        self.dut.get_ra_dec()
+        self.assertEqual(self.mount.received, ['t', 'w', 'e'])
+
+    def test_lost_state_is_restored(self):
+        self.mount.tracking_mode = 0
+        self.link.unplugged = True
+        self.dut.get_ra_dec()
+        self.assertEqual(self.mount.received, ['t', 'w', 'T\x02', 'e'])
+        self.assertEqual(self.mount.tracking_mode, 2)
+
+    def test_gotos_are_not_retried(self):
+        self.link.unplugged = True
+        self.assertRaises(telescopes.TelescopeError, self.dut.goto_ra_dec,
+                          10.0, 20.0)
+        self.assertEqual(self.dut.reconnects, 1)
+        self.assertNotIn('r', [c[0] for c in self.mount.received])
+
+    def test_query_pipelines_are_retried(self):
+        self.link.unplugged = True
+        self.assertEqual(self.dut.pipeline([('L', 2)]), ['0#'])
+
+    def test_reopen_backs_off(self):
+        self.link.refuse_opens = 3
+        self.link.unplugged = True
+        self.dut.get_ra_dec()
+        self.assertEqual(self.link.opens, 5)
+
+    def test_gives_up(self):
+        self.dut.reconnect_timeout = 0.01
+        self.link.refuse_opens = 1000
+        self.link.unplugged = True
+        self.assertRaises(telescopes.TelescopeError, self.dut.get_ra_dec)
+
+    def test_listeners_follow_the_driver(self):
+        _seen = []
+        self.dut.add_stream_listener(lambda t, c, v: _seen.append(c))
+        self.link.unplugged = True
+        self.dut.goto_in_progress()
+        self.assertEqual(_seen, ['L'])
@@ -0,0 +1,52 @@
+from unittest import TestCase
+from StringIO import StringIO
+import scheduler
+import shell
+
+
+class _ShellTelescope(object):
+    def __init__(self):
+        self.calls = []
+
+    def get_location_lat_long(self):
+        self.calls.append('get_location_lat_long')
+        return 37.5, -121.0
+
+    def get_ra_dec(self):
+        return 10.0, 20.0
+
+    def goto_ra_dec(self, _ra, _dec):
+        self.calls.append(('goto_ra_dec', _ra, _dec))
+
+
+class TestTelescopeShell(TestCase):
+
+    def setUp(self):
+        self.telescope = _ShellTelescope()
+        self.out = StringIO()
+        self.dut = shell.TelescopeShell(
+            self.telescope, [scheduler.Target("Orion Nebula", 83.82, -5.39),
+                             scheduler.Target("Vega", 279.23, 38.78)],
+            stdout=self.out, status_interval=0)
+
+    def test_goto_by_name_and_numbers(self):
+        self.dut.onecmd("goto vega")
+        self.dut.onecmd("goto 1.5 2.5")
+        self.assertEqual(self.telescope.calls[1:], [
+            ('goto_ra_dec', 279.23, 38.78), ('goto_ra_dec', 1.5, 2.5)])
+
+    def test_location_is_cached(self):
+        self.dut.onecmd("location")
+        self.dut.onecmd("location")
+        self.assertEqual(self.telescope.calls, ['get_location_lat_long'])
+        self.assertEqual(self.out.getvalue(), "37.5000 -121.0000\n" * 2)
+
+    def test_complete_goto(self):
+        self.assertEqual(self.dut.complete_goto("Or", "goto Or", 5, 7),
+                         ["Orion Nebula"])
+        self.assertEqual(self.dut.complete_goto("Neb", "goto orion Neb", 11, 14),
+                         ["Nebula"])
+
+    def test_bad_arguments_do_not_raise(self):
+        self.dut.onecmd("goto nowhere")
+        self.assertTrue(self.out.getvalue().startswith("error:"))
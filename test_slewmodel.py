@@ -0,0 +1,41 @@
+from unittest import TestCase
+import numpy as np
+import slewmodel
+
+
+class TestSlewModel(TestCase):
+
+    def setUp(self):
+        self.dut = slewmodel.SlewModel(slewmodel.AxisModel(1.0, 5.0),
+                                       slewmodel.AxisModel(2.0, 3.0), 1.5)
+
+    def test_predict(self):
+        # 90 degrees in azimuth: 25 degrees of ramps, 13 seconds cruising
+        self.assertAlmostEqual(self.dut.predict(0.0, 10.0, 90.0, 10.0),
+                               18.0 + 5.0 + 1.5)
+        # short move never reaches full speed
+        self.assertAlmostEqual(self.dut.predict(0.0, 10.0, 0.0, 12.0),
+                               2.0 + 1.5)
+        # azimuth wraps the short way round
+        self.assertAlmostEqual(self.dut.predict(350.0, 0.0, 10.0, 0.0),
+                               self.dut.predict(0.0, 0.0, 20.0, 0.0))
+
+    def test_fit(self):
+        _random = np.random.RandomState(0)
+        _records = []
+        for _ in range(40):
+            _az0, _az1 = _random.uniform(0, 360, 2)
+            _alt0, _alt1 = _random.uniform(0, 90, 2)
+            _records.append(slewmodel.SlewRecord(
+                _az0, _alt0, _az1, _alt1,
+                float(self.dut.predict(_az0, _alt0, _az1, _alt1))))
+        _model = slewmodel.SlewModel.fit(_records)
+        for record in _records:
+            self.assertAlmostEqual(
+                float(_model.predict(record.az0, record.alt0,
+                                     record.az1, record.alt1)),
+                record.duration, delta=0.1 * record.duration + 0.5)
+
+    def test_round_trip(self):
+        _model = slewmodel.SlewModel.from_dict(self.dut.to_dict())
+        self.assertEqual(_model.to_dict(), self.dut.to_dict())
@@ -0,0 +1,181 @@
+from unittest import TestCase
+from testfixtures import Replacer
+import angles
+import horizon
+import protocol
+import telescopes
+import timing
+
+
+class _FakeSerial(object):
+    """Answers NexStar commands from a table of command -> reply"""
+
+    def __init__(self, *args, **kwargs):
+        self.replies = {}
+        self.written = []
+        self._pending = ''
+
+    def write(self, data):
+        self.written.append(data)
+        self._pending += self.replies[data]
+
+    def read(self, n_bytes):
+        _reply, self._pending = self._pending[:n_bytes], self._pending[n_bytes:]
+        return _reply
+
+    def readinto(self, buffer):
+        _reply = self.read(len(buffer))
+        buffer[:len(_reply)] = _reply
+        return len(_reply)
+
+    def close(self):
+        pass
+
+
+class TestNexStarSLT130(TestCase):
+
+    def setUp(self):
+        self.replacer = Replacer()
+        self.replacer.replace('serial.Serial', _FakeSerial)
+        self.dut = telescopes.NexStarSLT130('/dev/null')
+        self.serial = self.dut.serial
+
+    def tearDown(self):
+        self.dut.close()
+        self.replacer.restore()
+
+    def test_axis_position(self):
+        _query = 'P\x01\x10\x01\x00\x00\x00\x03'
+        self.serial.replies[_query] = '\x40\x00\x01#'
+        self.assertEqual(self.dut.get_axis_position(self.dut.DIR_AZIMUTH),
+                         0x400001)
+        self.assertEqual(self.serial.written, [_query])
+
+    def test_axis_positions_are_pipelined(self):
+        self.serial.replies['P\x01\x10\x01\x00\x00\x00\x03'] = '\x80\x00\x00#'
+        self.serial.replies['P\x01\x11\x01\x00\x00\x00\x03'] = '\x00\x00\x10#'
+        self.assertEqual(self.dut.get_axis_positions(), (0x800000, 0x10))
+        self.assertEqual(self.dut.axis_counts_to_degrees(0x800000), 180.0)
+
+    def test_axis_slew_done(self):
+        self.serial.replies['P\x01\x11\x13\x00\x00\x00\x01'] = '\xff#'
+        self.assertTrue(self.dut.axis_slew_done(self.dut.DIR_ELEVATION))
+        self.serial.replies['P\x01\x11\x13\x00\x00\x00\x01'] = '\x00#'
+        self.assertFalse(self.dut.axis_slew_done(self.dut.DIR_ELEVATION))
+
+    def test_unix_time_takes_out_zone_and_daylight_saving(self):
+        # 2023-11-14 18:13:20 local, GMT-5 with daylight saving on
+        self.serial.replies['h'] = '\x12\x0d\x14\x0b\x0e\x17\xfb\x01#'
+        self.assertEqual(self.dut.get_unix_time(), 1700000000)
+        # 2023-11-15 03:43:20 local, GMT+5 (India is +5:30, the
+        # hand controller only keeps whole hours)
+        self.serial.replies['h'] = '\x03\x2b\x14\x0b\x0f\x17\x05\x00#'
+        self.assertEqual(self.dut.get_unix_time(), 1700000000 + 30 * 60)
+
+    def _point_at(self, az, alt):
+        self.serial.replies['z'] = '%08X,%08X#' % (
+            angles.degrees_to_counts(az), angles.degrees_to_counts(alt))
+
+    def test_safe_goto_azel_checks_target_and_path(self):
+        # a wall to the east
+        self.dut.horizon_mask = horizon.HorizonMask.from_points(
+            [(0.0, 10.0), (80.0, 10.0), (90.0, 40.0), (100.0, 10.0)])
+        self.serial.replies['J'] = '\x01#'
+        self.assertRaises(telescopes.TelescopeError,
+                          self.dut.safe_goto_azel, 200.0, 5.0)
+        self.assertEqual(self.serial.written, ['J'])
+        self._point_at(60.0, 20.0)
+        self.assertRaises(telescopes.TelescopeError,
+                          self.dut.safe_goto_azel, 120.0, 20.0)
+        self.assertEqual(self.serial.written, ['J', 'J', 'z'])
+        _goto = protocol.GOTO_BY_OPCODE['b'].encode(70.0, 30.0)
+        self.serial.replies[_goto] = '#'
+        self.dut.safe_goto_azel(70.0, 30.0)
+        self.assertEqual(self.serial.written[3:], ['J', 'z', _goto])
+
+    def test_safe_gotos_need_alignment(self):
+        self.serial.replies['J'] = '\x00#'
+        self.assertRaises(telescopes.TelescopeAlignmentNotSet,
+                          self.dut.safe_goto_azel, 200.0, 45.0)
+        self.assertRaises(telescopes.TelescopeAlignmentNotSet,
+                          self.dut.safe_goto_radec, 10.0, 20.0)
+        self.assertEqual(self.serial.written, ['J', 'J'])
+
+    def test_safe_goto_radec_below_horizon(self):
+        # 45N 75W, 2023-11-14 22:13:20 UTC
+        self.serial.replies['w'] = '\x2d\x00\x00\x00\x4b\x00\x00\x01#'
+        self.serial.replies['h'] = '\x16\x0d\x14\x0b\x0e\x17\x00\x00#'
+        self.serial.replies['J'] = '\x01#'
+        # never rises at 45N
+        self.assertRaises(telescopes.TelescopeError,
+                          self.dut.safe_goto_radec, 0.0, -60.0)
+        self.assertEqual(self.serial.written, ['J', 'w', 'h'])
+
+    def test_safe_slew_var_stops_before_the_horizon(self):
+        _stops = [protocol.VAR_SLEW.encode(direction, 0) for direction in
+                  (self.dut.DIR_AZIMUTH, self.dut.DIR_ELEVATION)]
+        for stop in _stops:
+            self.serial.replies[stop] = '#'
+        self.assertRaises(telescopes.TelescopeError, self.dut.safe_slew_var,
+                          0, -3600, 180.0, 1.0)
+        self.assertEqual(self.serial.written, _stops)
+
+    def test_send_encoded_goto(self):
+        _goto = protocol.GOTO_BY_OPCODE['b'].encode(70.0, 30.0)
+        self.serial.replies[_goto] = '#'
+        self.assertTrue(self.dut.send_encoded_goto(_goto, (70.0, 30.0)))
+        self.assertEqual(self.serial.written, [_goto])
+        self.assertEqual(self.dut.commanded_motion.kind, 'goto_altaz')
+        self.assertEqual(self.dut.commanded_motion.values, (30.0, 70.0))
+
+    def test_southern_radec(self):
+        self.serial.replies['e'] = '40000000,F1C71C72#'
+        self.assertAlmostEqual(self.dut.get_ra_dec()[1], -20.0, 6)
+        self.assertAlmostEqual(self.dut.get_radec().dec.degree, -20.0, 6)
+
+    def test_passthrough_timeout(self):
+        self.serial.replies['P\x01\x10\x47\x00\x00\x00\x01'] = ''
+        self.assertRaises(telescopes.TelescopeError,
+                          self.dut.get_axis_guide_rate, self.dut.DIR_AZIMUTH)
+
+    def test_position_angles_round_trip(self):
+        self.serial.replies['z'] = '12AB34CD,FFFFFFFF#'
+        _az, _alt = self.dut.get_alt_az_angles()
+        self.assertEqual((_az.hex(), _alt.hex()), ('12AB34CD', 'FFFFFFFF'))
+        self.serial.replies['b12AB34CD,FFFFFFFF'] = '#'
+        self.dut._goto_command('b', (_az, _alt))
+        self.assertEqual(self.serial.written[-1], 'b12AB34CD,FFFFFFFF')
+
+    def test_goto_near_full_turn_stays_eight_digits(self):
+        self.serial.replies['r00000000,40000000'] = '#'
+        self.dut.goto_ra_dec(359.99999999, 90.0)
+        self.assertEqual(self.serial.written[-1], 'r00000000,40000000')
+
+    def test_samples(self):
+        self.serial.replies['z'] = '80000000,10000000#'
+        self.serial.replies['w'] = '\x2d\x00\x00\x00\x4b\x00\x00\x01#'
+        _sample = self.dut.sample_alt_az()
+        self.assertEqual((_sample.az, _sample.alt), (180.0, 22.5))
+        self.assertEqual(self.serial.written, ['z'])
+        self.assertAlmostEqual(_sample.skycoord.location.lon.degree, -75.0)
+        self.dut.sample_alt_az().skycoord
+        # the site is read once
+        self.assertEqual(self.serial.written, ['z', 'w', 'z'])
+
+    def test_sample_timestamps(self):
+        self.serial.replies['e'] = '40000000,20000000#'
+        _before = timing.now()
+        _sample = self.dut.sample_ra_dec()
+        self.assertGreaterEqual(_sample.timestamp, _before)
+        self.assertLessEqual(_sample.timestamp, timing.now())
+        self.assertGreaterEqual(_sample.uncertainty, 0.0)
+
+    def test_snapshot_shares_one_time_base(self):
+        self.serial.replies.update({'e': '40000000,20000000#',
+                                    'z': '80000000,10000000#', 'L': '1#'})
+        _snapshot = self.dut.snapshot()
+        self.assertEqual(self.serial.written, ['e', 'z', 'L'])
+        self.assertEqual(_snapshot.radec.degrees, (90.0, 45.0))
+        self.assertEqual(_snapshot.altaz.degrees, (180.0, 22.5))
+        self.assertTrue(_snapshot.goto_in_progress)
+        self.assertGreaterEqual(_snapshot.skew, 0.0)
@@ -0,0 +1,30 @@
+from unittest import TestCase
+import time
+import timing
+
+
+class TestTiming(TestCase):
+
+    def test_monotonic(self):
+        _a = timing.monotonic()
+        time.sleep(0.01)
+        self.assertGreater(timing.monotonic() - _a, 0.005)
+        self.assertAlmostEqual(timing.now(), time.time(), delta=1.0)
+
+    def test_sample_window(self):
+        # 'e' written at 0, 18 byte reply read completely at 50 ms
+        _sampled, _uncertainty = timing.sample_window(0.0, 0.050, 1, 18)
+        _earliest = timing.BYTE_TIME
+        _latest = 0.050 - 18 * timing.BYTE_TIME
+        self.assertAlmostEqual(_sampled, (_earliest + _latest) / 2)
+        self.assertAlmostEqual(_uncertainty, (_latest - _earliest) / 2)
+
+    def test_sample_window_reply_latency(self):
+        _sampled, _ = timing.sample_window(0.0, 0.050, 1, 18,
+                                           reply_latency=0.016)
+        self.assertAlmostEqual(
+            _sampled, (timing.BYTE_TIME + 0.034 - 18 * timing.BYTE_TIME) / 2)
+
+    def test_sample_window_never_inverted(self):
+        _sampled, _uncertainty = timing.sample_window(0.0, 0.005, 1, 18)
+        self.assertEqual((_sampled, _uncertainty), (timing.BYTE_TIME, 0.0))
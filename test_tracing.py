@@ -0,0 +1,67 @@
+import json
+import os
+import tempfile
+from unittest import TestCase
+import telescopes
+import tracing
+
+
+class TestTracing(TestCase):
+
+    def setUp(self):
+        tracing.clear()
+
+    def tearDown(self):
+        tracing.disable()
+        tracing.clear()
+
+    def test_disabled_records_nothing(self):
+        with tracing.span('serial', 'e'):
+            pass
+        self.assertEqual(tracing.events(), [])
+
+    def test_span_records_duration_and_error(self):
+        tracing.enable()
+        with tracing.span('serial', 'e', command='e'):
+            pass
+        try:
+            with tracing.span('serial', 'z'):
+                raise IOError("unplugged")
+        except IOError:
+            pass
+        (_, _name, _, _duration, _, _args), _failed = tracing.events()
+        self.assertEqual(_name, 'e')
+        self.assertGreaterEqual(_duration, 0.0)
+        self.assertEqual(_args, {'command': 'e'})
+        self.assertEqual(_failed[5], {'error': 'IOError'})
+
+    def test_summary_and_chrome_trace(self):
+        tracing.enable()
+        tracing.add_span('serial', 'e', 10.0, 0.02)
+        tracing.add_span('serial', 'e', 11.0, 0.04)
+        tracing.add_span('startup', 'import', 0.0, 0.5)
+        self.assertEqual(tracing.summary(),
+                         [('startup', 'import', 1, 0.5, 0.5),
+                          ('serial', 'e', 2, 0.06, 0.04)])
+        self.assertIn('% wall', tracing.format_summary(1.0))
+        _handle, _path = tempfile.mkstemp(suffix='.json')
+        os.close(_handle)
+        try:
+            tracing.write_chrome_trace(_path)
+            with open(_path) as _file:
+                _events = json.load(_file)['traceEvents']
+        finally:
+            os.remove(_path)
+        self.assertEqual(len(_events), 3)
+        self.assertEqual(_events[0]['ph'], 'X')
+        self.assertAlmostEqual(_events[0]['dur'], 20000.0)
+
+    def test_driver_exchanges_are_traced(self):
+        tracing.enable()
+        dut = telescopes.NexStarSLT130('emulator://')
+        dut.get_ra_dec()
+        dut.pipeline([('e', 18), ('L', 2)])
+        _names = [(c, n) for c, n, _, _, _, _ in tracing.events()]
+        self.assertEqual(_names, [('driver', 'open'), ('serial', 'e'),
+                                  ('serial', 'pipeline'), ('serial', 'e'),
+                                  ('serial', 'L')])
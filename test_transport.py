@@ -0,0 +1,83 @@
+import socket
+from unittest import TestCase
+import emulator
+import telescopes
+import transport
+
+
+class TestOpenTransport(TestCase):
+
+    def test_parse_tcp_address(self):
+        self.assertEqual(transport.parse_tcp_address('tcp://bridge.local:23'),
+                         ('bridge.local', 23))
+        self.assertEqual(transport.parse_tcp_address('tcp://[::1]:2000'),
+                         ('::1', 2000))
+        self.assertRaises(ValueError, transport.parse_tcp_address,
+                          'tcp://bridge.local')
+
+    def test_open_transport_passes_transports_through(self):
+        _loopback = transport.LoopbackTransport(lambda data: data)
+        self.assertIs(transport.open_transport(_loopback), _loopback)
+
+    def test_loopback_short_read(self):
+        dut = transport.LoopbackTransport(lambda data: '1#')
+        dut.write('L')
+        self.assertEqual(dut.read(4), '1#')
+        self.assertEqual(dut.read(1), '')
+
+
+class TestEmulator(TestCase):
+
+    def test_chunked_commands(self):
+        dut = emulator.MountEmulator()
+        self.assertEqual(dut.feed('b4000'), '')
+        self.assertEqual(dut.feed('0000,20000000z'), '#40000000,20000000#')
+        self.assertEqual(dut.received, ['b40000000,20000000', 'z'])
+
+    def test_driver_over_loopback(self):
+        dut = telescopes.NexStarSLT130('emulator://')
+        dut.goto_ra_dec(90.0, 45.0)
+        self.assertEqual(dut.get_ra_dec(), (90.0, 45.0))
+        dut.set_tracking_mode(2)
+        self.assertEqual(dut.get_tracking_mode(), 2)
+        self.assertEqual(dut.echo(ord('x')), ord('x'))
+
+
+class TestTcpTransport(TestCase):
+
+    def setUp(self):
+        self.mount = emulator.MountEmulator(busy_polls=1)
+        self.server = emulator.EmulatorServer(self.mount).start()
+        self.dut = telescopes.NexStarSLT130(self.server.url)
+
+    def tearDown(self):
+        self.dut.close()
+        self.server.close()
+
+    def test_nodelay(self):
+        self.assertEqual(self.dut.serial.socket.getsockopt(
+            socket.IPPROTO_TCP, socket.TCP_NODELAY), 1)
+
+    def test_queries_share_one_connection(self):
+        self.dut.goto_alt_az(45.0, 180.0)
+        self.assertTrue(self.dut.goto_in_progress())
+        self.assertFalse(self.dut.goto_in_progress())
+        self.assertEqual(self.dut.get_alt_az(), (180.0, 45.0))
+        self.assertEqual(self.dut.get_axis_position(self.dut.DIR_AZIMUTH),
+                         0x800000)
+        self.assertEqual(self.mount.received[0], 'b80000000,20000000')
+
+    def test_pipeline(self):
+        self.mount.ra, self.mount.dec = 0x40000000, 0x20000000
+        self.assertEqual(self.dut.pipeline([('e', 18), ('z', 18), ('L', 2)]),
+                         ['40000000,20000000#', '00000000,00000000#', '0#'])
+        _sample = self.dut.sample_ra_dec()
+        self.assertEqual(_sample.degrees, (90.0, 45.0))
+
+    def test_timeout_returns_short_read(self):
+        _transport = transport.TcpTransport(
+            *self.server.server_address[:2], timeout=0.05)
+        try:
+            self.assertEqual(_transport.read(1), '')
+        finally:
+            _transport.close()
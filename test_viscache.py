@@ -0,0 +1,67 @@
+from unittest import TestCase
+import shutil
+import tempfile
+import numpy as np
+import astrometry
+import viscache
+
+
+class _SiteTelescope(object):
+    def __init__(self, latitude, longitude):
+        self.location = latitude, longitude
+
+    def get_location_lat_long(self):
+        return self.location
+
+
+class TestVisibilityCache(TestCase):
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        self.dut = viscache.VisibilityCache(37.5, -121.0, self.path, 600.0)
+        self.start = 1700000000.0
+        _random = np.random.RandomState(3)
+        self.ra = _random.uniform(0, 360, 50)
+        self.dec = _random.uniform(-60, 90, 50)
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def _check(self, ra, dec, times, alt, az):
+        _alt, _az = astrometry.radec_to_altaz(ra[:, None], dec[:, None],
+                                              37.5, -121.0, times[None, :])
+        self.assertTrue(np.allclose(alt, _alt, atol=1e-3))
+        self.assertTrue(np.allclose(az, _az, atol=1e-3))
+
+    def test_grid_is_extended(self):
+        _times, _alt, _az = self.dut.grid(self.ra[:30], self.dec[:30],
+                                          self.start, self.start + 3600)
+        self.assertEqual(_alt.shape, (30, len(_times)))
+        self._check(self.ra[:30], self.dec[:30], _times, _alt, _az)
+        # more targets and a longer night reuse the same files
+        _times, _alt, _az = self.dut.grid(self.ra, self.dec,
+                                          self.start - 1800, self.start + 7200)
+        self.assertEqual(_alt.shape, (50, len(_times)))
+        self.assertTrue(_times[0] <= self.start - 1800)
+        self._check(self.ra, self.dec, _times, _alt, _az)
+        self.assertTrue(isinstance(_alt.base, np.memmap) or
+                        isinstance(_alt, np.memmap))
+
+    def test_site_change_invalidates(self):
+        _telescope = _SiteTelescope(37.5, -121.0)
+        _cache = viscache.VisibilityCache.for_telescope(_telescope, self.path)
+        _cache.grid(self.ra, self.dec, self.start, self.start + 3600)
+        _telescope.location = (51.5, 0.0)
+        _moved = viscache.VisibilityCache.for_telescope(_telescope, self.path)
+        self.assertNotEqual(_moved.path, _cache.path)
+        self.assertFalse(viscache.os.path.exists(_cache.path))
+
+    def test_bad_site_file_deletes_nothing(self):
+        _telescope = _SiteTelescope(37.5, -121.0)
+        _cache = viscache.VisibilityCache.for_telescope(_telescope, self.path)
+        _cache.grid(self.ra, self.dec, self.start, self.start + 3600)
+        for previous in ('', '  \n', '.', '..', '../elsewhere', '/tmp'):
+            with open(viscache.os.path.join(self.path, 'site'), 'w') as _file:
+                _file.write(previous)
+            viscache.VisibilityCache.for_telescope(_telescope, self.path)
+            self.assertTrue(viscache.os.path.exists(_cache.path), previous)
@@ -0,0 +1,76 @@
+"""Host time base and reply timing for the serial link.
+
+Replies are stamped from a monotonic clock, mapped to unix time through
+one offset taken at import, so samples share a time base that wall clock
+steps (NTP, DST) can't disturb during a session.
+
+The mount samples its position somewhere between having received the
+whole command and starting to send the reply. Both ends of that window
+follow from when the command was written, when the reply finished
+arriving and how long the bytes take on the wire; the estimate is the
+middle of the window and its uncertainty half the window.
+"""
+import ctypes
+import ctypes.util
+import sys
+import time
+
+BAUD = 9600
+# start bit, 8 data bits, stop bit
+BYTE_TIME = 10.0 / BAUD
+
+
+def _clock_gettime_monotonic():
+    class _Timespec(ctypes.Structure):
+        _fields_ = [('tv_sec', ctypes.c_long), ('tv_nsec', ctypes.c_long)]
+
+    _library = ctypes.CDLL(ctypes.util.find_library('rt') or
+                           ctypes.util.find_library('c'), use_errno=True)
+    _clock_gettime = _library.clock_gettime
+    _clock_gettime.argtypes = [ctypes.c_int, ctypes.POINTER(_Timespec)]
+    _spec = _Timespec()
+    _clock = 6 if sys.platform == 'darwin' else 1   # CLOCK_MONOTONIC
+
+    def monotonic():
+        if _clock_gettime(_clock, ctypes.byref(_spec)) != 0:
+            raise OSError(ctypes.get_errno(), "clock_gettime failed")
+        return _spec.tv_sec + _spec.tv_nsec * 1e-9
+    monotonic()
+    return monotonic
+
+
+try:
+    from time import monotonic
+except ImportError:
+    try:
+        monotonic = _clock_gettime_monotonic()
+    except (OSError, AttributeError, TypeError):
+        monotonic = time.time
+
+_UNIX_OFFSET = time.time() - monotonic()
+
+
+def to_unix(monotonic_time):
+    return monotonic_time + _UNIX_OFFSET
+
+
+def now():
+    """Current unix time on the monotonic time base"""
+    return monotonic() + _UNIX_OFFSET
+
+
+def sample_window(sent, received, command_bytes, reply_bytes,
+                  reply_latency=0.0, byte_time=BYTE_TIME):
+    """Estimates when the mount sampled the value in a reply.
+
+    :param sent: monotonic time the command started going out
+    :param received: monotonic time the last reply byte was read
+    :param reply_latency: fixed delay between bytes arriving at the port
+        and being readable (USB serial adapters buffer for a few ms)
+    :return: (monotonic sample time, uncertainty in seconds)
+    """
+    _earliest = min(sent + command_bytes * byte_time, received)
+    _latest = received - reply_latency - reply_bytes * byte_time
+    if _latest < _earliest:
+        _latest = _earliest
+    return (_earliest + _latest) / 2.0, (_latest - _earliest) / 2.0
@@ -0,0 +1,142 @@
+"""Lightweight tracing spans.
+
+    with tracing.span('serial', 'e'):
+        ...
+
+records how long the block took once tracing.enable() has been called;
+until then span() hands back one shared no-op context manager, so the
+spans left in the driver cost a function call and a flag test.
+
+Recorded spans can be written as Chrome trace-event JSON (load it in
+chrome://tracing or https://ui.perfetto.dev) and summarized as a table
+of time per (category, name).
+"""
+import json
+import os
+import threading
+
+import timing
+
+_enabled = False
+_events = []
+_lock = threading.Lock()
+
+
+class _NullSpan(object):
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span(object):
+    __slots__ = ('category', 'name', 'args', 'start')
+
+    def __init__(self, category, name, args):
+        self.category = category
+        self.name = name
+        self.args = args
+        self.start = None
+
+    def __enter__(self):
+        self.start = timing.monotonic()
+        return self
+
+    def __exit__(self, exc_type, *exc_info):
+        _end = timing.monotonic()
+        if exc_type is not None:
+            self.args['error'] = exc_type.__name__
+        add_span(self.category, self.name, self.start, _end - self.start,
+                 **self.args)
+        return False
+
+
+def span(category, name, **args):
+    """Context manager timing its block as one span"""
+    if not _enabled:
+        return _NULL_SPAN
+    return _Span(category, name, args)
+
+
+def add_span(category, name, start, duration, **args):
+    """Records a span measured elsewhere (monotonic start, seconds)"""
+    with _lock:
+        _events.append((category, name, start, duration,
+                        threading.current_thread().ident, args))
+
+
+def enable():
+    global _enabled
+    _enabled = True
+
+
+def disable():
+    global _enabled
+    _enabled = False
+
+
+def enabled():
+    return _enabled
+
+
+def clear():
+    with _lock:
+        del _events[:]
+
+
+def events():
+    """Recorded (category, name, start, duration, thread, args) tuples"""
+    with _lock:
+        return list(_events)
+
+
+def chrome_trace():
+    """Recorded spans as a Chrome trace-event document"""
+    _pid = os.getpid()
+    _trace_events = []
+    for category, name, start, duration, thread, args in events():
+        _trace_events.append({
+            'name': name, 'cat': category, 'ph': 'X',
+            'ts': timing.to_unix(start) * 1e6, 'dur': duration * 1e6,
+            'pid': _pid, 'tid': thread,
+            'args': dict((k, str(v)) for k, v in args.items())})
+    return {'traceEvents': _trace_events, 'displayTimeUnit': 'ms'}
+
+
+def write_chrome_trace(path):
+    with open(path, 'w') as _file:
+        json.dump(chrome_trace(), _file)
+
+
+def summary():
+    """Per (category, name) totals: list of (category, name, count,
+    total seconds, max seconds), slowest total first"""
+    _totals = {}
+    for category, name, _start, duration, _thread, _args in events():
+        _count, _total, _max = _totals.get((category, name), (0, 0.0, 0.0))
+        _totals[(category, name)] = (_count + 1, _total + duration,
+                                     max(_max, duration))
+    return sorted(((category, name) + values
+                   for (category, name), values in _totals.items()),
+                  key=lambda row: -row[3])
+
+
+def format_summary(wall=None):
+    """summary() as a text table; wall is the run's total seconds, used
+    for a percent column"""
+    _lines = ["%-10s %-24s %6s %10s %10s %10s%s" % (
+        'category', 'name', 'count', 'total ms', 'mean ms', 'max ms',
+        '  % wall' if wall else '')]
+    for category, name, count, total, longest in summary():
+        _line = "%-10s %-24s %6d %10.2f %10.2f %10.2f" % (
+            category, name, count, total * 1e3, total * 1e3 / count,
+            longest * 1e3)
+        if wall:
+            _line += " %7.1f" % (100.0 * total / wall)
+        _lines.append(_line)
+    return "\n".join(_lines)
@@ -0,0 +1,133 @@
+"""Byte transports the drivers talk to the hand controller over.
+
+A transport is anything with write(data), read(n_bytes), readinto(buffer)
+and close(); read returns fewer bytes than asked for on timeout, like
+pyserial. open_transport() picks one from a device string:
+
+* /dev/ttyUSB0, COM3, ...   local serial port (pyserial, 9600 8N1)
+* tcp://host:port           serial-over-network bridge or WiFi adapter
+                            speaking the hand-controller protocol
+* emulator://               in-memory emulator.MountEmulator, no hardware
+
+TCP connections set TCP_NODELAY. Without it Nagle's algorithm holds every
+command after the first until the previous segment is acknowledged, which
+serializes pipelined commands behind network round trips. The connection
+is kept open for the whole session (with SO_KEEPALIVE so idle bridges
+don't drop it) instead of being opened per command.
+"""
+import socket
+import threading
+
+import serial
+
+TCP_SCHEME = 'tcp://'
+EMULATOR_SCHEME = 'emulator://'
+
+
+def parse_tcp_address(device):
+    """'tcp://host:port' to (host, port)"""
+    _host, _, _port = device[len(TCP_SCHEME):].rpartition(':')
+    if not _host or not _port.isdigit():
+        raise ValueError("expected tcp://host:port, got %r" % device)
+    return _host.strip('[]'), int(_port)
+
+
+def open_transport(device, timeout=2):
+    """Opens the transport a device string names.
+
+    :param device: device string, or an already open transport which is
+        returned as is
+    :param timeout: seconds a read waits for missing reply bytes
+    """
+    if not isinstance(device, basestring):
+        return device
+    if device.startswith(TCP_SCHEME):
+        _host, _port = parse_tcp_address(device)
+        return TcpTransport(_host, _port, timeout)
+    if device.startswith(EMULATOR_SCHEME):
+        import emulator
+        return LoopbackTransport(emulator.MountEmulator().feed)
+    return serial.Serial(device, baudrate=9600, timeout=timeout)
+
+
+class TcpTransport(object):
+
+    def __init__(self, host, port, timeout=2, connect_timeout=5):
+        self.address = (host, port)
+        self.timeout = timeout
+        self.socket = socket.create_connection(self.address, connect_timeout)
+        self.socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+        self.socket.settimeout(timeout)
+
+    def write(self, data):
+        self.socket.sendall(data)
+        return len(data)
+
+    def readinto(self, buffer):
+        """Fills buffer straight from the socket, stopping early on
+        timeout; returns the number of bytes read"""
+        _view = memoryview(buffer)
+        _wanted = len(_view)
+        _got = 0
+        while _got < _wanted:
+            try:
+                _count = self.socket.recv_into(_view[_got:], _wanted - _got)
+            except socket.timeout:
+                break
+            if not _count:
+                raise IOError("connection to %s:%d closed" % self.address)
+            _got += _count
+        return _got
+
+    def read(self, n_bytes=1):
+        _buffer = bytearray(n_bytes)
+        return str(_buffer[:self.readinto(_buffer)])
+
+    def reset_input_buffer(self):
+        """Drops whatever stale reply bytes are waiting"""
+        self.socket.settimeout(0)
+        try:
+            while self.socket.recv(4096):
+                pass
+        except socket.error:
+            pass
+        finally:
+            self.socket.settimeout(self.timeout)
+
+    def close(self):
+        self.socket.close()
+
+
+class LoopbackTransport(object):
+    """In-memory transport: every write goes to handler(data), whose
+    return value is queued for the following reads"""
+
+    def __init__(self, handler):
+        self.handler = handler
+        self._pending = bytearray()
+        self._lock = threading.Lock()
+
+    def write(self, data):
+        _reply = self.handler(data)
+        with self._lock:
+            self._pending += _reply
+        return len(data)
+
+    def readinto(self, buffer):
+        with self._lock:
+            _count = min(len(buffer), len(self._pending))
+            buffer[:_count] = self._pending[:_count]
+            del self._pending[:_count]
+        return _count
+
+    def read(self, n_bytes=1):
+        _buffer = bytearray(n_bytes)
+        return str(_buffer[:self.readinto(_buffer)])
+
+    def reset_input_buffer(self):
+        with self._lock:
+            del self._pending[:]
+
+    def close(self):
+        pass
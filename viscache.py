@@ -0,0 +1,176 @@
+"""Persistent cache of catalog x time altitude/azimuth grids.
+
+Grids are stored per site and per night as .npy files that are memory
+mapped on load, so any process planning for the same night maps the
+arrays instead of recomputing them. A cached night grows in place: new
+targets appended to the catalog and times outside the cached range are
+computed and merged, everything already cached is reused.
+
+The grid times are multiples of the step since the unix epoch, so
+requests for overlapping ranges always line up.
+"""
+import json
+import os
+import shutil
+import time
+
+import numpy as np
+
+import astrometry
+
+CACHE_PATH = os.path.expanduser("~/.nexstar_visibility")
+
+
+def site_key(latitude, longitude):
+    return "lat%+.4f_lon%+.4f" % (latitude, longitude)
+
+
+def _site_directory(path, key):
+    """Directory of a site key read back from disk, or None unless it is
+    a plain name directly under path"""
+    if (not key or key in (os.curdir, os.pardir) or os.sep in key or
+            (os.altsep and os.altsep in key)):
+        return None
+    _directory = os.path.normpath(os.path.join(path, key))
+    if os.path.dirname(_directory) != os.path.normpath(path):
+        return None
+    return _directory
+
+
+def night_key(unix_time, longitude):
+    """Local date of the noon that starts the night containing unix_time"""
+    _local_solar = unix_time + longitude / 15.0 * 3600.0 - 12 * 3600.0
+    return time.strftime("%Y%m%d", time.gmtime(_local_solar))
+
+
+class VisibilityCache(object):
+
+    def __init__(self, latitude, longitude, path=CACHE_PATH, step=300.0):
+        """
+        :param latitude: site latitude in degrees
+        :param longitude: site longitude in degrees, east positive
+        :param path: cache root directory
+        :param step: grid step in seconds
+        """
+        self.latitude = latitude
+        self.longitude = longitude
+        self.step = step
+        self.path = os.path.join(path, site_key(latitude, longitude))
+
+    @classmethod
+    def for_telescope(cls, telescope, path=CACHE_PATH, step=300.0):
+        """Cache for the site the telescope reports.
+
+        The cache remembers the last site it was used for; when the mount
+        reports a different one the old site's grids are dropped.
+        """
+        _latitude, _longitude = telescope.get_location_lat_long()
+        _key = site_key(_latitude, _longitude)
+        _current = os.path.join(path, "site")
+        if os.path.exists(_current):
+            with open(_current) as _file:
+                _previous = _file.read().strip()
+            _stale = _site_directory(path, _previous)
+            if _previous != _key and _stale is not None:
+                shutil.rmtree(_stale, ignore_errors=True)
+        if not os.path.isdir(path):
+            os.makedirs(path)
+        with open(_current, 'w') as _file:
+            _file.write(_key)
+        return cls(_latitude, _longitude, path, step)
+
+    def _night_path(self, start):
+        return os.path.join(self.path, night_key(start, self.longitude))
+
+    def _load(self, night_path):
+        _meta_path = os.path.join(night_path, "meta.json")
+        if not os.path.exists(_meta_path):
+            return None
+        with open(_meta_path) as _file:
+            _meta = json.load(_file)
+        if _meta['step'] != self.step:
+            return None
+        _arrays = dict((name, np.load(os.path.join(night_path, name + ".npy"),
+                                      mmap_mode='r'))
+                       for name in ('targets', 'alt', 'az'))
+        return _meta, _arrays
+
+    def _compute(self, ra, dec, times):
+        _alt, _az = astrometry.radec_to_altaz(
+            np.asarray(ra)[:, None], np.asarray(dec)[:, None],
+            self.latitude, self.longitude, times[None, :])
+        return _alt.astype(np.float32), _az.astype(np.float32)
+
+    def _store(self, night_path, t0, targets, alt, az):
+        """Writes a night's grids; meta.json goes last to commit them"""
+        if not os.path.isdir(night_path):
+            os.makedirs(night_path)
+        for name, array in (('targets', targets), ('alt', alt), ('az', az)):
+            _tmp = os.path.join(night_path, name + ".tmp.npy")
+            np.save(_tmp, array)
+            os.rename(_tmp, os.path.join(night_path, name + ".npy"))
+        _tmp = os.path.join(night_path, "meta.json.tmp")
+        with open(_tmp, 'w') as _file:
+            json.dump({'t0': t0, 'step': self.step,
+                       'times': alt.shape[1], 'targets': alt.shape[0]}, _file)
+        os.rename(_tmp, os.path.join(night_path, "meta.json"))
+
+    def grid(self, ra, dec, start, end):
+        """Altitude/azimuth of every target over [start, end].
+
+        :return: (times, alt, az) with alt and az (targets x times) float32
+            views of the memory mapped cache
+        """
+        _targets = np.column_stack((np.asarray(ra, dtype=np.float64),
+                                    np.asarray(dec, dtype=np.float64)))
+        _first = np.floor(start / self.step) * self.step
+        _last = np.ceil(end / self.step) * self.step
+        _night_path = self._night_path(start)
+        _cached = self._load(_night_path)
+
+        if _cached is None:
+            t0, _n_times = _first, int(round((_last - _first) / self.step)) + 1
+            _times = t0 + self.step * np.arange(_n_times)
+            _alt, _az = self._compute(_targets[:, 0], _targets[:, 1], _times)
+            self._store(_night_path, t0, _targets, _alt, _az)
+        else:
+            _meta, _arrays = _cached
+            _known = len(_arrays['targets'])
+            if (_known > len(_targets) or
+                    not np.array_equal(_arrays['targets'], _targets[:_known])):
+                # not an extension of the cached catalog, start over
+                shutil.rmtree(_night_path, ignore_errors=True)
+                return self.grid(ra, dec, start, end)
+            t0 = min(_meta['t0'], _first)
+            _cached_end = _meta['t0'] + self.step * (_meta['times'] - 1)
+            _n_times = int(round((max(_cached_end, _last) - t0) /
+                                 self.step)) + 1
+            if _known < len(_targets) or _n_times != _meta['times']:
+                _times = t0 + self.step * np.arange(_n_times)
+                _alt = np.empty((len(_targets), _n_times), dtype=np.float32)
+                _az = np.empty_like(_alt)
+                # new columns for the cached targets
+                _offset = int(round((_meta['t0'] - t0) / self.step))
+                _old = slice(_offset, _offset + _meta['times'])
+                _new = np.ones(_n_times, dtype=bool)
+                _new[_old] = False
+                _alt[:_known, _old] = _arrays['alt']
+                _az[:_known, _old] = _arrays['az']
+                if _new.any():
+                    _alt[:_known, _new], _az[:_known, _new] = self._compute(
+                        _targets[:_known, 0], _targets[:_known, 1],
+                        _times[_new])
+                # new targets, every column
+                if _known < len(_targets):
+                    _alt[_known:], _az[_known:] = self._compute(
+                        _targets[_known:, 0], _targets[_known:, 1], _times)
+                del _arrays
+                self._store(_night_path, t0, _targets, _alt, _az)
+
+        _meta, _arrays = self._load(_night_path)
+        _times = _meta['t0'] + self.step * np.arange(_meta['times'])
+        _columns = (_times >= _first) & (_times <= _last)
+        _columns = slice(np.argmax(_columns), len(_columns) -
+                         np.argmax(_columns[::-1]))
+        return (_times[_columns], _arrays['alt'][:, _columns],
+                _arrays['az'][:, _columns])